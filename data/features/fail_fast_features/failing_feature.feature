@@ -0,0 +1,8 @@
+@failing
+Feature: Feature that fails fast
+  This feature is the largest of the directory so that it is started first
+  when running with workers and fails before the other features finish.
+
+  Scenario: Scenario that fails after a second
+    Given I sleep for "1" seconds
+     Then I fail
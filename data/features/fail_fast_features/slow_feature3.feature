@@ -0,0 +1,7 @@
+Feature: Slow feature #3
+
+  Scenario: First slow scenario
+    Given I sleep for "2" seconds
+
+  Scenario: Second slow scenario
+    Given I sleep for "2" seconds
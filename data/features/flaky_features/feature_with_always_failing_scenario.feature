@@ -0,0 +1,4 @@
+Feature: Feature with always failing scenario
+
+  Scenario: That always fails
+    Given I run the command "false" and expect exit code "0"
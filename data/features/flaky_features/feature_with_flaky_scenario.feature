@@ -0,0 +1,13 @@
+Feature: Feature with flaky scenario
+
+  Scenario: Just a passing scenario
+    Given I echo "this scenario always passes"
+
+  Scenario: That fails the first time it runs
+    Given I run the following script and expect exit code "0"
+      """
+      #!/bin/bash
+      test -f "$CUCU_RESULTS_DIR/.flaky" && exit 0
+      touch "$CUCU_RESULTS_DIR/.flaky"
+      exit 1
+      """
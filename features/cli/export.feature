@@ -0,0 +1,13 @@
+@export
+Feature: Export
+  As a developer I want the `cucu export` command to export the results of
+  runs into columnar files
+
+  Scenario: User can export a run into Parquet files
+    Given I run the command "cucu run data/features/echo.feature --results {CUCU_RESULTS_DIR}/export_results" and expect exit code "0"
+     When I run the command "cucu export {CUCU_RESULTS_DIR}/export_results --output {CUCU_RESULTS_DIR}/export" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" matches the following:
+      """
+      [\s\S]*exported .*export_results/run.db to 5 files[\s\S]*
+      """
+      And I should see the directory at "{CUCU_RESULTS_DIR}/export/step"
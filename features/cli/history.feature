@@ -0,0 +1,19 @@
+@history
+Feature: History
+  As a developer I want the `cucu history` command to report on the runs
+  recorded over time
+
+  Scenario: User can ingest runs into the history and report on them
+    Given I run the command "cucu run data/features/echo.feature --results {CUCU_RESULTS_DIR}/history_first_results" and expect exit code "0"
+      And I run the command "cucu run data/features/echo.feature --results {CUCU_RESULTS_DIR}/history_second_results" and expect exit code "0"
+     When I run the command "cucu history {CUCU_RESULTS_DIR}/history_first_results/run.db {CUCU_RESULTS_DIR}/history_second_results/run.db {CUCU_RESULTS_DIR}/history_first_results/run.db --history-db {CUCU_RESULTS_DIR}/history.db" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" matches the following:
+      """
+      [\s\S]*ingested 1 runs from .*history_first_results/run.db[\s\S]*
+      [\s\S]*ingested 1 runs from .*history_second_results/run.db[\s\S]*
+      [\s\S]*ingested 0 runs from .*history_first_results/run.db[\s\S]*
+      """
+      And I should see "{STDOUT}" matches the following:
+      """
+      [\s\S]*Echo\s+Echo an environment variable\s+2\s+100.0%[\s\S]*
+      """
@@ -0,0 +1,17 @@
+@query
+Feature: Query
+  As a developer I want the `cucu query` command to answer common questions
+  about a run from its run.db
+
+  Scenario: User can query the failures of a run
+    Given I run the command "cucu run data/features/feature_with_mixed_results.feature --results {CUCU_RESULTS_DIR}/query_results" and expect exit code "1"
+     When I run the command "cucu query failures {CUCU_RESULTS_DIR}/query_results" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" matches the following:
+      """
+      [\s\S]*AssertionError: step fails on purpose\s+2\s+2[\s\S]*
+      """
+     When I run the command "cucu query slowest-scenarios {CUCU_RESULTS_DIR}/query_results/run.db --limit 1 --format json" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" matches the following:
+      """
+      \[\s+\{\s+"feature": "Feature with mixed results",[\s\S]*\}\s+\]
+      """
@@ -14,6 +14,57 @@ Feature: Report basics
      When I click the link "Echo an environment variable"
      Then I should see the text "I echo \"current shell is '\{SHELL\}'\""
 
+  Scenario: User can generate a report with multiple processes
+    Given I run the command "cucu run data/features/echo.feature data/features/feature_with_mixed_results.feature --results {CUCU_RESULTS_DIR}/report-jobs-results" and expect exit code "1"
+     When I run the command "cucu report {CUCU_RESULTS_DIR}/report-jobs-results --output {CUCU_RESULTS_DIR}/report-jobs-report --jobs 2" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" contains "generating the report with 2 processes"
+      And I should see a file at "{CUCU_RESULTS_DIR}/report-jobs-report/Echo/Echo an environment variable/index.html"
+      And I should see the file at "{CUCU_RESULTS_DIR}/report-jobs-report/report_data/flat.0.js" contains the following:
+        """
+        Scenario that fails
+        """
+
+  Scenario: User can regenerate only the pages of the features that changed
+    Given I run the command "cucu run data/features/echo.feature --results {CUCU_RESULTS_DIR}/report-incremental-results/first" and expect exit code "0"
+      And I run the command "cucu report {CUCU_RESULTS_DIR}/report-incremental-results --combine --output {CUCU_RESULTS_DIR}/report-incremental-report --incremental" and expect exit code "0"
+      And I run the command "cucu run data/features/feature_with_mixed_results.feature --results {CUCU_RESULTS_DIR}/report-incremental-results/second" and expect exit code "1"
+     When I run the command "cucu report {CUCU_RESULTS_DIR}/report-incremental-results --combine --output {CUCU_RESULTS_DIR}/report-incremental-report --incremental" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" contains "1 features unchanged since the last report"
+      And I should see the file at "{CUCU_RESULTS_DIR}/report-incremental-report/report_data/flat.0.js" contains the following:
+        """
+        Echo an environment variable
+        """
+      And I should see the file at "{CUCU_RESULTS_DIR}/report-incremental-report/report_data/flat.0.js" contains the following:
+        """
+        Scenario that fails
+        """
+
+  Scenario: User can switch a report to incremental without keeping its stale pages
+    Given I run the command "cucu run data/features/feature_with_mixed_results.feature --results {CUCU_RESULTS_DIR}/report-stale-first-results" and expect exit code "1"
+      And I run the command "cucu report {CUCU_RESULTS_DIR}/report-stale-first-results --output {CUCU_RESULTS_DIR}/report-stale-report" and expect exit code "0"
+      And I run the command "cucu run data/features/echo.feature --results {CUCU_RESULTS_DIR}/report-stale-second-results" and expect exit code "0"
+     When I run the command "cucu report {CUCU_RESULTS_DIR}/report-stale-second-results --output {CUCU_RESULTS_DIR}/report-stale-report --incremental" and expect exit code "0"
+     Then I should see a file at "{CUCU_RESULTS_DIR}/report-stale-report/Echo.html"
+      And I should not see a file at "{CUCU_RESULTS_DIR}/report-stale-report/Feature with mixed results.html"
+
+  Scenario: User can generate a report with the artifacts linked to the results
+    Given I run the command "cucu run data/features/echo.feature --results {CUCU_RESULTS_DIR}/report-link-results" and expect exit code "0"
+     When I run the command "cucu report {CUCU_RESULTS_DIR}/report-link-results --output {CUCU_RESULTS_DIR}/report-link-report --link-mode hardlink" and expect exit code "0"
+     Then I should see the file at "{CUCU_RESULTS_DIR}/report-link-report/report_data/flat.0.js" contains the following:
+        """
+        Echo an environment variable
+        """
+      And I should see a file at "{CUCU_RESULTS_DIR}/report-link-report/Echo/Echo an environment variable/logs/cucu.debug.console.log"
+
+  Scenario: User can generate a report in place over the results directory
+    Given I run the command "cucu run data/features/echo.feature --results {CUCU_RESULTS_DIR}/report-in-place-results" and expect exit code "0"
+     When I run the command "cucu report {CUCU_RESULTS_DIR}/report-in-place-results --in-place" and expect exit code "0"
+     Then I should see a file at "{CUCU_RESULTS_DIR}/report-in-place-results/run.db"
+      And I should see the file at "{CUCU_RESULTS_DIR}/report-in-place-results/report_data/flat.0.js" contains the following:
+        """
+        Echo an environment variable
+        """
+
   Scenario: User can run a basic browser test and create a report
     Given I run the command "cucu run data/features/feature_with_passing_scenario_with_web.feature --results {CUCU_RESULTS_DIR}/browser-results --env CUCU_BROKEN_IMAGES_PAGE_CHECK=disabled" and expect exit code "0"
       And I run the command "cucu report {CUCU_RESULTS_DIR}/browser-results --output {CUCU_RESULTS_DIR}/browser-report" and expect exit code "0"
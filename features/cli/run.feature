@@ -125,6 +125,68 @@ Feature: Run
       [\s\S]*
       """
 
+  Scenario: User can spread a run across shards and combine their results
+    Given I run the command "cucu run data/features/echo.feature data/features/feature_with_passing_scenario.feature --shard 1/2 --results {CUCU_RESULTS_DIR}/sharded_results/shard_1" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" contains the following:
+      """
+      shard 1/2 runs 1 of 2 features
+      """
+     When I run the command "cucu run data/features/echo.feature data/features/feature_with_passing_scenario.feature --shard 2/2 --results {CUCU_RESULTS_DIR}/sharded_results/shard_2" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" contains the following:
+      """
+      shard 2/2 runs 1 of 2 features
+      """
+     When I run the command "cucu report --combine {CUCU_RESULTS_DIR}/sharded_results --output {CUCU_RESULTS_DIR}/sharded_report" and expect exit code "0"
+     Then I should see a file at "{CUCU_RESULTS_DIR}/sharded_report/Echo.html"
+      And I should see a file at "{CUCU_RESULTS_DIR}/sharded_report/Feature with passing scenario.html"
+
+  Scenario: User can rerun only the failed scenarios of a previous run
+    Given I run the command "cucu run data/features/feature_with_mixed_results.feature --results {CUCU_RESULTS_DIR}/rerun_failed_results/original" and expect exit code "1"
+     When I run the command "cucu run --rerun-failed {CUCU_RESULTS_DIR}/rerun_failed_results/original/run.db --results {CUCU_RESULTS_DIR}/rerun_failed_results/rerun --no-color-output" and save stdout to "STDOUT", stderr to "STDERR" and expect exit code "1"
+     Then I should see "{STDOUT}" contains the following:
+      """
+      rerunning 4 failed scenarios
+      """
+      And I should see "{STDOUT}" contains the following:
+      """
+      0 scenarios passed, 3 failed, 1 hook_error
+      """
+     When I run the command "cucu report --combine {CUCU_RESULTS_DIR}/rerun_failed_results --output {CUCU_RESULTS_DIR}/rerun_failed_report" and expect exit code "0"
+     Then I should see a file at "{CUCU_RESULTS_DIR}/rerun_failed_report/Feature with mixed results.html"
+
+  Scenario: User can retry the failed scenarios within the same run
+    Given I run the command "cucu run data/features/flaky_features --retry-failed 2 --results {CUCU_RESULTS_DIR}/retry_failed_results --no-color-output" and save stdout to "STDOUT" and expect exit code "1"
+     Then I should see "{STDOUT}" contains the following:
+      """
+      retrying 2 failed scenarios (attempt 2 of 3)
+      """
+      And I should see "{STDOUT}" contains the following:
+      """
+      1 scenarios passed on retry and are flaky
+      """
+      And I should see "{STDOUT}" contains the following:
+      """
+      retrying 1 failed scenarios (attempt 3 of 3)
+      """
+      And I should see the file at "{CUCU_RESULTS_DIR}/retry_failed_results/Feature with flaky scenario.xml" contains the following:
+      """
+      flaky="true"
+      """
+      And I should see the directory at "{CUCU_RESULTS_DIR}/retry_failed_results/Feature with flaky scenario/That fails the first time it runs (attempt 2)"
+
+  Scenario: User can only run the scenarios that changed since the previous run
+    Given I run the command "cucu run data/features/echo.feature --changed-since {CUCU_RESULTS_DIR}/changed_since/index.json --results {CUCU_RESULTS_DIR}/changed_since/first" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" contains the following:
+      """
+      running 1 of 1 scenarios changed since
+      """
+      And I should see a file at "{CUCU_RESULTS_DIR}/changed_since/index.json"
+     When I run the command "cucu run data/features/echo.feature --changed-since {CUCU_RESULTS_DIR}/changed_since/index.json --results {CUCU_RESULTS_DIR}/changed_since/second" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" contains the following:
+      """
+      no scenarios changed since
+      """
+
   Scenario: User gets an error when multiple feature paths do not share a common features ancestor
     Given I run the command "cucu run data/features/echo.feature /tmp/other.feature --results {CUCU_RESULTS_DIR}/mismatched_ancestor_results --no-color-output" and save stdout to "STDOUT", stderr to "STDERR" and expect exit code "1"
      Then I should see "{STDERR}" matches the following
@@ -26,6 +26,54 @@ Feature: Run with workers
      \.\.\.\.\.
      """
 
+  Scenario: User can let cucu adjust the number of workers to the machine
+    Given I run the command "cucu run data/features/slow_features --no-color-output --workers auto --min-workers 2 --max-workers 3 --results {CUCU_RESULTS_DIR}/auto_workers_results --logging-level debug" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" matches the following:
+      """
+      [\s\S]*finished feature file .* \(5/5\)[\s\S]*
+      """
+      And I should see a file at "{CUCU_RESULTS_DIR}/auto_workers_results/run.db"
+
+  Scenario: User can stop every worker on the first failure with fail fast
+    Given I run the command "cucu run data/features/fail_fast_features --no-color-output --workers 2 --fail-fast --results {CUCU_RESULTS_DIR}/fail_fast_with_workers_results" and save stdout to "STDOUT" and expect exit code "1"
+     Then I should see the previous step took less than "10" seconds
+      And I should see "{STDOUT}" contains the following:
+      """
+      fail fast: not running the 2 features left
+      """
+      And I should not see a file at "{CUCU_RESULTS_DIR}/fail_fast_with_workers_results/.fail-fast"
+
+  Scenario: User can have every worker write to a single run.db
+    Given I run the command "cucu run data/features/slow_features --workers 3 --shared-run-db --results {CUCU_RESULTS_DIR}/shared_run_db_results --logging-level debug" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" contains the following:
+      """
+      No database files found to consolidate.
+      """
+      And I should see a file at "{CUCU_RESULTS_DIR}/shared_run_db_results/run.db"
+      And I should not see a file at "{CUCU_RESULTS_DIR}/shared_run_db_results/run.db-wal"
+
+  Scenario: User can dispatch the longest features first using durations from a previous run
+    Given I run the command "cucu run data/features/slow_features --workers 2 --results {CUCU_RESULTS_DIR}/durations_db_results" and expect exit code "0"
+     When I run the command "cucu run data/features/slow_features --workers 2 --durations-db {CUCU_RESULTS_DIR}/durations_db_results/run.db --results {CUCU_RESULTS_DIR}/durations_db_results --logging-level debug" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see "{STDOUT}" matches the following:
+      """
+      [\s\S]*expected duration of data/features/slow_features/slow_feature\d.feature: 5\.\ds[\s\S]*
+      """
+
+  Scenario: User can run the scenarios of a feature in parallel
+    Given I run the command "cucu run data/features/feature_with_scenario_outline.feature --workers 2 --split-scenarios --results {CUCU_RESULTS_DIR}/split_scenarios_results --generate-report --report {CUCU_RESULTS_DIR}/split_scenarios_report" and save stdout to "STDOUT" and expect exit code "0"
+     Then I should see a file at "{CUCU_RESULTS_DIR}/split_scenarios_results/Feature with scenario outline-8.console.log"
+      And I should see a file at "{CUCU_RESULTS_DIR}/split_scenarios_results/Feature with scenario outline-9.console.log"
+      And I should see the file at "{CUCU_RESULTS_DIR}/split_scenarios_results/Feature with scenario outline.xml" contains the following:
+      """
+      tests="2"
+      """
+      And I should not see the directory at "{CUCU_RESULTS_DIR}/split_scenarios_results/.fragments"
+      And I should see the file at "{CUCU_RESULTS_DIR}/split_scenarios_report/Feature with scenario outline.html" contains the following:
+      """
+      Scenario outline -- @1.2 Things
+      """
+
   # @todo
   # This scneario doesn't work in CI, for some reason the workers aren't spawning or recording to the db
   # @db
@@ -0,0 +1,356 @@
+"""
+pool of browser sessions kept alive by the current process and reset between
+scenarios instead of quitting them and launching a new browser for every
+scenario, enabled with CUCU_BROWSER_POOL=true, and the background launch of
+the next scenario's browser enabled with CUCU_BROWSER_PREFETCH=true
+"""
+
+import threading
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import WebDriverException
+
+from cucu import (
+    config,
+    logger,
+    register_after_all_hook,
+    register_after_scenario_hook,
+)
+from cucu.browser.selenium import Selenium
+
+# idle (session key, browser) tuples ready to be handed to the next scenario
+IDLE_BROWSERS = []
+
+# (session key, thread, result) of the browser being launched in the
+# background for the next scenario, the result dict holds the browser once
+# the thread is done, or marks it abandoned when it took too long to launch
+PREFETCHED = None
+
+# only chromium based browsers can be fully reset, through the chrome devtools
+# protocol, the other browsers are quit instead of being pooled
+CHROMIUM_BROWSERS = ["chrome", "MicrosoftEdge", "msedge"]
+
+CDP_RESET_COMMANDS = [
+    ("Network.clearBrowserCookies", {}),
+    ("Network.clearBrowserCache", {}),
+]
+
+
+def session_key(browser_name, headless, selenium_remote_url):
+    """
+    the options a pooled browser has to have been opened with to be reused
+    """
+    return (
+        browser_name,
+        bool(headless),
+        selenium_remote_url,
+        config.CONFIG.get("CUCU_CHROME_PROFILE_DIR"),
+    )
+
+
+def is_healthy(browser):
+    try:
+        browser.driver.execute_script("return document.readyState;")
+        return True
+    except WebDriverException as exception:
+        logger.debug(f"pooled browser failed its health check: {exception}")
+        return False
+
+
+def quit_browser(browser):
+    try:
+        browser.quit()
+    except WebDriverException as exception:
+        logger.debug(f"unable to quit pooled browser: {exception}")
+
+
+def launch(browser_name, headless, selenium_remote_url):
+    browser = Selenium()
+    logger.debug(f"opening browser {browser_name}")
+    browser.open(
+        browser_name,
+        headless=headless,
+        selenium_remote_url=selenium_remote_url,
+    )
+    browser.pool_key = session_key(browser_name, headless, selenium_remote_url)
+    return browser
+
+
+def prefetch(browser_name, headless=False, selenium_remote_url=None):
+    """
+    start launching a browser with the options provided in a background
+    thread so the next call to `acquire` with the same options can hand it
+    over without waiting for the browser to start
+    """
+    global PREFETCHED
+
+    if PREFETCHED is not None:
+        return
+
+    result = {"lock": threading.Lock()}
+
+    def run():
+        try:
+            browser = launch(browser_name, headless, selenium_remote_url)
+        except WebDriverException as exception:
+            logger.debug(f"unable to prefetch browser: {exception}")
+            return
+
+        with result["lock"]:
+            abandoned = result.get("abandoned", False)
+            if not abandoned:
+                result["browser"] = browser
+
+        if abandoned:
+            quit_browser(browser)
+
+    thread = threading.Thread(target=run, name="browser-prefetch", daemon=True)
+    thread.start()
+
+    key = session_key(browser_name, headless, selenium_remote_url)
+    PREFETCHED = (key, thread, result)
+
+
+def take_prefetched(key):
+    """
+    wait up to CUCU_BROWSER_PREFETCH_TIMEOUT_S for the browser being
+    prefetched and return it when it was launched with the options of the
+    session key provided, otherwise quit it, a browser that launches after
+    the wait is quit as soon as it does
+    """
+    global PREFETCHED
+
+    if PREFETCHED is None:
+        return None
+
+    prefetched_key, thread, result = PREFETCHED
+    PREFETCHED = None
+    timeout = float(config.CONFIG["CUCU_BROWSER_PREFETCH_TIMEOUT_S"])
+    thread.join(timeout)
+
+    with result["lock"]:
+        browser = result.get("browser")
+        if browser is None:
+            if thread.is_alive():
+                logger.debug(
+                    f"prefetched browser didn't launch within {timeout}s"
+                )
+            result["abandoned"] = True
+            return None
+
+    if prefetched_key != key or not is_healthy(browser):
+        quit_browser(browser)
+        return None
+
+    return browser
+
+
+def acquire(browser_name, headless=False, selenium_remote_url=None):
+    """
+    hand over an idle browser opened with the same options from the pool, or
+    the browser prefetched for this scenario, or open a new one when there
+    isn't a healthy one available
+    """
+    key = session_key(browser_name, headless, selenium_remote_url)
+
+    for index, (idle_key, browser) in enumerate(IDLE_BROWSERS):
+        if idle_key != key:
+            continue
+
+        del IDLE_BROWSERS[index]
+        if is_healthy(browser):
+            logger.debug(
+                f"reusing pooled browser session {browser.get_session_id()}"
+            )
+            return browser
+
+        quit_browser(browser)
+        break
+
+    if browser := take_prefetched(key):
+        logger.debug(
+            f"using prefetched browser session {browser.get_session_id()}"
+        )
+        return browser
+
+    return launch(browser_name, headless, selenium_remote_url)
+
+
+def execute_cdp(driver, cmd, params=None):
+    response = driver.execute(
+        "executeCdpCommand", {"cmd": cmd, "params": params or {}}
+    )
+    return response["value"]
+
+
+def visited_origins(driver):
+    """
+    the http(s) origins of the pages in the navigation history of the current
+    tab and of the frames of the page it displays
+    """
+    history = execute_cdp(driver, "Page.getNavigationHistory")
+    urls = [entry["url"] for entry in history["entries"]]
+
+    frame_trees = [execute_cdp(driver, "Page.getFrameTree")["frameTree"]]
+    while frame_trees:
+        frame_tree = frame_trees.pop()
+        urls.append(frame_tree["frame"]["url"])
+        frame_trees.extend(frame_tree.get("childFrames", []))
+
+    origins = set()
+    for url in urls:
+        parsed_url = urlparse(url)
+        if parsed_url.scheme in ["http", "https"]:
+            origins.add(f"{parsed_url.scheme}://{parsed_url.netloc}")
+
+    return origins
+
+
+def reset(browser):
+    """
+    reset the browser to a blank state: replace its tabs with a new blank one,
+    clear the cookies and the cache and the storage of every origin visited
+    by its tabs
+
+    the storage of origins that were only loaded in frames of pages the tabs
+    navigated away from, or in windows closed by the scenario itself, isn't
+    tracked and so isn't cleared
+    """
+    driver = browser.driver
+    window_handles = driver.window_handles
+    origins = set()
+    for window_handle in window_handles:
+        driver.switch_to.window(window_handle)
+        origins.update(visited_origins(driver))
+
+    # a new tab has neither the session storage nor the history of the tabs
+    driver.switch_to.new_window("tab")
+    blank_window_handle = driver.current_window_handle
+    for window_handle in window_handles:
+        driver.switch_to.window(window_handle)
+        driver.close()
+
+    driver.switch_to.window(blank_window_handle)
+
+    commands = list(CDP_RESET_COMMANDS)
+    for origin in sorted(origins):
+        commands.append(
+            (
+                "Storage.clearDataForOrigin",
+                {"origin": origin, "storageTypes": "all"},
+            )
+        )
+
+    for cmd, params in commands:
+        execute_cdp(driver, cmd, params)
+
+    driver.set_window_size(
+        config.CONFIG["CUCU_BROWSER_WINDOW_WIDTH"],
+        config.CONFIG["CUCU_BROWSER_WINDOW_HEIGHT"],
+    )
+
+
+def release(browser):
+    """
+    reset the browser provided and keep it in the pool for the next scenario,
+    the browser is quit instead when the pool is full or it can't be reset
+    """
+    pool_size = int(config.CONFIG["CUCU_BROWSER_POOL_SIZE"])
+
+    if (
+        browser.pool_key is None
+        or browser.driver.name not in CHROMIUM_BROWSERS
+        or len(IDLE_BROWSERS) >= pool_size
+    ):
+        quit_browser(browser)
+        return
+
+    try:
+        reset(browser)
+    except WebDriverException as exception:
+        logger.debug(f"unable to reset pooled browser: {exception}")
+        quit_browser(browser)
+        return
+
+    if not is_healthy(browser):
+        quit_browser(browser)
+        return
+
+    IDLE_BROWSERS.append((browser.pool_key, browser))
+
+
+def release_browsers(ctx):
+    """
+    after scenario hook handing the browsers of the scenario over to the pool
+    instead of letting them be quit
+    """
+    if not config.CONFIG.true("CUCU_BROWSER_POOL") or config.CONFIG.true(
+        "CUCU_KEEP_BROWSER_ALIVE"
+    ):
+        return
+
+    for browser in ctx.browsers:
+        release(browser)
+
+    ctx.browsers = []
+
+
+def prefetch_browser(ctx):
+    """
+    after scenario hook launching the browser of the next scenario in the
+    background, only when this scenario used a browser that won't be handed
+    over as is and there's another scenario left to run
+    """
+    if not config.CONFIG.true("CUCU_BROWSER_PREFETCH") or not ctx.browsers:
+        return
+
+    if config.CONFIG.true("CUCU_KEEP_BROWSER_ALIVE") or config.CONFIG.true(
+        "CUCU_BROWSER_POOL"
+    ):
+        return
+
+    # behave compares scenarios by their name so look this one up by identity
+    scenarios = ctx.feature.walk_scenarios()
+    index = next(
+        (
+            index
+            for index, other in enumerate(scenarios)
+            if other is ctx.scenario
+        ),
+        None,
+    )
+    if index is None:
+        return
+
+    remaining = scenarios[index + 1 :]
+    if not any(other.should_run(ctx.config) for other in remaining):
+        return
+
+    prefetch(
+        config.CONFIG["CUCU_BROWSER"],
+        headless=config.CONFIG["CUCU_BROWSER_HEADLESS"],
+        selenium_remote_url=config.CONFIG["CUCU_SELENIUM_REMOTE_URL"],
+    )
+
+
+def quit_all(ctx):
+    """
+    after all hook quitting every idle browser in the pool and the prefetched
+    browser, if any
+    """
+    # no browser matches the None session key so the prefetched one is quit
+    take_prefetched(None)
+
+    while IDLE_BROWSERS:
+        _, browser = IDLE_BROWSERS.pop()
+        quit_browser(browser)
+
+
+def register_hooks():
+    """
+    register the hooks that prefetch the browsers of the next scenarios and
+    hand the browsers of the scenarios over to the pool
+    """
+    register_after_scenario_hook(release_browsers)
+    register_after_scenario_hook(prefetch_browser)
+    register_after_all_hook(quit_all)
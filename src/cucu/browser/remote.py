@@ -0,0 +1,157 @@
+"""
+selection of the selenium remote url each new browser session is opened on
+when CUCU_SELENIUM_REMOTE_URL lists several comma separated urls, along with
+the number of sessions opened on each of them by the current process
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from cucu import config, logger
+
+STRATEGIES = ["least-outstanding", "latency"]
+
+# url to the number of sessions opened, currently open and failed over from
+# by the current process
+ENDPOINTS = {}
+
+# the remotes are probed concurrently with a short timeout and their status
+# reused for a few seconds, so an unreachable remote doesn't slow down every
+# browser launch
+PROBE_TIMEOUT_S = 2.0
+PROBE_TTL_S = 5.0
+
+# url to the (time, sessions opened by then, result) of its last probe
+PROBES = {}
+
+
+def parse_remote_urls(selenium_remote_url):
+    """
+    split the value of CUCU_SELENIUM_REMOTE_URL into the list of urls it
+    holds, either as a comma separated string or a list from a cucurc.yml
+    """
+    if selenium_remote_url is None:
+        return []
+
+    if isinstance(selenium_remote_url, (list, tuple)):
+        urls = selenium_remote_url
+    else:
+        urls = str(selenium_remote_url).split(",")
+
+    return [str(url).strip() for url in urls if str(url).strip()]
+
+
+def endpoint(url):
+    return ENDPOINTS.setdefault(
+        url, {"sessions": 0, "outstanding": 0, "failovers": 0}
+    )
+
+
+def record_session(url):
+    endpoint(url)["sessions"] += 1
+    endpoint(url)["outstanding"] += 1
+
+
+def record_failover(url):
+    endpoint(url)["failovers"] += 1
+
+
+def release_session(url):
+    if url in ENDPOINTS and ENDPOINTS[url]["outstanding"] > 0:
+        ENDPOINTS[url]["outstanding"] -= 1
+
+
+def probe(url, timeout):
+    """
+    query the status endpoint of the selenium remote url provided for its
+    (latency, busy sessions), None when it's unreachable
+    """
+    start = time.monotonic()
+    try:
+        response = requests.get(f"{url.rstrip('/')}/status", timeout=timeout)
+        status = response.json()
+    except (requests.RequestException, ValueError) as exception:
+        logger.debug(f"unable to get the status of {url}: {exception}")
+        return None
+
+    latency = time.monotonic() - start
+
+    # selenium grid 4 reports the session running in every slot of its nodes
+    nodes = (status.get("value") or {}).get("nodes")
+    if not isinstance(nodes, list):
+        return (latency, None)
+
+    busy = sum(
+        1
+        for node in nodes
+        for slot in node.get("slots") or []
+        if slot.get("session")
+    )
+    return (latency, busy)
+
+
+def probe_remote_urls(urls):
+    """
+    probe the status endpoint of the selenium remote urls provided whose last
+    probe is older than PROBE_TTL_S, all at once
+    """
+    now = time.monotonic()
+    stale = [
+        url
+        for url in urls
+        if url not in PROBES or now - PROBES[url][0] > PROBE_TTL_S
+    ]
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=len(stale)) as executor:
+            results = executor.map(
+                lambda url: probe(url, PROBE_TIMEOUT_S), stale
+            )
+            for url, result in zip(stale, results):
+                PROBES[url] = (now, endpoint(url)["sessions"], result)
+
+    return {url: PROBES[url] for url in urls}
+
+
+def rank_remote_urls(urls, strategy=None):
+    """
+    order the selenium remote urls by preference for the next session, by
+    the sessions they run or by those weighed by their latency, the
+    unreachable ones last so they're still tried when everything else fails
+    """
+    if len(urls) < 2:
+        return list(urls)
+
+    strategy = strategy or config.CONFIG["CUCU_SELENIUM_REMOTE_URL_STRATEGY"]
+    if strategy not in STRATEGIES:
+        raise RuntimeError(
+            f"unknown selenium remote url strategy {strategy}, "
+            f"expected one of {', '.join(STRATEGIES)}"
+        )
+
+    probes = probe_remote_urls(urls)
+    ranked = []
+    unreachable = []
+    for index, url in enumerate(urls):
+        _, sessions, probed = probes[url]
+        if probed is None:
+            unreachable.append(url)
+            continue
+
+        latency, busy = probed
+        if busy is None:
+            outstanding = endpoint(url)["outstanding"]
+        else:
+            # along with the sessions opened since the status was probed
+            outstanding = busy + endpoint(url)["sessions"] - sessions
+
+        if strategy == "latency":
+            score = (latency * (outstanding + 1),)
+        else:
+            score = (outstanding, latency)
+
+        ranked.append((score, index, url))
+
+    return [url for _, _, url in sorted(ranked)] + unreachable
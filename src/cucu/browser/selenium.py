@@ -15,6 +15,7 @@ from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.remote.command import Command
 
 from cucu import config, edgedriver_autoinstaller, logger
+from cucu.browser import remote
 from cucu.browser.core import Browser
 from cucu.browser.frames import search_in_all_frames
 
@@ -81,6 +82,54 @@ def init():
 class Selenium(Browser):
     def __init__(self):
         self.driver = None
+        self.selenium_remote_url = None
+        # the session key of the browser pool, set when launched by the pool
+        self.pool_key = None
+
+    def open_remote(self, selenium_remote_url, options):
+        """
+        open a session on the preferred selenium remote url, failing over to
+        the next one when it can't be reached or the session can't be opened
+        in time
+        """
+        urls = remote.rank_remote_urls(
+            remote.parse_remote_urls(selenium_remote_url)
+        )
+        if not urls:
+            raise RuntimeError("no selenium remote url provided")
+
+        for url in urls:
+            logger.debug(f"webdriver.Remote init: {url}")
+            try:
+                driver = webdriver.Remote(
+                    command_executor=url,
+                    options=options,
+                )
+            except (
+                urllib3.exceptions.ReadTimeoutError,
+                urllib3.exceptions.MaxRetryError,
+                urllib3.exceptions.NewConnectionError,
+            ) as exception:
+                remote.record_failover(url)
+                if url == urls[-1]:
+                    print("*" * 80)
+                    print(
+                        "* unable to connect to the remote selenium setup,"
+                        " you may need to restart it"
+                    )
+                    print("*" * 80)
+                    print("")
+                    raise
+
+                logger.warning(
+                    f"unable to open a session on {url}, failing over to the "
+                    f"next selenium remote url: {exception}"
+                )
+                continue
+
+            remote.record_session(url)
+            self.selenium_remote_url = url
+            return driver
 
     def open(
         self, browser, headless=False, selenium_remote_url=None, detach=False
@@ -138,21 +187,7 @@ class Selenium(Browser):
             options.set_capability("goog:loggingPrefs", {"browser": "ALL"})
 
             if selenium_remote_url is not None:
-                logger.debug(f"webdriver.Remote init: {selenium_remote_url}")
-                try:
-                    self.driver = webdriver.Remote(
-                        command_executor=selenium_remote_url,
-                        options=options,
-                    )
-                except urllib3.exceptions.ReadTimeoutError:
-                    print("*" * 80)
-                    print(
-                        "* unable to connect to the remote selenium setup,"
-                        " you may need to restart it"
-                    )
-                    print("*" * 80)
-                    print("")
-                    raise
+                self.driver = self.open_remote(selenium_remote_url, options)
             else:
                 logger.debug("webdriver.Chrome init")
                 self.driver = webdriver.Chrome(
@@ -185,21 +220,7 @@ class Selenium(Browser):
                 options.add_argument("--headless")
 
             if selenium_remote_url is not None:
-                logger.debug(f"webdriver.Remote init: {selenium_remote_url}")
-                try:
-                    self.driver = webdriver.Remote(
-                        command_executor=selenium_remote_url,
-                        options=options,
-                    )
-                except urllib3.exceptions.ReadTimeoutError:
-                    print("*" * 80)
-                    print(
-                        "* unable to connect to the remote selenium setup,"
-                        " you may need to restart it"
-                    )
-                    print("*" * 80)
-                    print("")
-                    raise
+                self.driver = self.open_remote(selenium_remote_url, options)
             else:
                 logger.debug("webdriver.Firefox init")
                 self.driver = webdriver.Firefox(
@@ -221,21 +242,7 @@ class Selenium(Browser):
                 options.set_capability("acceptSslCerts", True)
 
             if selenium_remote_url is not None:
-                logger.debug(f"webdriver.Remote init: {selenium_remote_url}")
-                try:
-                    self.driver = webdriver.Remote(
-                        command_executor=selenium_remote_url,
-                        options=options,
-                    )
-                except urllib3.exceptions.ReadTimeoutError:
-                    print("*" * 80)
-                    print(
-                        "* unable to connect to the remote selenium setup,"
-                        " you may need to restart it"
-                    )
-                    print("*" * 80)
-                    print("")
-                    raise
+                self.driver = self.open_remote(selenium_remote_url, options)
             else:
                 logger.debug("webdriver.Edge init")
                 edgedriver_filepath = (
@@ -463,4 +470,9 @@ class Selenium(Browser):
             mht_file.write(mht_data)
 
     def quit(self):
-        self.driver.quit()
+        try:
+            self.driver.quit()
+        finally:
+            if self.selenium_remote_url is not None:
+                remote.release_session(self.selenium_remote_url)
+                self.selenium_remote_url = None
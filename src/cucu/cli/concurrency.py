@@ -0,0 +1,99 @@
+"""
+adaptive number of features run concurrently by `cucu run --workers auto`
+based on the CPU usage and available memory observed on the machine
+"""
+
+import time
+
+import psutil
+
+from cucu import logger
+from cucu.utils import get_iso_timestamp_with_ms
+
+
+def parse_workers(workers):
+    """
+    parse the value provided to `cucu run --workers`, "auto" and None are
+    returned as is
+    """
+    if workers is None or workers == "auto":
+        return workers
+
+    if not workers.isdigit() or int(workers) < 1:
+        raise ValueError(f"must be a positive number or auto, got {workers}")
+
+    return int(workers)
+
+
+class AdaptiveConcurrency:
+    """
+    grows the number of features run concurrently one at a time while the
+    machine has CPU and memory headroom and all of the current slots are
+    busy, and shrinks it as soon as either the CPU or the memory gets scarce,
+    always within the min and max bounds provided. features already running
+    are never interrupted, shrinking only holds back the next dispatches.
+
+    every sample is kept in the timeline so it can be recorded in the run.db
+    and used to tune the bounds.
+    """
+
+    sample_interval_s = 2.0
+    cpu_high_percent = 85.0
+    cpu_low_percent = 60.0
+    min_available_memory_mb = 1024.0
+
+    def __init__(self, min_workers, max_workers):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.concurrency = min_workers
+        self.timeline = []
+        self.last_sample_at = time.monotonic()
+
+        # the first call only sets the baseline the next calls measure from
+        psutil.cpu_percent(interval=None)
+
+    def update(self, running):
+        """
+        the number of features that should be running concurrently, sampling
+        the CPU usage and available memory at most every `sample_interval_s`
+        """
+        now = time.monotonic()
+        if now - self.last_sample_at < self.sample_interval_s:
+            return self.concurrency
+
+        self.last_sample_at = now
+        cpu_percent = psutil.cpu_percent(interval=None)
+        available_memory_mb = psutil.virtual_memory().available / 1024**2
+
+        concurrency = self.concurrency
+        if (
+            cpu_percent > self.cpu_high_percent
+            or available_memory_mb < self.min_available_memory_mb
+        ):
+            concurrency = max(self.min_workers, concurrency - 1)
+        elif (
+            cpu_percent < self.cpu_low_percent
+            and available_memory_mb > 2 * self.min_available_memory_mb
+            and running >= concurrency
+        ):
+            concurrency = min(self.max_workers, concurrency + 1)
+
+        if concurrency != self.concurrency:
+            logger.debug(
+                f"adjusting concurrency from {self.concurrency} to "
+                f"{concurrency} (cpu {cpu_percent:.0f}%, "
+                f"{available_memory_mb:.0f}MB available)"
+            )
+            self.concurrency = concurrency
+
+        self.timeline.append(
+            {
+                "sampled_at": get_iso_timestamp_with_ms(),
+                "concurrency": concurrency,
+                "running": running,
+                "cpu_percent": cpu_percent,
+                "available_memory_mb": available_memory_mb,
+            }
+        )
+
+        return concurrency
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
+import collections
 import os
+import queue
 import re
 import shutil
 import signal
@@ -26,16 +28,39 @@ from cucu import (
     register_after_all_hook,
     reporter,
 )
+from cucu.browser import pool as browser_pool
+from cucu.cli import history as run_history
+from cucu.cli import query as run_query
 from cucu.cli import thread_dumper
+from cucu.cli.concurrency import AdaptiveConcurrency, parse_workers
+from cucu.cli.impact import (
+    collect_scenario_inputs,
+    load_index,
+    select_changed_scenarios,
+    update_index,
+)
+from cucu.cli.retry import retry_failed_scenarios
 from cucu.cli.run import behave, behave_init, create_run
+from cucu.cli.scheduler import (
+    load_failed_scenarios,
+    load_feature_durations,
+    parse_shard,
+    plan_features,
+    shard_features,
+)
 from cucu.cli.steps import print_human_readable_steps, print_json_steps
 from cucu.cli.tags import collect_cucu_tags
+from cucu.cli.worker import run_feature
 from cucu.config import CONFIG
 from cucu.db import (
+    close_db,
     consolidate_database_files,
     finish_worker_record,
+    record_concurrency_timeline,
 )
+from cucu.formatter.junit import merge_junit_fragments
 from cucu.lint import linter
+from cucu.reporter.artifacts import LINK_MODES
 from cucu.utils import generate_short_id
 
 # set env var BEHAVE_STRIP_STEPS_WITH_TRAILING_COLON=yes before importing behave
@@ -172,6 +197,60 @@ def main():
     default=1800,
     help="When run tests in parallel, the maximum amount of time (seconds) a feature can run",
 )
+@click.option(
+    "--durations-db",
+    default=[],
+    multiple=True,
+    type=click.Path(path_type=Path),
+    help="run.db file from a previous run used to dispatch the longest "
+    "features first when running with --workers, can be used multiple times",
+)
+@click.option(
+    "--split-scenarios/--no-split-scenarios",
+    default=False,
+    help="when running with --workers, run each scenario (and each example "
+    "of a Scenario Outline) as its own task so the scenarios of a long "
+    "feature can run in parallel",
+)
+@click.option(
+    "--shard",
+    default=None,
+    help="only run the shard INDEX/TOTAL (1-based) of the features, which "
+    "are split deterministically into TOTAL shards of about the same "
+    "duration using --durations-db, to spread a run across machines",
+)
+@click.option(
+    "--rerun-failed",
+    default=None,
+    type=click.Path(path_type=Path, exists=True, dir_okay=False),
+    help="run.db file from a previous run, only the scenarios that failed, "
+    "errored or were terminated in that run are run again",
+)
+@click.option(
+    "--retry-failed",
+    default=0,
+    type=click.IntRange(min=0),
+    help="retry the scenarios that failed, errored or were terminated up to "
+    "N times at the end of the run, each in a fresh worker, and mark the "
+    "ones that pass on a retry as flaky",
+)
+@click.option(
+    "--changed-since",
+    default=None,
+    type=click.Path(path_type=Path, dir_okay=False),
+    help="index of the scenario inputs (feature text, step definition files "
+    "and cucurc.yml/environment.py files) recorded by the previous run, only "
+    "the scenarios whose inputs changed or that didn't pass are run and the "
+    "index is then updated",
+)
+@click.option(
+    "--shared-run-db",
+    default=False,
+    is_flag=True,
+    help="with --workers every worker writes to the run.db of the results "
+    "directory, in WAL mode so it can be queried during the run, instead of "
+    "its own database file merged into the run.db at the end of the run",
+)
 @click.option(
     "--secrets",
     default=None,
@@ -190,8 +269,22 @@ def main():
     "-w",
     "--workers",
     default=None,
-    help="Specifies the number of workers to use to run tests in parallel",
-    type=int,
+    help="Specifies the number of workers to use to run tests in parallel, "
+    "or auto to adjust the number of features run concurrently to the CPU "
+    "and memory available between --min-workers and --max-workers",
+)
+@click.option(
+    "--min-workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="the minimum number of features run concurrently with --workers auto",
+)
+@click.option(
+    "--max-workers",
+    default=None,
+    type=click.IntRange(min=1),
+    help="the maximum number of features run concurrently with "
+    "--workers auto, default: the number of CPUs",
 )
 @click.option(
     "--verbose/--no-verbose",
@@ -202,7 +295,8 @@ def main():
     "-s",
     "--selenium-remote-url",
     default=None,
-    help="the HTTP url for a selenium hub setup to run the browser tests on",
+    help="the HTTP url for a selenium hub setup to run the browser tests on, "
+    "or several comma separated urls to spread the browser sessions across",
 )
 @click.option(
     "--chrome-profile-dir",
@@ -231,11 +325,20 @@ def run(
     results,
     runtime_timeout,
     feature_timeout,
+    durations_db,
+    split_scenarios,
+    shard,
+    rerun_failed,
+    retry_failed,
+    changed_since,
+    shared_run_db,
     secrets,
     show_skips,
     tags,
     selenium_remote_url,
     workers,
+    min_workers,
+    max_workers,
     verbose,
     chrome_profile_dir,
 ):
@@ -270,6 +373,68 @@ def run(
     os.environ["CUCU_LOGGING_LEVEL"] = logging_level.upper()
     logger.init_logging(logging_level.upper())
 
+    if shard is not None:
+        try:
+            shard_index, shard_total = parse_shard(shard)
+        except ValueError as error:
+            raise ClickException(f"invalid --shard: {error}")
+
+    try:
+        workers = parse_workers(workers)
+    except ValueError as error:
+        raise ClickException(f"invalid --workers: {error}")
+
+    if workers == "auto":
+        max_workers = max_workers or os.cpu_count()
+        if min_workers > max_workers:
+            raise ClickException(
+                "--min-workers can not be greater than --max-workers"
+            )
+
+    if rerun_failed is not None and filepath:
+        raise ClickException("FILEPATH can not be used with --rerun-failed")
+
+    if retry_failed and fail_fast:
+        raise ClickException("--retry-failed can not be used with --fail-fast")
+
+    if rerun_failed is not None and changed_since is not None:
+        raise ClickException(
+            "--rerun-failed can not be used with --changed-since"
+        )
+
+    # load before the results directory is cleared as the previous run.db
+    # may very well live in it
+    durations = load_feature_durations(durations_db)
+
+    if rerun_failed is not None:
+        filepath = load_failed_scenarios(rerun_failed)
+        if not filepath:
+            logger.info(f"no failed scenarios to rerun in {rerun_failed}")
+            return
+
+        logger.info(
+            f"rerunning {len(filepath)} failed scenarios from {rerun_failed}"
+        )
+
+    if changed_since is not None:
+        impact_inputs = collect_scenario_inputs(
+            list(filepath) or [Path("features")], tags
+        )
+        impact_index = load_index(changed_since)
+        # loading the step definitions also registered the hooks of the
+        # environment.py files, which the run registers again
+        init_global_hook_variables()
+
+        filepath = select_changed_scenarios(impact_inputs, impact_index)
+        if not filepath:
+            logger.info(f"no scenarios changed since {changed_since}")
+            return
+
+        logger.info(
+            f"running {len(filepath)} of {len(impact_inputs)} scenarios "
+            f"changed since {changed_since}"
+        )
+
     if not preserve_results:
         if results.exists():
             shutil.rmtree(results)
@@ -301,6 +466,9 @@ def run(
     if record_env_vars:
         os.environ["CUCU_RECORD_ENV_VARS"] = "true"
 
+    if shared_run_db:
+        os.environ["CUCU_RUN_DB_SHARED"] = "true"
+
     cucu_run_id_seed = f"{time.perf_counter()}_{os.getpid()}"
     os.environ["CUCU_RUN_ID"] = CONFIG["CUCU_RUN_ID"] = generate_short_id(
         cucu_run_id_seed
@@ -337,10 +505,75 @@ def run(
     filepath_str = " ".join(str(p) for p in filepaths)
     os.environ["CUCU_FILEPATH"] = CONFIG["CUCU_FILEPATH"] = filepath_str
 
+    if shard is not None:
+        os.environ["CUCU_SHARD"] = CONFIG["CUCU_SHARD"] = shard
+
     create_run(results, filepaths)
 
+    if shard is not None:
+        scheduled_features = plan_features(
+            filepaths, durations, tags, split_scenarios
+        )
+        sharded_features = shard_features(
+            scheduled_features, shard_index, shard_total
+        )
+        logger.info(
+            f"shard {shard} runs {len(sharded_features)} of "
+            f"{len(scheduled_features)} features"
+        )
+        # keep the scenarios of a feature next to each other so a single
+        # process runs them as one feature
+        filepaths = sorted(
+            (feature_filepath for feature_filepath, _ in sharded_features),
+            key=str,
+        )
+
+    behave_args = [
+        color_output,
+        dry_run,
+        env,
+        fail_fast,
+        headless,
+        name,
+        debug_on_failure,
+        junit,
+        results,
+        secrets,
+        show_skips,
+        tags,
+        verbose,
+    ]
+
+    if sys.platform == "darwin":
+        logger.info(
+            "MAC OS detected, using 'forkserver' start method since 'fork' is unstable"
+        )
+        start_method = "forkserver"
+    else:
+        start_method = "fork"
+
+    # with --retry-failed the scenarios that failed are run again at the end
+    # of the run, the run passes when all of them eventually passed
+    def retry_failures():
+        if not retry_failed:
+            return False
+
+        return retry_failed_scenarios(
+            results,
+            junit,
+            retry_failed,
+            int(workers or 1),
+            start_method,
+            feature_timeout,
+            behave_args,
+            {"chrome_profile_dir": chrome_profile_dir},
+        )
+
     try:
-        if workers is None or workers == 1:
+        if not filepaths:
+            logger.warning(f"shard {shard} has no features to run")
+
+        elif workers is None or workers == 1:
             logger.debug(
                 f"Starting cucu_run {CONFIG['CUCU_RUN_ID']} with single worker"
             )
@@ -361,58 +594,58 @@ def run(
 
                 register_after_all_hook(cancel_timer)
 
+            browser_pool.register_hooks()
+
             exit_code = behave(
                 filepaths,
-                color_output,
-                dry_run,
-                env,
-                fail_fast,
-                headless,
-                name,
-                debug_on_failure,
-                junit,
-                results,
-                secrets,
-                show_skips,
-                tags,
-                verbose,
+                *behave_args,
                 chrome_profile_dir=chrome_profile_dir,
                 skip_init_global_hook_variables=True,
             )
 
-            if exit_code != 0:
+            if exit_code != 0 and not retry_failures():
                 raise ClickException("test run failed, see above for details")
 
         else:
             logger.debug(
                 f"Starting cucu_run {CONFIG['CUCU_RUN_ID']} with multiple workers: {workers}"
             )
-            feature_filepaths = []
-            for fp in filepaths:
-                if fp.is_dir():
-                    feature_filepaths.extend(fp.rglob("*.feature"))
-                else:
-                    feature_filepaths.append(fp)
-
-            if sys.platform == "darwin":
-                logger.info(
-                    "MAC OS detected, using 'forkserver' start method since 'fork' is unstable"
-                )
-                start_method = "forkserver"
-            else:
-                start_method = "fork"
+            scheduled_features = plan_features(
+                filepaths, durations, tags, split_scenarios
+            )
+
+            # with --fail-fast a worker that fails a scenario, or the parent
+            # when a feature fails, creates this file so the other workers
+            # skip their next scenarios and no more features are started
+            fail_fast_filepath = results / ".fail-fast"
+            if fail_fast:
+                fail_fast_filepath.unlink(missing_ok=True)
+                os.environ["CUCU_FAIL_FAST_FILEPATH"] = str(fail_fast_filepath)
+
+            controller = None
+            if workers == "auto":
+                controller = AdaptiveConcurrency(min_workers, max_workers)
+                workers = max_workers
+
+            # the forked workers must not share the parent's connection
+            close_db()
 
             with WorkerPool(
                 n_jobs=int(workers), start_method=start_method
             ) as pool:
-                # Each feature file is applied to the pool as an async task.
-                # It then polls the async result of each task. It the result
-                # is ready, it removes the result from the list of results that
-                # need to be checked again until all the results are checked.
-                # If the timer is triggered, it stops the while loop and
-                # logs all the unfinished features.
+                # Each feature file is applied to the pool as an async task
+                # whose completion callbacks push the outcome onto the
+                # completed queue, so the parent reacts to each feature as
+                # soon as it finishes instead of polling every task. If the
+                # timer is triggered or the run is killed, a None is pushed
+                # onto the queue which stops waiting for the remaining
+                # features and logs them as unfinished.
+                # With --workers auto the features are only applied to the
+                # pool as the adaptive concurrency allows, which is sampled
+                # while waiting on the completed queue.
                 # The pool is terminated automatically when it exits the
                 # context.
+                completed = queue.Queue()
                 timer = None
                 timeout_reached = False
                 if runtime_timeout:
@@ -422,6 +655,7 @@ def run(
                         nonlocal timeout_reached
                         logger.error("runtime timeout reached, aborting run")
                         timeout_reached = True
+                        completed.put(None)
 
                     timer = Timer(runtime_timeout, runtime_exit)
                     timer.start()
@@ -448,76 +682,118 @@ def run(
                     if timer:
                         timer.cancel()
 
+                    completed.put(None)
                     os.kill(os.getpid(), signal.SIGINT)
 
                 # This is for local runs where you want to cancel the run with a ctrl+c or SIGTERM
                 signal.signal(signal.SIGINT, handle_kill_signal)
                 signal.signal(signal.SIGTERM, handle_kill_signal)
 
+                # the features dispatched to the pool whose callback hasn't
+                # fired yet
+                running_features = set()
+
+                def on_success(feature_filepath):
+                    def callback(exit_code):
+                        running_features.discard(feature_filepath)
+                        completed.put((feature_filepath, exit_code, None))
+
+                    return callback
+
+                def on_error(feature_filepath):
+                    def callback(error):
+                        running_features.discard(feature_filepath)
+                        completed.put((feature_filepath, None, error))
+
+                    return callback
+
                 async_results = {}
-                for feature_filepath in feature_filepaths:
+                pending = collections.deque(scheduled_features)
+                remaining = dict.fromkeys(
+                    feature_filepath for feature_filepath, _ in pending
+                )
+
+                def dispatch():
+                    if fail_fast and pending and fail_fast_filepath.exists():
+                        logger.warning(
+                            f"fail fast: not running the {len(pending)} "
+                            "features left"
+                        )
+                        for feature_filepath, _ in pending:
+                            remaining.pop(feature_filepath)
+                        pending.clear()
+
+                    running = len(running_features)
+                    if controller is not None:
+                        concurrency = controller.update(running)
+                    elif fail_fast:
+                        # hold back the features that aren't running yet so
+                        # they can still be cancelled
+                        concurrency = int(workers)
+                    else:
+                        concurrency = len(pending)
+
+                    while pending and running < concurrency:
+                        dispatch_feature(*pending.popleft())
+                        running += 1
+
+                def dispatch_feature(feature_filepath, expected_duration):
+                    running_features.add(feature_filepath)
                     async_results[feature_filepath] = pool.apply_async(
-                        behave,
-                        [
-                            [feature_filepath],
-                            color_output,
-                            dry_run,
-                            env,
-                            fail_fast,
-                            headless,
-                            name,
-                            debug_on_failure,
-                            junit,
-                            results,
-                            secrets,
-                            show_skips,
-                            tags,
-                            verbose,
-                        ],
-                        {
-                            "chrome_profile_dir": chrome_profile_dir,
-                            "redirect_output": True,
-                        },
+                        run_feature,
+                        [[feature_filepath], *behave_args],
+                        {"chrome_profile_dir": chrome_profile_dir},
+                        callback=on_success(feature_filepath),
+                        error_callback=on_error(feature_filepath),
                         task_timeout=float(feature_timeout),
                     )
                     logger.info(f"scheduled feature file {feature_filepath}")
+                    logger.debug(
+                        f"expected duration of {feature_filepath}: {expected_duration:.1f}s"
+                    )
 
-                # poll while we have running tasks until the overall time limit
+                # wait for the tasks to complete until the overall time limit
                 task_failed = {}
-                while not timeout_reached:
-                    remaining = {}
-                    for feature, result in async_results.items():
-                        if timeout_reached:
-                            break
-
-                        if result.ready():
-                            try:
-                                # wait 0.1s max for interprocess communication
-                                exit_code = result.get(0.1)
-                                if exit_code != 0:
-                                    task_failed[feature] = result
-                            except TimeoutError as err:
-                                if f"timeout={feature_timeout}" in str(err):
-                                    print(f"{err}")
-                                    task_failed[feature] = result
-                                # ignore timeout errors from interprocess communication slowness
-                            except Exception:
-                                logger.exception(
-                                    f"an exception is raised during feature {feature}"
-                                )
-                                task_failed[feature] = result
-                        else:
-                            remaining[feature] = result
-
-                    async_results = remaining
+                timeout = None
+                if controller is not None:
+                    timeout = controller.sample_interval_s
+
+                while remaining:
+                    dispatch()
+                    try:
+                        outcome = completed.get(timeout=timeout)
+                    except queue.Empty:
+                        continue
 
-                    if len(remaining) == 0:
-                        if timer:
-                            # we're done so cancel any outstanding overall time limit
-                            timer.cancel()
+                    if outcome is None:
                         break
 
-                    time.sleep(1)
+                    feature, exit_code, error = outcome
+                    result = remaining.pop(feature)
+                    if isinstance(error, TimeoutError):
+                        print(f"{error}")
+                        task_failed[feature] = result
+                    elif error is not None:
+                        logger.error(
+                            f"an exception is raised during feature {feature}",
+                            exc_info=error,
+                        )
+                        task_failed[feature] = result
+                    elif exit_code != 0:
+                        task_failed[feature] = result
+
+                    if fail_fast and feature in task_failed:
+                        fail_fast_filepath.touch()
+
+                    finished = len(scheduled_features) - len(remaining)
+                    logger.debug(
+                        f"finished feature file {feature} "
+                        f"({finished}/{len(scheduled_features)})"
+                    )
+
+                if timer:
+                    # we're done so cancel any outstanding overall time limit
+                    timer.cancel()
 
                 if timeout_reached:
                     logger.warning(
@@ -525,13 +801,18 @@ def run(
                     )
                     kill_workers()
 
-                task_failed.update(async_results)
+                task_failed.update(remaining)
 
-                if task_failed:
-                    failing_features = [str(x) for x in task_failed.keys()]
-                    logger.error(
-                        f"Failing Features:\n{'\n'.join(failing_features)}"
-                    )
+                if controller is not None:
+                    record_concurrency_timeline(controller.timeline)
+
+            if task_failed:
+                failing_features = [str(x) for x in task_failed.keys()]
+                logger.error(
+                    f"Failing Features:\n{'\n'.join(failing_features)}"
+                )
+                # features that never finished can't be retried
+                if remaining or not retry_failures():
                     raise RuntimeError(
                         "there are failures, see above for details"
                     )
@@ -543,11 +824,24 @@ def run(
             finish_worker_record(worker_run_id=CONFIG.get("WORKER_PARENT_ID"))
             consolidate_database_files(results)
 
+        if junit.exists():
+            merge_junit_fragments(junit)
+
+        if fail_fast:
+            (results / ".fail-fast").unlink(missing_ok=True)
+
+        if changed_since is not None:
+            update_index(
+                changed_since, impact_inputs, impact_index, results / "run.db"
+            )
+
         if generate_report:
+            # the report is generated with as many processes as the run used
             _generate_report(
                 results_dir=results,
                 report_folder=report,
                 junit_folder=junit,
+                jobs=max_workers if workers == "auto" else workers or 1,
             )
 
 
@@ -556,8 +850,20 @@ def _generate_report(
     report_folder: Path,
     junit_folder: Path | None = None,
     combine: bool = False,
+    jobs: int = 1,
+    incremental: bool = False,
+    link_mode: str = "copy",
 ):
-    if report_folder.exists():
+    in_place = report_folder.resolve() == results_dir.resolve()
+    if in_place and incremental:
+        raise ClickException(
+            "an incremental report can't be generated in place over the "
+            "results directory"
+        )
+
+    # an incremental report keeps the pages of the features that didn't change
+    # and a report generated in place keeps the results it is generated over
+    if report_folder.exists() and not incremental and not in_place:
         shutil.rmtree(report_folder)
 
     report_folder.mkdir(parents=True, exist_ok=True)
@@ -565,7 +871,13 @@ def _generate_report(
     if results_dir.exists():
         consolidate_database_files(results_dir, combine)
 
-    report_location = reporter.generate(results_dir, report_folder)
+    report_location = reporter.generate(
+        results_dir,
+        report_folder,
+        jobs=jobs,
+        incremental=incremental,
+        link_mode=link_mode,
+    )
     print(f"HTML test report at {report_location}")
 
     if junit_folder:
@@ -627,6 +939,35 @@ def _generate_report(
     is_flag=True,
     help="combine multiple cucu_runs into a single report",
 )
+@click.option(
+    "--jobs",
+    default=1,
+    type=click.IntRange(min=1),
+    help="the number of processes generating the pages of the features "
+    "concurrently",
+)
+@click.option(
+    "--incremental",
+    default=False,
+    is_flag=True,
+    help="only generate the pages of the features whose results changed "
+    "since the report in --output was generated, along with the index and "
+    "flat pages",
+)
+@click.option(
+    "--link-mode",
+    default="copy",
+    type=click.Choice(LINK_MODES),
+    help="how the screenshots, logs and assets are placed into the report: "
+    "copied, reflinked, hard-linked or symlinked to the results, auto picks "
+    "the first of those the filesystem supports, falling back to copying",
+)
+@click.option(
+    "--in-place",
+    default=False,
+    is_flag=True,
+    help="generate the report in place over RESULTS_DIR instead of --output",
+)
 def report(
     results_dir: Path,
     logging_level,
@@ -634,10 +975,17 @@ def report(
     output: Path,
     junit: Path,
     combine: bool,
+    jobs: int,
+    incremental: bool,
+    link_mode: str,
+    in_place: bool,
 ):
     """
     generate a test report from a results directory
     """
+    if in_place:
+        output = results_dir
+
     init_global_hook_variables()
 
     os.environ["CUCU_LOGGING_LEVEL"] = logging_level.upper()
@@ -665,9 +1013,217 @@ def report(
         report_folder=output,
         junit_folder=junit,
         combine=combine,
+        jobs=jobs,
+        incremental=incremental,
+        link_mode=link_mode,
     )
 
 
+@main.command()
+@click.argument(
+    "run_db", nargs=-1, type=click.Path(path_type=Path, exists=True)
+)
+@click.option(
+    "--history-db",
+    default=".cucu/history.db",
+    type=click.Path(path_type=Path, dir_okay=False),
+    help="the history database the completed runs of each RUN_DB are "
+    "ingested into, once per run, and which is then reported on",
+)
+@click.option(
+    "--days",
+    default=7,
+    type=click.IntRange(min=1),
+    help="the number of days to report on, regressions are measured against "
+    "the same number of days before",
+)
+@click.option(
+    "--limit",
+    default=10,
+    type=click.IntRange(min=1),
+    help="the maximum number of rows of each table",
+)
+@click.option(
+    "--min-runs",
+    default=3,
+    type=click.IntRange(min=1),
+    help="the minimum number of passing runs of a scenario in both windows "
+    "for a duration regression to be reported",
+)
+@click.option(
+    "-l",
+    "--logging-level",
+    default="INFO",
+    help="set logging level to one of debug, warn or info (default)",
+)
+def history(run_db, history_db, days, limit, min_runs, logging_level):
+    """
+    ingest run.db files into the history database and report the duration
+    percentiles, duration regressions, pass, fail and flake rates and the
+    slowest steps of the last days
+    """
+    os.environ["CUCU_LOGGING_LEVEL"] = logging_level.upper()
+    logger.init_logging(logging_level.upper())
+
+    conn = run_history.create_history_database(history_db)
+    try:
+        for run_db_path in run_db:
+            ingested = run_history.ingest_run_database(conn, run_db_path)
+            logger.info(f"ingested {ingested} runs from {run_db_path}")
+
+        def print_table(title, rows):
+            print(f"\n{title}")
+            if not rows:
+                print("nothing to report")
+                return
+
+            rows = [
+                {
+                    key: f"{value:.1%}"
+                    if key.endswith("rate") or key == "change"
+                    else round(value, 3)
+                    if isinstance(value, float)
+                    else value
+                    for key, value in row.items()
+                }
+                for row in rows[:limit]
+            ]
+            print(tabulate(rows, headers="keys"))
+
+        print_table(
+            f"scenario durations (s) over the last {days} days",
+            run_history.scenario_durations(conn, days),
+        )
+        print_table(
+            f"scenario duration regressions over the previous {days} days",
+            run_history.duration_regressions(conn, days, min_runs),
+        )
+        print_table(
+            f"feature results over the last {days} days",
+            run_history.result_rates(conn, days, by_feature=True),
+        )
+        print_table(
+            f"scenario results over the last {days} days",
+            run_history.result_rates(conn, days),
+        )
+        print_table(
+            f"slowest steps (s) over the last {days} days",
+            run_history.slowest_steps(conn, days),
+        )
+    finally:
+        conn.close()
+
+
+@main.command()
+@click.argument(
+    "name", metavar="NAME", type=click.Choice(list(run_query.QUERIES))
+)
+@click.argument(
+    "results", default="results", type=click.Path(path_type=Path, exists=True)
+)
+@click.option(
+    "--limit",
+    default=10,
+    type=click.IntRange(min=1),
+    help="the maximum number of rows returned",
+)
+@click.option(
+    "-f",
+    "--format",
+    default="table",
+    type=click.Choice(run_query.FORMATS),
+    help="output format to use, default: table",
+)
+def query(name, results, limit, format):
+    """
+    run the named query against the run.db of a results directory, or the
+    run.db provided, to triage a run: slowest-scenarios, slowest-steps,
+    failures, duration-by-tag or worker-utilization
+    """
+    run_db_path = results / "run.db" if results.is_dir() else results
+    if not run_db_path.exists():
+        raise ClickException(f"no run.db found at {run_db_path}")
+
+    rows = run_query.run_query(name, run_db_path, limit)
+    click.echo(run_query.format_rows(rows, format))
+
+
+@main.command()
+@click.argument(
+    "results",
+    nargs=-1,
+    required=True,
+    type=click.Path(path_type=Path, exists=True),
+)
+@click.option(
+    "-o",
+    "--output",
+    default="export",
+    type=click.Path(path_type=Path, file_okay=False),
+    help="the directory the files of every table are written to",
+)
+@click.option(
+    "-f",
+    "--format",
+    default="parquet",
+    type=click.Choice(["parquet", "arrow"]),
+    help="output format to use, default: parquet",
+)
+@click.option(
+    "--include-payloads",
+    default=False,
+    is_flag=True,
+    help="when set the step output, screenshots and browser logs and the "
+    "scenario config and browser info are exported as well",
+)
+@click.option(
+    "--batch-size",
+    default=10000,
+    type=click.IntRange(min=1),
+    help="the maximum number of rows read and written at once",
+)
+@click.option(
+    "-l",
+    "--logging-level",
+    default="INFO",
+    help="set logging level to one of debug, warn or info (default)",
+)
+def export(
+    results, output, format, include_payloads, batch_size, logging_level
+):
+    """
+    export the runs recorded in the run.db of each results directory, or each
+    run.db provided, into columnar files partitioned by cucu_run_id
+    """
+    os.environ["CUCU_LOGGING_LEVEL"] = logging_level.upper()
+    logger.init_logging(logging_level.upper())
+
+    try:
+        from cucu.cli import export as run_export
+    except ModuleNotFoundError as error:
+        if error.name != "pyarrow":
+            raise
+
+        raise ClickException(
+            "cucu export requires pyarrow, install it with: "
+            "pip install 'cucu[export]'"
+        )
+
+    for path in results:
+        run_db_path = path / "run.db" if path.is_dir() else path
+        if not run_db_path.exists():
+            raise ClickException(f"no run.db found at {run_db_path}")
+
+        filepaths = run_export.export_run_database(
+            run_db_path,
+            output,
+            format=format,
+            include_payloads=include_payloads,
+            batch_size=batch_size,
+        )
+        logger.info(f"exported {run_db_path} to {len(filepaths)} files")
+
+
 @main.command()
 @click.argument(
     "filepath", default="features", type=click.Path(path_type=Path)
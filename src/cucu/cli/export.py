@@ -0,0 +1,257 @@
+"""
+columnar export of run.db files for `cucu export`: the cucu_run, worker,
+feature, scenario and step tables are streamed in batches into Parquet or
+Arrow files partitioned by cucu_run_id, `TABLE/cucu_run_id=ID/part-0.parquet`,
+with typed timestamp and duration columns so thousands of runs can be loaded
+as a single dataset.
+"""
+
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet
+from peewee import (
+    BooleanField,
+    DateTimeField,
+    FloatField,
+    IntegerField,
+)
+
+from cucu import db
+
+FORMATS = ["parquet", "arrow"]
+
+# the tables exported and the joins to the worker table which records the
+# cucu_run_id each row is partitioned by
+TABLES = {
+    "cucu_run": ("t.cucu_run_id", ""),
+    "worker": ("t.cucu_run_id", ""),
+    "feature": (
+        "w.cucu_run_id",
+        "JOIN worker w ON t.worker_run_id = w.worker_run_id",
+    ),
+    "scenario": (
+        "w.cucu_run_id",
+        "JOIN feature f ON t.feature_run_id = f.feature_run_id "
+        "JOIN worker w ON f.worker_run_id = w.worker_run_id",
+    ),
+    "step": (
+        "w.cucu_run_id",
+        "JOIN scenario s ON t.scenario_run_id = s.scenario_run_id "
+        "JOIN feature f ON s.feature_run_id = f.feature_run_id "
+        "JOIN worker w ON f.worker_run_id = w.worker_run_id",
+    ),
+}
+
+# the JSON columns which hold the step output, screenshots and browser logs,
+# only exported with --include-payloads
+PAYLOAD_COLUMNS = {
+    "scenario": ["browser_info", "cucu_config"],
+    "step": db.STEP_PAYLOAD_FIELDS,
+}
+
+BATCH_SIZE = 10000
+
+
+def parse_timestamp(value):
+    if value is None or isinstance(value, datetime):
+        return value
+
+    return datetime.fromisoformat(value)
+
+
+def parse_duration(value):
+    return None if value is None else timedelta(seconds=value)
+
+
+def parse_bool(value):
+    return None if value is None else bool(value)
+
+
+def resolve_payload(value):
+    # the large step payloads are stored as references to the blob table
+    if value is None:
+        return None
+
+    return json.dumps(db.load_payload(json.loads(value)))
+
+
+def column_type(field):
+    """
+    the arrow type of the column of the peewee field provided, and the
+    function converting the values read from sqlite to it
+    """
+    if isinstance(field, DateTimeField):
+        return pa.timestamp("us"), parse_timestamp
+
+    if isinstance(field, FloatField):
+        if field.name == "duration":
+            return pa.duration("us"), parse_duration
+
+        return pa.float64(), None
+
+    if isinstance(field, BooleanField):
+        return pa.bool_(), parse_bool
+
+    if isinstance(field, IntegerField):
+        return pa.int64(), None
+
+    # the JSON columns are exported as their JSON text
+    return pa.string(), None
+
+
+def table_columns(conn, table_name, include_payloads):
+    """
+    the columns of the table exported as (name, arrow type, converter) tuples,
+    leaving out the columns missing from run.db files created by older
+    versions of cucu
+    """
+    existing = [
+        row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")
+    ]
+    payloads = [] if include_payloads else PAYLOAD_COLUMNS.get(table_name, [])
+
+    columns = []
+    model = getattr(db, table_name)
+    for field in model._meta.sorted_fields:
+        name = field.column_name
+        # cucu_run_id is the partition of every table
+        if name not in existing or name in payloads or name == "cucu_run_id":
+            continue
+
+        arrow_type, convert = column_type(field)
+        if table_name == "step" and name in db.STEP_PAYLOAD_FIELDS:
+            convert = resolve_payload
+
+        columns.append((name, arrow_type, convert))
+
+    return columns
+
+
+class PartitionWriter:
+    """
+    writes the record batches of a table to the file of the partition of each
+    cucu_run_id, one partition open at a time as the rows are read ordered by
+    cucu_run_id
+    """
+
+    def __init__(self, output_dir, table_name, schema, format):
+        self.output_dir = Path(output_dir)
+        self.table_name = table_name
+        self.schema = schema
+        self.format = format
+        self.cucu_run_id = None
+        self.writer = None
+        self.filepaths = []
+
+    def open(self, cucu_run_id):
+        self.close()
+
+        dirpath = (
+            self.output_dir / self.table_name / f"cucu_run_id={cucu_run_id}"
+        )
+        dirpath.mkdir(parents=True, exist_ok=True)
+        filepath = dirpath / f"part-0.{self.format}"
+
+        if self.format == "parquet":
+            self.writer = pyarrow.parquet.ParquetWriter(filepath, self.schema)
+        else:
+            self.writer = pyarrow.ipc.new_file(filepath, self.schema)
+
+        self.cucu_run_id = cucu_run_id
+        self.filepaths.append(filepath)
+
+    def write(self, cucu_run_id, rows, columns):
+        if cucu_run_id != self.cucu_run_id:
+            self.open(cucu_run_id)
+
+        arrays = []
+        for index, (_, arrow_type, convert) in enumerate(columns):
+            values = [row[index] for row in rows]
+            if convert is not None:
+                values = [convert(value) for value in values]
+
+            arrays.append(pa.array(values, type=arrow_type))
+
+        self.writer.write_batch(
+            pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        )
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def export_table(
+    conn, table_name, output_dir, format, include_payloads, batch_size
+):
+    """
+    stream the rows of the table provided into its partitioned files
+    """
+    columns = table_columns(conn, table_name, include_payloads)
+    schema = pa.schema([(name, arrow_type) for name, arrow_type, _ in columns])
+    partition, joins = TABLES[table_name]
+    select = ", ".join(f"t.{name}" for name, _, _ in columns)
+
+    cursor = conn.execute(
+        f"SELECT {partition}, {select} FROM {table_name} t {joins} "
+        f"ORDER BY {partition}"
+    )
+
+    writer = PartitionWriter(output_dir, table_name, schema, format)
+    try:
+        rows, rows_cucu_run_id = [], None
+        while batch := cursor.fetchmany(batch_size):
+            # a record batch holds the rows of a single partition
+            for cucu_run_id, *row in batch:
+                if rows and cucu_run_id != rows_cucu_run_id:
+                    writer.write(rows_cucu_run_id, rows, columns)
+                    rows = []
+
+                rows_cucu_run_id = cucu_run_id
+                rows.append(row)
+
+            if rows:
+                writer.write(rows_cucu_run_id, rows, columns)
+                rows = []
+    finally:
+        writer.close()
+
+    return writer.filepaths
+
+
+def export_run_database(
+    run_db_path,
+    output_dir,
+    format="parquet",
+    include_payloads=False,
+    batch_size=BATCH_SIZE,
+):
+    """
+    export the tables of the run.db provided into partitioned columnar files
+    """
+    filepaths = []
+
+    # the peewee database is bound to resolve the payloads stored as blobs
+    db.init_html_report_db(run_db_path)
+    conn = sqlite3.connect(run_db_path)
+    try:
+        for table_name in TABLES:
+            filepaths += export_table(
+                conn,
+                table_name,
+                output_dir,
+                format,
+                include_payloads,
+                batch_size,
+            )
+    finally:
+        conn.close()
+        db.close_html_report_db()
+
+    return filepaths
@@ -0,0 +1,337 @@
+"""
+cross-run history for `cucu history`: the scenarios and steps of completed
+run.db files are ingested once per cucu_run_id into a history database which
+is then queried for duration percentiles, duration regressions, pass, fail and
+flake rates and the slowest steps over a time window.
+"""
+
+import math
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from cucu import logger
+
+# a scenario regressed when the median duration of its passing runs in the
+# window grew by more than this ratio over the previous window
+REGRESSION_THRESHOLD = 0.2
+
+FAILED_STATUSES = ["failed", "error", "terminated"]
+
+
+def create_history_database(history_db_path):
+    """
+    open the history database at the path provided, creating it when needed
+    """
+    history_db_path = Path(history_db_path)
+    history_db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(history_db_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS run (
+            cucu_run_id TEXT PRIMARY KEY,
+            filepath TEXT,
+            start_at TEXT,
+            end_at TEXT,
+            run_db_path TEXT,
+            ingested_at TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS scenario (
+            scenario_run_id TEXT PRIMARY KEY,
+            cucu_run_id TEXT NOT NULL REFERENCES run (cucu_run_id),
+            feature_name TEXT NOT NULL,
+            scenario_name TEXT NOT NULL,
+            filename TEXT,
+            line_number INTEGER,
+            status TEXT,
+            flaky INTEGER,
+            duration REAL,
+            start_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS scenario_start_at
+            ON scenario (start_at);
+        CREATE INDEX IF NOT EXISTS scenario_name_start_at
+            ON scenario (feature_name, scenario_name, start_at);
+
+        CREATE TABLE IF NOT EXISTS step (
+            step_run_id TEXT PRIMARY KEY,
+            scenario_run_id TEXT NOT NULL,
+            cucu_run_id TEXT NOT NULL REFERENCES run (cucu_run_id),
+            name TEXT NOT NULL,
+            status TEXT,
+            duration REAL,
+            start_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS step_start_at ON step (start_at);
+    """)
+
+    return conn
+
+
+def ingest_run_database(conn, run_db_path):
+    """
+    copy the scenarios and steps of the completed runs recorded in the
+    run.db provided into the history database and return how many runs were
+    ingested, the runs already ingested are left out
+    """
+    conn.execute("ATTACH DATABASE ? AS source", [str(run_db_path)])
+    try:
+        scenario_columns = [
+            row[1]
+            for row in conn.execute("PRAGMA source.table_info(scenario)")
+        ]
+        # run.db files created by older versions of cucu don't record the
+        # attempts retried by --retry-failed
+        flaky = "s.flaky" if "flaky" in scenario_columns else "NULL"
+        not_retried = (
+            "s.retried IS NOT 1" if "retried" in scenario_columns else "1"
+        )
+        new_runs = """
+            SELECT cucu_run_id FROM source.cucu_run
+            WHERE end_at IS NOT NULL
+            AND cucu_run_id NOT IN (SELECT cucu_run_id FROM main.run)
+        """
+
+        conn.execute(f"""
+            INSERT OR IGNORE INTO main.scenario
+            SELECT
+                s.scenario_run_id,
+                w.cucu_run_id,
+                f.name,
+                s.name,
+                f.filename,
+                s.line_number,
+                s.status,
+                {flaky},
+                s.duration,
+                COALESCE(s.start_at, f.start_at)
+            FROM source.scenario s
+            JOIN source.feature f ON s.feature_run_id = f.feature_run_id
+            JOIN source.worker w ON f.worker_run_id = w.worker_run_id
+            WHERE {not_retried} AND w.cucu_run_id IN ({new_runs})
+        """)
+
+        # the substeps are already part of the duration of their step
+        conn.execute(f"""
+            INSERT OR IGNORE INTO main.step
+            SELECT
+                st.step_run_id,
+                st.scenario_run_id,
+                w.cucu_run_id,
+                st.name,
+                st.status,
+                st.duration,
+                st.start_at
+            FROM source.step st
+            JOIN source.scenario s ON st.scenario_run_id = s.scenario_run_id
+            JOIN source.feature f ON s.feature_run_id = f.feature_run_id
+            JOIN source.worker w ON f.worker_run_id = w.worker_run_id
+            WHERE st.is_substep IS NOT 1
+            AND {not_retried}
+            AND w.cucu_run_id IN ({new_runs})
+        """)
+
+        ingested = conn.execute(
+            f"""
+            INSERT INTO main.run
+            SELECT cucu_run_id, filepath, start_at, end_at, ?, ?
+            FROM source.cucu_run
+            WHERE cucu_run_id IN ({new_runs})
+            """,
+            [str(run_db_path), datetime.now().isoformat(sep=" ")],
+        ).rowcount
+        conn.commit()
+    finally:
+        conn.rollback()
+        conn.execute("DETACH DATABASE source")
+
+    logger.debug(f"ingested {ingested} runs from {run_db_path}")
+    return ingested
+
+
+def percentile(values, percent):
+    """
+    nearest-rank percentile of the sorted values provided
+    """
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def window(days, until=None):
+    """
+    the bounds of the last `days` days until the datetime provided, or now,
+    as the text the timestamps are stored as
+    """
+    until = until or datetime.now()
+    since = until - timedelta(days=days)
+    return since.isoformat(sep=" "), until.isoformat(sep=" ")
+
+
+def passed_durations(conn, since, until):
+    """
+    the sorted durations of the passing runs of every scenario between the
+    bounds provided, keyed by (feature name, scenario name)
+    """
+    durations = {}
+    rows = conn.execute(
+        """
+        SELECT feature_name, scenario_name, duration
+        FROM scenario
+        WHERE start_at >= ? AND start_at < ?
+        AND status = 'passed' AND duration IS NOT NULL
+        ORDER BY feature_name, scenario_name, duration
+        """,
+        [since, until],
+    )
+    for feature_name, scenario_name, duration in rows:
+        durations.setdefault((feature_name, scenario_name), []).append(
+            duration
+        )
+
+    return durations
+
+
+def scenario_durations(conn, days, until=None):
+    """
+    duration percentiles of the passing runs of every scenario over the last
+    `days` days, the slowest first
+    """
+    since, until = window(days, until)
+
+    stats = [
+        {
+            "feature": feature_name,
+            "scenario": scenario_name,
+            "runs": len(durations),
+            "p50": percentile(durations, 50),
+            "p90": percentile(durations, 90),
+            "p95": percentile(durations, 95),
+            "max": durations[-1],
+        }
+        for (feature_name, scenario_name), durations in passed_durations(
+            conn, since, until
+        ).items()
+    ]
+    return sorted(stats, key=lambda stat: stat["p95"], reverse=True)
+
+
+def duration_regressions(conn, days, min_runs=3, until=None):
+    """
+    scenarios whose median duration over the last `days` days grew by more
+    than REGRESSION_THRESHOLD over the `days` days before, with at least
+    `min_runs` passing runs in each window, the largest regression first
+    """
+    since, until = window(days, until)
+    previous_since, _ = window(days, datetime.fromisoformat(since))
+
+    current = passed_durations(conn, since, until)
+    previous = passed_durations(conn, previous_since, since)
+
+    regressions = []
+    for key, durations in current.items():
+        previous_durations = previous.get(key, [])
+        if len(durations) < min_runs or len(previous_durations) < min_runs:
+            continue
+
+        p50 = percentile(durations, 50)
+        previous_p50 = percentile(previous_durations, 50)
+        if previous_p50 <= 0:
+            continue
+
+        change = p50 / previous_p50 - 1
+        if change > REGRESSION_THRESHOLD:
+            regressions.append(
+                {
+                    "feature": key[0],
+                    "scenario": key[1],
+                    "previous p50": previous_p50,
+                    "p50": p50,
+                    "change": change,
+                }
+            )
+
+    return sorted(regressions, key=lambda stat: stat["change"], reverse=True)
+
+
+def result_rates(conn, days, by_feature=False, until=None):
+    """
+    pass, fail and flake rates over the last `days` days of every scenario,
+    or every feature, the least stable first
+    """
+    since, until = window(days, until)
+    group_by = "feature_name" if by_feature else "feature_name, scenario_name"
+    failed = ", ".join(f"'{status}'" for status in FAILED_STATUSES)
+
+    rows = conn.execute(
+        f"""
+        SELECT
+            {group_by},
+            COUNT(*) AS runs,
+            SUM(CASE WHEN status = 'passed' THEN 1 ELSE 0 END) AS passed,
+            SUM(CASE WHEN status IN ({failed}) THEN 1 ELSE 0 END) AS failed,
+            SUM(CASE WHEN flaky = 1 THEN 1 ELSE 0 END) AS flaky
+        FROM scenario
+        WHERE start_at >= ? AND start_at < ?
+        AND status IS NOT NULL AND status != 'skipped'
+        GROUP BY {group_by}
+        """,
+        [since, until],
+    ).fetchall()
+
+    rates = []
+    for *names, runs, passed, failed, flaky in rows:
+        rate = {"feature": names[0]}
+        if not by_feature:
+            rate["scenario"] = names[1]
+
+        rate.update(
+            {
+                "runs": runs,
+                "pass rate": passed / runs,
+                "fail rate": failed / runs,
+                "flake rate": flaky / runs,
+            }
+        )
+        rates.append(rate)
+
+    return sorted(
+        rates,
+        key=lambda rate: (
+            rate["fail rate"] + rate["flake rate"],
+            rate["runs"],
+        ),
+        reverse=True,
+    )
+
+
+def slowest_steps(conn, days, until=None):
+    """
+    duration stats of every step over the last `days` days, the slowest on
+    average first
+    """
+    since, until = window(days, until)
+    rows = conn.execute(
+        """
+        SELECT name, duration
+        FROM step
+        WHERE start_at >= ? AND start_at < ? AND duration IS NOT NULL
+        ORDER BY name, duration
+        """,
+        [since, until],
+    )
+
+    durations = {}
+    for name, duration in rows:
+        durations.setdefault(name, []).append(duration)
+
+    stats = [
+        {
+            "step": name,
+            "runs": len(values),
+            "avg": sum(values) / len(values),
+            "p95": percentile(values, 95),
+            "max": values[-1],
+        }
+        for name, values in durations.items()
+    ]
+    return sorted(stats, key=lambda stat: stat["avg"], reverse=True)
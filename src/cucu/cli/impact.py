@@ -0,0 +1,197 @@
+"""
+test impact selection for `cucu run --changed-since INDEX`: the index records
+a hash of the inputs of every scenario, its own text, the files of the step
+definitions its steps matched and the cucurc.yml and environment.py files in
+its path, along with the status of its last run so the following runs only
+run the scenarios whose inputs changed or which didn't pass last time.
+"""
+
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+
+from behave.runner import the_step_registry
+
+from cucu import logger
+from cucu.cli.scheduler import (
+    collect_feature_filepaths,
+    normalize_feature_filename,
+    walk_scenarios,
+)
+from cucu.cli.steps import load_cucu_steps
+
+INDEX_VERSION = 1
+
+# statuses of the last run that don't require the scenario to run again when
+# its inputs haven't changed
+UNCHANGED_STATUSES = ["passed", "skipped"]
+
+
+def hash_file(filepath, cache):
+    filepath = Path(filepath)
+    if filepath not in cache:
+        if filepath.is_file():
+            cache[filepath] = hashlib.sha256(filepath.read_bytes()).hexdigest()
+        else:
+            cache[filepath] = None
+
+    return cache[filepath]
+
+
+def config_filepaths(feature_filepath):
+    """
+    the files in the path of the feature file that affect how it runs: the
+    ~/.cucurc.yml and then the cucurc.yml and environment.py files of every
+    directory from the current working directory down to the feature file
+    """
+    filepaths = [Path.home() / ".cucurc.yml"]
+
+    dirpath = Path(feature_filepath).absolute().parent
+    dirpaths = [dirpath, *dirpath.parents]
+    if Path.cwd() in dirpaths:
+        dirpaths = dirpaths[: dirpaths.index(Path.cwd()) + 1]
+    else:
+        dirpaths = [dirpath]
+
+    for dirpath in reversed(dirpaths):
+        filepaths.append(dirpath / "cucurc.yml")
+        filepaths.append(dirpath / "environment.py")
+
+    return filepaths
+
+
+def hash_scenario(scenario, input_filepaths, cache):
+    digest = hashlib.sha256()
+
+    def update(*values):
+        for value in values:
+            digest.update(json.dumps(value).encode("utf8"))
+
+    update(scenario.keyword, scenario.name, sorted(scenario.effective_tags))
+    for step in scenario.all_steps:
+        table = None
+        if step.table:
+            table = [step.table.headings, *[list(row) for row in step.table]]
+
+        update(step.keyword, step.name, step.text, table)
+
+    for filepath in sorted(input_filepaths, key=str):
+        update(str(filepath), hash_file(filepath, cache))
+
+    return digest.hexdigest()
+
+
+def collect_scenario_inputs(filepaths, tags):
+    """
+    hash the inputs of every scenario that would run from the filepaths
+    provided, keyed by `path/to/file.feature::Scenario name`
+    """
+    # the step definitions are loaded into behave's step registry which is
+    # used to find the step definition each step matches
+    for filepath in filepaths:
+        load_cucu_steps(filepath=str(filepath))
+
+    cache = {}
+    inputs = {}
+
+    feature_filepaths = collect_feature_filepaths(filepaths)
+    for filepath, scenario in walk_scenarios(feature_filepaths, tags):
+        input_filepaths = set(config_filepaths(filepath))
+        for step in scenario.all_steps:
+            step_definition = the_step_registry.find_step_definition(step)
+            if step_definition is not None:
+                input_filepaths.add(Path(step_definition.location.filename))
+
+        filename = normalize_feature_filename(filepath)
+        key = f"{filename}::{scenario.name}"
+        occurrence = 1
+        while key in inputs:
+            occurrence += 1
+            key = f"{filename}::{scenario.name} #{occurrence}"
+
+        inputs[key] = {
+            "target": f"{filename}:{scenario.line}",
+            "hash": hash_scenario(scenario, input_filepaths, cache),
+        }
+
+    return inputs
+
+
+def load_index(index_path):
+    """
+    load the scenarios recorded in the index at the path provided, if any
+    """
+    index_path = Path(index_path)
+    if not index_path.exists():
+        logger.info(f"index {index_path} not found, running every scenario")
+        return {}
+
+    index = json.loads(index_path.read_text(encoding="utf8"))
+    if index.get("version") != INDEX_VERSION:
+        logger.info(f"index {index_path} is outdated, running every scenario")
+        return {}
+
+    return index["scenarios"]
+
+
+def select_changed_scenarios(inputs, index):
+    """
+    the `path/to/file.feature:LINE` targets of the scenarios that are new,
+    whose inputs changed or which didn't pass the last time they ran
+    """
+    targets = []
+
+    for key, scenario_inputs in inputs.items():
+        recorded = index.get(key)
+        if (
+            recorded is None
+            or recorded["hash"] != scenario_inputs["hash"]
+            or recorded["status"] not in UNCHANGED_STATUSES
+        ):
+            targets.append(scenario_inputs["target"])
+
+    return [Path(target) for target in sorted(targets)]
+
+
+def update_index(index_path, inputs, index, run_db_path):
+    """
+    record in the index the inputs and status of every scenario that ran in
+    the run.db provided, keeping the entries of the scenarios that didn't run
+    """
+    statuses = {}
+    if Path(run_db_path).exists():
+        with sqlite3.connect(run_db_path) as conn:
+            # the last attempt of the scenarios retried by --retry-failed
+            # is the one recorded
+            rows = conn.execute("""
+                SELECT f.filename, s.line_number, s.status
+                FROM scenario s
+                JOIN feature f ON s.feature_run_id = f.feature_run_id
+                WHERE s.status IS NOT NULL
+                ORDER BY s.attempt
+            """).fetchall()
+
+        for filename, line_number, status in rows:
+            target = f"{normalize_feature_filename(filename)}:{line_number}"
+            statuses[target] = status
+
+    scenarios = dict(index)
+    for key, scenario_inputs in inputs.items():
+        status = statuses.get(scenario_inputs["target"])
+        if status is not None:
+            scenarios[key] = {
+                "hash": scenario_inputs["hash"],
+                "status": status,
+            }
+
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    index_path.write_text(
+        json.dumps(
+            {"version": INDEX_VERSION, "scenarios": scenarios},
+            indent=2,
+            sort_keys=True,
+        ),
+        encoding="utf8",
+    )
@@ -0,0 +1,218 @@
+"""
+named queries of `cucu query` to triage the results recorded in a run.db,
+built on the models of `cucu.db`, each returns a list of rows as dictionaries
+which are printed as a table, JSON or CSV
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from peewee import JOIN, fn
+from tabulate import tabulate
+
+from cucu import db
+
+FORMATS = ["table", "json", "csv"]
+
+
+def not_retried():
+    # leave out the attempts retried by --retry-failed, which a run.db of an
+    # older version of cucu doesn't record
+    columns = [column.name for column in db.db.get_columns("scenario")]
+    if "retried" not in columns:
+        return True
+
+    return db.scenario.retried.is_null() | (db.scenario.retried == False)  # noqa: E712
+
+
+def slowest_scenarios(limit):
+    """
+    the slowest scenarios of the run
+    """
+    query = (
+        db.scenario.select(
+            db.feature.name.alias("feature"),
+            db.scenario.name.alias("scenario"),
+            db.scenario.status,
+            db.scenario.duration,
+        )
+        .join(db.feature)
+        .where(not_retried() & db.scenario.duration.is_null(False))
+        .order_by(db.scenario.duration.desc())
+        .limit(limit)
+    )
+    return list(query.dicts())
+
+
+def slowest_steps(limit):
+    """
+    the slowest steps of the run, such as the steps stuck retrying until
+    they timed out
+    """
+    query = (
+        db.step.select(
+            db.feature.name.alias("feature"),
+            db.scenario.name.alias("scenario"),
+            db.step.keyword,
+            db.step.name.alias("step"),
+            db.step.status,
+            db.step.duration,
+        )
+        .join(db.scenario)
+        .join(db.feature)
+        .where(not_retried() & db.step.duration.is_null(False))
+        .order_by(db.step.duration.desc())
+        .limit(limit)
+    )
+    return list(query.dicts())
+
+
+def failures(limit):
+    """
+    the failed steps grouped by the first line of their error, the most
+    frequent first
+    """
+    error = fn.COALESCE(
+        fn.json_extract(db.step.exception, "$[0]"),
+        fn.json_extract(db.step.error_message, "$[0]"),
+    ).coerce(False)
+    query = (
+        db.step.select(
+            error.alias("error"),
+            fn.COUNT(db.step.step_run_id).alias("steps"),
+            fn.COUNT(fn.DISTINCT(db.scenario.scenario_run_id)).alias(
+                "scenarios"
+            ),
+            fn.MIN(db.scenario.name).alias("example scenario"),
+        )
+        .join(db.scenario)
+        .where(not_retried() & (db.step.status == "failed"))
+        .group_by(error)
+        .order_by(fn.COUNT(db.step.step_run_id).desc())
+        .limit(limit)
+    )
+    return list(query.dicts())
+
+
+def duration_by_tag(limit):
+    """
+    the number of scenarios, failures and the duration of the scenarios of
+    every tag, including the tags inherited from their feature, the longest
+    first
+    """
+    query = (
+        db.scenario.select(
+            db.scenario.tags,
+            db.feature.tags.alias("feature_tags"),
+            db.scenario.status,
+            db.scenario.duration,
+        )
+        .join(db.feature)
+        .where(not_retried())
+    )
+
+    tags = {}
+    for row in query.dicts():
+        for tag in set(row["tags"] or []) | set(row["feature_tags"] or []):
+            stats = tags.setdefault(
+                tag, {"tag": tag, "scenarios": 0, "failed": 0, "duration": 0}
+            )
+            stats["scenarios"] += 1
+            stats["failed"] += row["status"] in ["failed", "error"]
+            stats["duration"] += row["duration"] or 0
+
+    rows = sorted(tags.values(), key=lambda row: row["duration"], reverse=True)
+    for row in rows:
+        row["average duration"] = row["duration"] / row["scenarios"]
+
+    return rows[:limit]
+
+
+def worker_utilization(limit):
+    """
+    the share of their lifetime the workers spent running scenarios, the
+    least busy first
+    """
+    query = (
+        db.worker.select(
+            db.worker.worker_run_id.alias("worker"),
+            db.worker.start_at,
+            fn.MAX(db.feature.end_at).alias("end_at"),
+            fn.COUNT(fn.DISTINCT(db.feature.feature_run_id)).alias("features"),
+            fn.COUNT(db.scenario.scenario_run_id).alias("scenarios"),
+            fn.SUM(db.scenario.duration).alias("busy"),
+        )
+        .join(db.feature, JOIN.LEFT_OUTER)
+        .join(db.scenario, JOIN.LEFT_OUTER)
+        .group_by(db.worker.worker_run_id)
+    )
+
+    rows = []
+    for row in query.dicts():
+        start_at, end_at = row["start_at"], row["end_at"]
+        if isinstance(end_at, str):
+            end_at = datetime.fromisoformat(end_at)
+
+        lifetime = None
+        if start_at and end_at:
+            lifetime = (end_at - start_at).total_seconds()
+
+        busy = row["busy"] or 0
+        rows.append(
+            {
+                "worker": row["worker"],
+                "features": row["features"],
+                "scenarios": row["scenarios"],
+                "busy": busy,
+                "lifetime": lifetime,
+                "utilization": busy / lifetime if lifetime else None,
+            }
+        )
+
+    # the parent process of a run with --workers records a worker which
+    # runs no scenario
+    rows = [row for row in rows if row["scenarios"]]
+    return sorted(rows, key=lambda row: row["utilization"] or 0)[:limit]
+
+
+QUERIES = {
+    "slowest-scenarios": slowest_scenarios,
+    "slowest-steps": slowest_steps,
+    "failures": failures,
+    "duration-by-tag": duration_by_tag,
+    "worker-utilization": worker_utilization,
+}
+
+
+def run_query(name, run_db_path, limit):
+    db.init_html_report_db(run_db_path)
+    try:
+        return QUERIES[name](limit)
+    finally:
+        db.close_html_report_db()
+
+
+def format_rows(rows, format):
+    """
+    format the rows returned by a query as a table, JSON or CSV
+    """
+    if format == "json":
+        return json.dumps(rows, indent=2, default=str)
+
+    if format == "csv":
+        output = io.StringIO()
+        if rows:
+            writer = csv.DictWriter(
+                output, fieldnames=list(rows[0]), lineterminator="\n"
+            )
+            writer.writeheader()
+            writer.writerows(rows)
+
+        return output.getvalue().rstrip("\n")
+
+    if not rows:
+        return "no results"
+
+    return tabulate(rows, headers="keys", floatfmt=".3f")
@@ -0,0 +1,83 @@
+"""
+in-run retry of the scenarios that failed, errored or were terminated during
+`cucu run --retry-failed N`, each retried scenario runs in its own task of a
+fresh pool of workers and is recorded as a new attempt in the run.db
+"""
+
+from mpire import WorkerPool
+
+from cucu import logger
+from cucu.cli.scheduler import load_failed_scenarios
+from cucu.cli.worker import run_feature
+from cucu.db import close_db, consolidate_database_files
+from cucu.formatter.junit import merge_junit_fragments
+
+
+def retry_failed_scenarios(
+    results,
+    junit,
+    retries,
+    workers,
+    start_method,
+    feature_timeout,
+    behave_args,
+    behave_kwargs,
+):
+    """
+    run the scenarios that didn't pass again, up to `retries` more times
+    while some of them keep failing, returns True once every one of them
+    passed
+    """
+    # the workers of the previous pass recorded their results in their own
+    # run.db and JUnit files
+    consolidate_database_files(results)
+    merge_junit_fragments(junit)
+
+    targets = load_failed_scenarios(results / "run.db")
+    if not targets:
+        return False
+
+    for attempt in range(2, retries + 2):
+        logger.info(
+            f"retrying {len(targets)} failed scenarios "
+            f"(attempt {attempt} of {retries + 1})"
+        )
+
+        # the forked workers must not share the parent's connection
+        close_db()
+
+        with WorkerPool(
+            n_jobs=min(workers, len(targets)), start_method=start_method
+        ) as pool:
+            async_results = [
+                pool.apply_async(
+                    run_feature,
+                    [[target], *behave_args],
+                    {**behave_kwargs, "attempt": attempt},
+                    task_timeout=float(feature_timeout),
+                )
+                for target in targets
+            ]
+
+            for target, async_result in zip(targets, async_results):
+                try:
+                    async_result.get()
+                except Exception as error:
+                    logger.error(
+                        f"an exception is raised while retrying {target}",
+                        exc_info=error,
+                    )
+
+        consolidate_database_files(results)
+        merge_junit_fragments(junit, retry=True)
+
+        still_failing = load_failed_scenarios(results / "run.db")
+        flaky = len(set(targets) - set(still_failing))
+        if flaky:
+            logger.info(f"{flaky} scenarios passed on retry and are flaky")
+
+        targets = still_failing
+        if not targets:
+            return True
+
+    return False
@@ -15,7 +15,7 @@ from cucu.browser import selenium
 from cucu.config import CONFIG
 from cucu.db import create_database_file, record_cucu_run
 from cucu.page_checks import init_page_checks
-from cucu.utils import behave_filepath_to_cucu_logpath, get_feature_name
+from cucu.utils import behave_filepath_to_cucu_logpath, get_feature_task_name
 
 
 def behave_init(filepath="features"):
@@ -31,6 +31,11 @@ def behave_init(filepath="features"):
     )
 
 
+def report_retry_progress(ctx):
+    CONFIG["__CUCU_PARENT_STDOUT"].write(".")
+    CONFIG["__CUCU_PARENT_STDOUT"].flush()
+
+
 def behave(
     filepaths,
     color_output,
@@ -49,6 +54,8 @@ def behave(
     redirect_output=False,
     skip_init_global_hook_variables=False,
     chrome_profile_dir=None,
+    persistent_worker=False,
+    attempt=1,
 ):
     # load all them configs
     if len(filepaths) > 1:
@@ -64,7 +71,8 @@ def behave(
     if chrome_profile_dir is not None:
         os.environ["CUCU_CHROME_PROFILE_DIR"] = str(chrome_profile_dir)
 
-    if CONFIG["CUCU_SELENIUM_REMOTE_URL"] is None:
+    # a persistent worker already did so when it bootstrapped
+    if CONFIG["CUCU_SELENIUM_REMOTE_URL"] is None and not persistent_worker:
         selenium.init()
 
     # general socket timeout instead of letting the framework ever get stuck on a
@@ -90,6 +98,7 @@ def behave(
         os.environ["CUCU_DEBUG_ON_FAILURE"] = "true"
 
     os.environ["CUCU_RESULTS_DIR"] = str(results)
+    os.environ["CUCU_ATTEMPT"] = str(attempt)
     os.environ["CUCU_JUNIT_DIR"] = str(junit)
 
     if secrets:
@@ -106,10 +115,14 @@ def behave(
     if verbose:
         args.append("--verbose")
 
+    if persistent_worker:
+        # reuse the hooks and steps loaded by the previous features
+        args += ["--runner", "cucu.cli.worker:CucuWorkerRunner"]
+
     run_json_filename = "run.json"
     if redirect_output:
-        feature_name = get_feature_name(filepaths[0])
-        run_json_filename = f"{feature_name}-run.json"
+        task_name = get_feature_task_name(filepaths[0])
+        run_json_filename = f"{task_name}-run.json"
 
     if dry_run:
         args += [
@@ -165,13 +178,10 @@ def behave(
 
             CONFIG["__CUCU_PARENT_STDOUT"] = sys.stdout
 
-            def retry_progress(ctx):
-                CONFIG["__CUCU_PARENT_STDOUT"].write(".")
-                CONFIG["__CUCU_PARENT_STDOUT"].flush()
-
-            # this allows steps that are stuck in a retry to loop to still
-            # provide progress feedback on screen
-            register_before_retry_hook(retry_progress)
+            if not persistent_worker:
+                # this allows steps that are stuck in a retry to loop to still
+                # provide progress feedback on screen
+                register_before_retry_hook(report_retry_progress)
 
             with cucu_log_path.open("w", encoding="utf8") as output:
                 with contextlib.redirect_stderr(output):
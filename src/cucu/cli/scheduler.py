@@ -0,0 +1,271 @@
+"""
+scheduling of feature files across parallel workers using the durations
+recorded by previous runs in their run.db files
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+from behave.parser import parse_file
+from behave.tag_expression import make_tag_expression
+
+from cucu import logger
+from cucu.utils import get_filepath_line_number
+
+
+def normalize_feature_filename(filename):
+    """
+    normalize a feature filename so the same feature file can be matched
+    between the current run and the filenames recorded in a previous run.db
+    """
+    filepath = Path(filename)
+    if ":" in filepath.name:
+        filepath = filepath.parent / filepath.name.split(":")[0]
+
+    if filepath.is_absolute():
+        try:
+            filepath = filepath.relative_to(Path.cwd())
+        except ValueError:
+            pass
+
+    return Path(os.path.normpath(filepath)).as_posix()
+
+
+def duration_key(filepath):
+    """
+    the key used to look up the recorded duration of a feature file or, when
+    the filepath points at a line of the feature file, of a single scenario
+    """
+    filename = normalize_feature_filename(filepath)
+    if line_number := get_filepath_line_number(filepath):
+        return f"{filename}:{line_number}"
+
+    return filename
+
+
+def load_feature_durations(db_paths):
+    """
+    load the average duration in seconds of each feature file, and of each
+    scenario as `filename:line`, recorded in the run.db files provided
+    """
+    totals = {}
+
+    for db_path in db_paths:
+        if not Path(db_path).exists():
+            logger.warning(f"durations database not found: {db_path}")
+            continue
+
+        with sqlite3.connect(db_path) as conn:
+            # the feature wall time includes the before/after hooks so prefer
+            # it over the sum of the scenario durations when available
+            rows = conn.execute("""
+                SELECT
+                    f.filename,
+                    COALESCE(
+                        (julianday(f.end_at) - julianday(f.start_at)) * 86400,
+                        SUM(s.duration)
+                    ) AS duration
+                FROM feature f
+                JOIN scenario s ON f.feature_run_id = s.feature_run_id
+                WHERE s.status NOT IN ('skipped', 'untested')
+                GROUP BY f.feature_run_id
+            """).fetchall()
+            rows += conn.execute("""
+                SELECT f.filename || ':' || s.line_number, s.duration
+                FROM scenario s
+                JOIN feature f ON s.feature_run_id = f.feature_run_id
+                WHERE s.status NOT IN ('skipped', 'untested')
+            """).fetchall()
+
+        for filename, duration in rows:
+            if duration is None:
+                continue
+
+            filename = duration_key(filename)
+            total, count = totals.get(filename, (0.0, 0))
+            totals[filename] = (total + duration, count + 1)
+
+    return {
+        filename: total / count for filename, (total, count) in totals.items()
+    }
+
+
+def load_failed_scenarios(db_path):
+    """
+    load the `path/to/file.feature:LINE` targets of the scenarios whose last
+    attempt didn't pass in the run.db provided
+    """
+    statuses = ["failed", "error", "hook_error", "terminated"]
+
+    with sqlite3.connect(db_path) as conn:
+        # the attempts retried by --retry-failed were superseded by the
+        # following attempt, which run.db files of older versions lack
+        columns = [
+            row[1] for row in conn.execute("PRAGMA table_info(scenario)")
+        ]
+        last_attempt = "AND s.retried IS NOT 1" if "retried" in columns else ""
+
+        rows = conn.execute(
+            f"""
+            SELECT DISTINCT f.filename, s.line_number
+            FROM scenario s
+            JOIN feature f ON s.feature_run_id = f.feature_run_id
+            WHERE s.status IN ({", ".join("?" for _ in statuses)})
+            {last_attempt}
+            ORDER BY f.filename, s.line_number
+            """,
+            statuses,
+        ).fetchall()
+
+    return [
+        Path(f"{filename}:{line_number}") for filename, line_number in rows
+    ]
+
+
+def walk_scenarios(feature_filepaths, tags):
+    """
+    walk the (feature filepath, scenario) tuples of the scenarios that would
+    run with the tags provided, with each example row of a Scenario Outline as
+    a scenario of its own
+    """
+    tag_expression = make_tag_expression(["~@disabled", *tags])
+
+    for feature_filepath in feature_filepaths:
+        filepath = Path(feature_filepath)
+        feature = parse_file(str(filepath))
+        if feature is None:
+            continue
+
+        for scenario in feature.walk_scenarios():
+            if tag_expression.check(scenario.effective_tags):
+                yield filepath, scenario
+
+
+def expand_scenarios(feature_filepaths, tags):
+    """
+    expand the feature files provided into one `path/to/file.feature:LINE`
+    target per scenario, mapped to its estimated size in bytes, so scenarios
+    of the same feature can run in parallel
+    """
+    targets = {}
+    feature_files = []
+
+    for feature_filepath in feature_filepaths:
+        filepath = Path(feature_filepath)
+        if ":" in filepath.name:
+            # already pointing at a specific scenario
+            targets[filepath] = None
+        else:
+            feature_files.append(filepath)
+
+    for filepath, scenario in walk_scenarios(feature_files, tags):
+        target = filepath.parent / f"{filepath.name}:{scenario.line}"
+        targets[target] = sum(
+            len(step.name) + len(step.text or "")
+            for step in scenario.all_steps
+        )
+
+    return targets
+
+
+def schedule_features(feature_filepaths, durations, sizes=None):
+    """
+    order the feature files provided as (feature filepath, expected duration)
+    tuples, the longest first, estimating the duration of the features
+    without a recorded one from their size
+    """
+    keys = {
+        feature_filepath: duration_key(feature_filepath)
+        for feature_filepath in feature_filepaths
+    }
+    sizes = {
+        feature_filepath: (sizes or {}).get(feature_filepath)
+        or Path(normalize_feature_filename(feature_filepath)).stat().st_size
+        for feature_filepath in feature_filepaths
+    }
+    known = {
+        feature_filepath: durations[key]
+        for feature_filepath, key in keys.items()
+        if key in durations
+    }
+
+    known_size = sum(sizes[feature_filepath] for feature_filepath in known)
+    if known and known_size:
+        seconds_per_byte = sum(known.values()) / known_size
+    else:
+        seconds_per_byte = 1.0
+
+    expected = {
+        feature_filepath: known.get(
+            feature_filepath, sizes[feature_filepath] * seconds_per_byte
+        )
+        for feature_filepath in feature_filepaths
+    }
+
+    return sorted(
+        expected.items(),
+        key=lambda item: (-item[1], str(item[0])),
+    )
+
+
+def collect_feature_filepaths(filepaths):
+    """
+    expand the directories in the filepaths provided into the feature files
+    they contain
+    """
+    feature_filepaths = []
+    for filepath in filepaths:
+        if filepath.is_dir():
+            feature_filepaths.extend(filepath.rglob("*.feature"))
+        else:
+            feature_filepaths.append(filepath)
+
+    return feature_filepaths
+
+
+def plan_features(filepaths, durations, tags, split_scenarios):
+    """
+    the scheduled features (or scenarios when split_scenarios is set) to run
+    from the filepaths provided
+    """
+    feature_filepaths = collect_feature_filepaths(filepaths)
+
+    sizes = None
+    if split_scenarios:
+        sizes = expand_scenarios(feature_filepaths, tags)
+        feature_filepaths = list(sizes.keys())
+
+    return schedule_features(feature_filepaths, durations, sizes)
+
+
+def parse_shard(shard):
+    """
+    parse a shard provided as `INDEX/TOTAL` with a 1-based INDEX
+    """
+    index, _, total = shard.partition("/")
+    if not (index.isdigit() and total.isdigit()):
+        raise ValueError(f"shard must be INDEX/TOTAL, got {shard}")
+
+    index, total = int(index), int(total)
+    if not 1 <= index <= total:
+        raise ValueError(f"shard index must be between 1 and {total}")
+
+    return index, total
+
+
+def shard_features(scheduled_features, index, total):
+    """
+    the features of the shard at the 1-based index provided, the longest
+    features being assigned first to the shard with the least expected
+    duration so far so every machine computes the same partition
+    """
+    loads = [0.0] * total
+    shards = [[] for _ in range(total)]
+
+    for feature_filepath, expected_duration in scheduled_features:
+        shard = loads.index(min(loads))
+        shards[shard].append((feature_filepath, expected_duration))
+        loads[shard] += expected_duration
+
+    return shards[index - 1]
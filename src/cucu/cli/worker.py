@@ -0,0 +1,144 @@
+"""
+persistent runtime for the pool workers of `cucu run --workers`: each worker
+process bootstraps once and then runs many features against the already
+loaded hooks and step definitions, only resetting the per feature state
+between features.
+"""
+
+from pathlib import Path
+
+from behave.runner import Runner
+
+from cucu import (
+    init_global_hook_variables,
+    logger,
+    register_after_scenario_hook,
+    register_before_retry_hook,
+    register_before_scenario_hook,
+)
+from cucu.browser import pool as browser_pool
+from cucu.browser import selenium
+from cucu.cli.run import behave, report_retry_progress
+from cucu.config import CONFIG
+
+# depth of the CONFIG snapshot stack right after the worker bootstrapped, None
+# until the worker process has bootstrapped
+BOOTSTRAP_SNAPSHOT_DEPTH = None
+
+
+class CucuWorkerRunner(Runner):
+    """
+    behave runner that loads the environment.py hooks and the step
+    definitions of a features directory once per process and reuses them for
+    every following feature run from that same directory
+    """
+
+    loaded_hooks = {}
+    loaded_step_paths = set()
+
+    def load_hooks(self, filename=None):
+        key = (self.base_dir, filename or self.config.environment_file)
+
+        if key in CucuWorkerRunner.loaded_hooks:
+            self.hooks = CucuWorkerRunner.loaded_hooks[key]
+            return
+
+        super().load_hooks(filename)
+        CucuWorkerRunner.loaded_hooks[key] = self.hooks
+
+    def load_step_definitions(self, extra_step_paths=None):
+        # the step definitions are registered in behave's global step
+        # registry which outlives each runner
+        key = (self.base_dir, tuple(extra_step_paths or []))
+
+        if key in CucuWorkerRunner.loaded_step_paths:
+            return
+
+        super().load_step_definitions(extra_step_paths)
+        CucuWorkerRunner.loaded_step_paths.add(key)
+
+
+def skip_after_fail_fast(ctx):
+    """
+    before scenario hook skipping the scenario once another worker of this
+    run failed with --fail-fast
+    """
+    if Path(CONFIG["CUCU_FAIL_FAST_FILEPATH"]).exists():
+        logger.debug(f'fail fast: skipping scenario "{ctx.scenario.name}"')
+        ctx.scenario.mark_skipped()
+
+
+def trigger_fail_fast(ctx):
+    """
+    after scenario hook letting the other workers of this run stop at their
+    next scenario once this one failed with --fail-fast
+    """
+    scenario = ctx.scenario
+    step_failed = any(
+        step.status.is_failure() or step.status.is_error()
+        for step in scenario.all_steps
+    )
+    if step_failed or scenario.hook_failed or scenario.terminated:
+        Path(CONFIG["CUCU_FAIL_FAST_FILEPATH"]).touch()
+
+
+def bootstrap():
+    """
+    one time initialization of the worker process
+    """
+    global BOOTSTRAP_SNAPSHOT_DEPTH
+
+    init_global_hook_variables()
+
+    # this allows steps that are stuck in a retry to loop to still
+    # provide progress feedback on screen
+    register_before_retry_hook(report_retry_progress)
+
+    browser_pool.register_hooks()
+
+    if CONFIG["CUCU_FAIL_FAST_FILEPATH"]:
+        register_before_scenario_hook(skip_after_fail_fast)
+        register_after_scenario_hook(trigger_fail_fast)
+
+    if CONFIG["CUCU_SELENIUM_REMOTE_URL"] is None:
+        selenium.init()
+
+    if CONFIG.true("CUCU_RUN_DB_SHARED"):
+        # a forked worker inherits the worker id of the parent process, let
+        # the rundb formatter give it its own in the shared run.db
+        CONFIG["WORKER_RUN_ID"] = None
+
+    CONFIG.snapshot("worker")
+    BOOTSTRAP_SNAPSHOT_DEPTH = len(CONFIG.snapshots)
+
+
+def reset():
+    """
+    reset the state left behind by the previous feature, including the
+    variables loaded from its cucurc files, while keeping the hooks registered
+    by the environment.py and step definitions loaded
+    """
+    # a feature interrupted by the feature timeout may not have popped the
+    # snapshots it took
+    del CONFIG.snapshots[BOOTSTRAP_SNAPSHOT_DEPTH:]
+    CONFIG.restore()
+
+
+def run_feature(filepaths, *args, **kwargs):
+    """
+    run the feature files provided within the current pool worker, accepts
+    the same arguments as `cucu.cli.run.behave`
+    """
+    if BOOTSTRAP_SNAPSHOT_DEPTH is None:
+        bootstrap()
+    else:
+        reset()
+
+    return behave(
+        filepaths,
+        *args,
+        redirect_output=True,
+        skip_init_global_hook_variables=True,
+        persistent_worker=True,
+        **kwargs,
+    )
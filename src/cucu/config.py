@@ -421,6 +421,33 @@ CONFIG.define(
     "when set to true we'll reuse the browser between scenario runs",
     default=False,
 )
+CONFIG.define(
+    "CUCU_BROWSER_POOL",
+    "when set to true chromium based browsers are reset (tabs replaced, "
+    "cookies, cache and the storage of the visited origins cleared) and "
+    "handed over to the next scenario instead of quitting them, other "
+    "browsers and browsers that fail to reset are quit as usual",
+    default=False,
+)
+CONFIG.define(
+    "CUCU_BROWSER_POOL_SIZE",
+    "the maximum number of idle browsers kept by each process when "
+    "CUCU_BROWSER_POOL is enabled",
+    default=1,
+)
+CONFIG.define(
+    "CUCU_BROWSER_PREFETCH",
+    "when set to true the browser of the next scenario is launched in the "
+    "background while the after scenario hooks of a scenario that used a "
+    "browser run, so the next scenario doesn't wait for the browser to start",
+    default=False,
+)
+CONFIG.define(
+    "CUCU_BROWSER_PREFETCH_TIMEOUT_S",
+    "the maximum time (seconds) the next scenario waits for the browser "
+    "prefetched with CUCU_BROWSER_PREFETCH before launching a new one",
+    default=60,
+)
 CONFIG.define(
     "CUCU_BROWSER_WINDOW_HEIGHT",
     "the browser window height when running browser tests",
@@ -446,6 +473,29 @@ CONFIG.define(
     "the default timeout (seconds) for selenium connect/read in selenium",
     default=10,
 )
+CONFIG.define(
+    "CUCU_SELENIUM_REMOTE_URL_STRATEGY",
+    "how the selenium remote url of a new browser session is picked when "
+    "CUCU_SELENIUM_REMOTE_URL lists several comma separated urls: "
+    "least-outstanding picks the one running the fewest sessions and latency "
+    "weighs those sessions by the response time of its status endpoint",
+    default="least-outstanding",
+)
+CONFIG.define(
+    "CUCU_RUN_DB_SHARED",
+    "when set to true the workers write their records to the run.db of the "
+    "results directory, opened in WAL mode with a busy timeout, instead of "
+    "their own run_*.db file merged into the run.db at the end of the run",
+    default=False,
+)
+CONFIG.define(
+    "CUCU_DB_BATCHED_WRITES",
+    "when set to true the feature, scenario and step records are written to "
+    "the run.db by a background thread in batched transactions, committed at "
+    "the end of every scenario at the latest, instead of one transaction per "
+    "record on the step's critical path",
+    default=True,
+)
 CONFIG.define(
     "CUCU_MONITOR_PNG",
     "when set to a filename `cucu` will update the image to match "
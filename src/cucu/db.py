@@ -2,12 +2,21 @@
 Database creation and management utilities for cucu.
 """
 
+import functools
+import hashlib
+import json
 import logging
+import os
+import queue
 import sqlite3
 import sys
+import threading
+import time
+import zlib
 from pathlib import Path
 
 from peewee import (
+    BlobField,
     BooleanField,
     DateTimeField,
     FloatField,
@@ -21,11 +30,19 @@ from tenacity import RetryError
 
 from cucu import logger as cucu_logger
 from cucu.config import CONFIG
-from cucu.utils import get_iso_timestamp_with_ms, parse_iso_timestamp
+from cucu.utils import (
+    get_attempt,
+    get_iso_timestamp_with_ms,
+    parse_iso_timestamp,
+)
 
 db_filepath = CONFIG["RUN_DB_PATH"]
 db = SqliteDatabase(db_filepath)
 
+# how long a connection to a run.db shared by the workers waits for the
+# others to finish their transaction before giving up
+SHARED_BUSY_TIMEOUT_S = 60
+
 logger = logging.getLogger("peewee")
 logger.setLevel(logging.WARNING)  # Only show warnings and errors
 
@@ -101,10 +118,17 @@ class scenario(BaseModel):
     browser_info = JSONField(null=True)
     cucu_config = JSONField(null=True)
     line_number = IntegerField()
+    attempt = IntegerField(default=1)
+    retried = BooleanField(null=True)
+    flaky = BooleanField(null=True)
     log_files = JSONField(null=True)
     before_hooks = JSONField(null=True)
     after_hooks = JSONField(null=True)
 
+    class Meta:
+        # the scenarios of a feature are read in order
+        indexes = ((("feature", "seq"), False),)
+
 
 class step(BaseModel):
     step_run_id = TextField(primary_key=True)
@@ -137,67 +161,358 @@ class step(BaseModel):
     screenshots = JSONField()
     image_dir = TextField(null=True)
 
+    class Meta:
+        # the steps of a scenario are read in order
+        indexes = ((("scenario", "seq"), False),)
+
+
+class blob(BaseModel):
+    """
+    zlib compressed JSON payload of a step column, stored once per run.db
+    however many steps it's referenced from
+    """
+
+    blob_id = TextField(primary_key=True)  # sha256 of the JSON payload
+    data = BlobField()
+    size = IntegerField()  # size of the JSON payload
+
+
+class concurrency_sample(BaseModel):
+    concurrency_sample_id = TextField(primary_key=True)
+    cucu_run = ForeignKeyField(
+        cucu_run,
+        backref="concurrency_samples",
+        column_name="cucu_run_id",
+    )
+    sampled_at = DateTimeField()
+    concurrency = IntegerField()
+    running = IntegerField()
+    cpu_percent = FloatField()
+    available_memory_mb = FloatField()
+
+
+class selenium_endpoint(BaseModel):
+    selenium_endpoint_id = TextField(primary_key=True)
+    worker = ForeignKeyField(
+        worker,
+        backref="selenium_endpoints",
+        column_name="worker_run_id",
+    )
+    url = TextField()
+    sessions = IntegerField()
+    failovers = IntegerField()
+
+
+class BatchedWriter:
+    """
+    background thread writing the run.db records submitted to it, coalescing
+    them into a single transaction per batch which is committed once it holds
+    `max_batch_size` statements, `flush_interval_s` seconds after its first
+    statement or when flushed, whichever comes first. the queue is bounded so
+    a slow disk eventually slows the run down instead of buffering without
+    limit.
+    """
+
+    flush_interval_s = 1.0
+    max_batch_size = 500
+    max_queue_size = 10000
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.database = db
+        self.error = None
+        self.queue = queue.Queue(maxsize=self.max_queue_size)
+        self.thread = threading.Thread(
+            target=self.run, name="rundb-writer", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, sql, params):
+        self.queue.put((sql, params))
+
+    def flush(self):
+        """
+        block until every statement submitted so far is committed
+        """
+        flushed = threading.Event()
+        self.queue.put(flushed)
+        flushed.wait()
+        self.raise_error()
+
+    def stop(self):
+        """
+        commit every statement submitted so far and stop the thread
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self.raise_error()
+
+    def raise_error(self):
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def run(self):
+        self.database.connect(reuse_if_open=True)
+        batch = []
+        deadline = None
+
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0.0, deadline - time.monotonic())
+
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = threading.Event()
+
+            if isinstance(item, tuple):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval_s
+
+                if len(batch) < self.max_batch_size:
+                    continue
+
+            self.write(batch)
+            batch = []
+            deadline = None
+
+            if item is None:
+                break
+
+            if isinstance(item, threading.Event):
+                item.set()
+
+        self.database.close()
+
+    def write(self, batch):
+        if not batch:
+            return
+
+        try:
+            # take the write lock upfront so a shared run.db waits for the
+            # other workers instead of failing to upgrade a read transaction
+            with self.database.atomic("IMMEDIATE"):
+                for sql, params in batch:
+                    self.database.execute_sql(sql, params)
+        except Exception as exception:
+            cucu_logger.error(
+                f"unable to write {len(batch)} records to the run.db: "
+                f"{exception}"
+            )
+            self.error = exception
+
+
+# writer of the current process when CUCU_DB_BATCHED_WRITES is enabled,
+# started by the first record written while running features
+WRITER = None
+
+
+def execute(query, batched=False):
+    """
+    execute the insert or update query provided, through the background
+    writer when it's running so the records are written in order
+    """
+    global WRITER
+
+    # a forked worker doesn't inherit the thread of its parent's writer
+    if WRITER is not None and WRITER.pid != os.getpid():
+        WRITER = None
+
+    if WRITER is None and batched and CONFIG.true("CUCU_DB_BATCHED_WRITES"):
+        WRITER = BatchedWriter()
+
+    if WRITER is not None:
+        # the statement is rendered right away so later changes to the
+        # objects it was built from don't leak into it
+        WRITER.submit(*query.sql())
+    else:
+        db.connect(reuse_if_open=True)
+        query.execute()
+
+
+def flush_writes():
+    """
+    block until the records submitted to the background writer are committed
+    """
+    if WRITER is not None and WRITER.pid == os.getpid():
+        WRITER.flush()
+
+
+# step columns whose payloads are moved to the blob table once their JSON is
+# at least BLOB_MIN_SIZE characters long, the column then holds a reference
+# to the blob: {"$blob": "<blob_id>"}
+STEP_PAYLOAD_FIELDS = [
+    "browser_info",
+    "browser_logs",
+    "debug_output",
+    "screenshots",
+    "stderr",
+    "stdout",
+]
+BLOB_MIN_SIZE = 1024
+
+# database file to the ids of the blobs stored in it by the current process
+STORED_BLOBS = {}
+
+
+def store_payload(value):
+    """
+    move the payload provided to the blob table when it's large enough
+    """
+    payload = json.dumps(value)
+    if len(payload) < BLOB_MIN_SIZE:
+        return value
+
+    blob_id = hashlib.sha256(payload.encode("utf8")).hexdigest()
+    stored_blobs = STORED_BLOBS.setdefault(str(db.database), set())
+    if blob_id not in stored_blobs:
+        execute(
+            blob.insert(
+                blob_id=blob_id,
+                data=zlib.compress(payload.encode("utf8")),
+                size=len(payload),
+            ).on_conflict(conflict_target=[blob.blob_id], action="nothing"),
+            batched=True,
+        )
+        stored_blobs.add(blob_id)
+
+    return {"$blob": blob_id}
+
+
+@functools.lru_cache(maxsize=256)
+def load_blob(blob_id):
+    record = blob.get_by_id(blob_id)
+    return zlib.decompress(record.data).decode("utf8")
+
+
+def load_payload(value):
+    """
+    the payload of a step column, read from the blob table when the column
+    holds a reference to it
+    """
+    if isinstance(value, dict) and list(value) == ["$blob"]:
+        return json.loads(load_blob(value["$blob"]))
+
+    return value
+
 
 def record_cucu_run():
     filepath = CONFIG["CUCU_FILEPATH"]
     cucu_run_id_val = CONFIG["CUCU_RUN_ID"]
     worker_run_id = CONFIG["WORKER_RUN_ID"]
 
-    db.connect(reuse_if_open=True)
-    cucu_run.create(
-        cucu_run_id=cucu_run_id_val,
-        full_arguments=sys.argv,
-        filepath=filepath,
-        start_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
+    execute(
+        cucu_run.insert(
+            cucu_run_id=cucu_run_id_val,
+            full_arguments=sys.argv,
+            filepath=filepath,
+            start_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
+            run_info={"shard": CONFIG["CUCU_SHARD"]}
+            if CONFIG["CUCU_SHARD"]
+            else None,
+        ).on_conflict(conflict_target=[cucu_run.cucu_run_id], action="nothing")
     )
 
+    # a worker writing to a shared run.db records the run and itself again
+    # for every feature it runs
     parent_id = (
         CONFIG.get("WORKER_PARENT_ID")
         if CONFIG.get("WORKER_PARENT_ID") != worker_run_id
         else None
     )
-    worker.create(
-        worker_run_id=worker_run_id,
-        cucu_run_id=cucu_run_id_val,
-        parent_id=parent_id,
-        start_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
+    execute(
+        worker.insert(
+            worker_run_id=worker_run_id,
+            cucu_run_id=cucu_run_id_val,
+            parent_id=parent_id,
+            start_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
+        ).on_conflict(conflict_target=[worker.worker_run_id], action="nothing")
     )
 
     return str(db_filepath)
 
 
+def record_concurrency_timeline(timeline):
+    """
+    record the samples taken by `cucu run --workers auto` to adjust the
+    number of features run concurrently
+    """
+    cucu_run_id_val = CONFIG["CUCU_RUN_ID"]
+
+    execute(
+        concurrency_sample.insert_many(
+            [
+                {
+                    **sample,
+                    "concurrency_sample_id": f"{cucu_run_id_val}_{index}",
+                    "cucu_run": cucu_run_id_val,
+                    "sampled_at": parse_iso_timestamp(sample["sampled_at"]),
+                }
+                for index, sample in enumerate(timeline)
+            ]
+        )
+    )
+
+
+def record_selenium_endpoints(endpoints):
+    """
+    record the number of browser sessions the current worker opened on, and
+    failed over from, every selenium remote url
+    """
+    worker_run_id = CONFIG["WORKER_RUN_ID"]
+
+    for url, counts in endpoints.items():
+        execute(
+            selenium_endpoint.replace(
+                selenium_endpoint_id=f"{worker_run_id}_{url}",
+                worker=worker_run_id,
+                url=url,
+                sessions=counts["sessions"],
+                failovers=counts["failovers"],
+            )
+        )
+
+
 def record_feature(feature_obj):
-    db.connect(reuse_if_open=True)
-    feature.create(
-        feature_run_id=feature_obj.feature_run_id,
-        worker=CONFIG["WORKER_RUN_ID"],
-        name=feature_obj.name,
-        filename=feature_obj.filename,
-        description="\n".join(feature_obj.description)
-        if isinstance(feature_obj.description, list)
-        else str(feature_obj.description),
-        tags=feature_obj.tags,
-        start_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
-        behave_filepath=CONFIG["BEHAVE_FILEPATH"],
+    execute(
+        feature.insert(
+            feature_run_id=feature_obj.feature_run_id,
+            worker=CONFIG["WORKER_RUN_ID"],
+            name=feature_obj.name,
+            filename=feature_obj.filename,
+            description="\n".join(feature_obj.description)
+            if isinstance(feature_obj.description, list)
+            else str(feature_obj.description),
+            tags=feature_obj.tags,
+            start_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
+            behave_filepath=CONFIG["BEHAVE_FILEPATH"],
+        ),
+        batched=True,
     )
 
 
 def record_scenario(scenario_obj):
-    db.connect(reuse_if_open=True)
-    scenario.create(
-        scenario_run_id=scenario_obj.scenario_run_id,
-        feature_run_id=scenario_obj.feature.feature_run_id,
-        name=scenario_obj.name,
-        line_number=scenario_obj.line,
-        seq=scenario_obj.seq,
-        tags=scenario_obj.tags,
-        start_at=parse_iso_timestamp(getattr(scenario_obj, "start_at", None)),
+    execute(
+        scenario.insert(
+            scenario_run_id=scenario_obj.scenario_run_id,
+            feature_run_id=scenario_obj.feature.feature_run_id,
+            name=scenario_obj.name,
+            line_number=scenario_obj.line,
+            seq=scenario_obj.seq,
+            attempt=get_attempt(),
+            tags=scenario_obj.tags,
+            start_at=parse_iso_timestamp(
+                getattr(scenario_obj, "start_at", None)
+            ),
+        ),
+        batched=True,
     )
 
 
 def start_step_record(step_obj, scenario_run_id):
-    db.connect(reuse_if_open=True)
-
     table = None
     if step_obj.table:
         table = {
@@ -205,33 +520,33 @@ def start_step_record(step_obj, scenario_run_id):
             "rows": [list(row) for row in step_obj.table.rows],
         }
 
-    step.create(
-        step_run_id=step_obj.step_run_id,
-        scenario_run_id=scenario_run_id,
-        seq=getattr(step_obj, "seq", -1),
-        keyword=step_obj.keyword,
-        name=step_obj.name,
-        status=step_obj.status.name,
-        text=step_obj.text.splitlines() if step_obj.text else [],
-        table_data=table,
-        location=str(step_obj.location),
-        is_substep=getattr(step_obj, "is_substep", False),
-        has_substeps=getattr(step_obj, "has_substeps", False),
-        section_level=getattr(step_obj, "section_level", None),
-        browser_info="",
-        browser_logs=[],
-        error_message=[],
-        debug_logs=[],
-        debug_output=[],
-        stderr=[],
-        stdout=[],
-        screenshots=[],
+    execute(
+        step.insert(
+            step_run_id=step_obj.step_run_id,
+            scenario_run_id=scenario_run_id,
+            seq=getattr(step_obj, "seq", -1),
+            keyword=step_obj.keyword,
+            name=step_obj.name,
+            status=step_obj.status.name,
+            text=step_obj.text.splitlines() if step_obj.text else [],
+            table_data=table,
+            location=str(step_obj.location),
+            is_substep=getattr(step_obj, "is_substep", False),
+            has_substeps=getattr(step_obj, "has_substeps", False),
+            section_level=getattr(step_obj, "section_level", None),
+            browser_info="",
+            browser_logs=[],
+            error_message=[],
+            debug_output=[],
+            stderr=[],
+            stdout=[],
+            screenshots=[],
+        ),
+        batched=True,
     )
 
 
 def finish_step_record(step_obj, duration):
-    db.connect(reuse_if_open=True)
-
     error_message = []
     exception = []
     if step.error_message and step_obj.status.name == "failed":
@@ -253,29 +568,38 @@ def finish_step_record(step_obj, duration):
 
             exception = error_lines
 
-    step.update(
-        browser_info=getattr(step_obj, "browser_info", {}),
-        browser_logs=getattr(step_obj, "browser_logs", []),
-        debug_output=getattr(step_obj, "debug_output", []),
-        duration=duration,
-        end_at=getattr(step_obj, "end_at", None),
-        error_message=error_message,
-        exception=exception,
-        has_substeps=getattr(step_obj, "has_substeps", False),
-        parent_seq=getattr(step_obj, "parent_seq", None),
-        screenshots=getattr(step_obj, "screenshots", []),
-        section_level=getattr(step_obj, "section_level", None),
-        seq=step_obj.seq,
-        start_at=parse_iso_timestamp(getattr(step_obj, "start_at", None)),
-        status=step_obj.status.name,
-        stderr=getattr(step_obj, "stderr", []),
-        stdout=getattr(step_obj, "stdout", []),
-        image_dir=getattr(step_obj, "step_image_dir", None),
-    ).where(step.step_run_id == step_obj.step_run_id).execute()
+    payloads = {
+        "browser_info": getattr(step_obj, "browser_info", {}),
+        "browser_logs": getattr(step_obj, "browser_logs", []),
+        "debug_output": getattr(step_obj, "debug_output", []),
+        "screenshots": getattr(step_obj, "screenshots", []),
+        "stderr": getattr(step_obj, "stderr", []),
+        "stdout": getattr(step_obj, "stdout", []),
+    }
+
+    execute(
+        step.update(
+            **{
+                field: store_payload(value)
+                for field, value in payloads.items()
+            },
+            duration=duration,
+            end_at=getattr(step_obj, "end_at", None),
+            error_message=error_message,
+            exception=exception,
+            has_substeps=getattr(step_obj, "has_substeps", False),
+            parent_seq=getattr(step_obj, "parent_seq", None),
+            section_level=getattr(step_obj, "section_level", None),
+            seq=step_obj.seq,
+            start_at=parse_iso_timestamp(getattr(step_obj, "start_at", None)),
+            status=step_obj.status.name,
+            image_dir=getattr(step_obj, "step_image_dir", None),
+        ).where(step.step_run_id == step_obj.step_run_id),
+        batched=True,
+    )
 
 
 def finish_scenario_record(scenario_obj):
-    db.connect(reuse_if_open=True)
     start_at = parse_iso_timestamp(getattr(scenario_obj, "start_at", None))
     end_at = parse_iso_timestamp(getattr(scenario_obj, "end_at", None))
     if start_at and end_at:
@@ -302,162 +626,231 @@ def finish_scenario_record(scenario_obj):
     else:
         status = scenario_obj.status.name
 
-    scenario.update(
-        status=status,
-        duration=duration,
-        start_at=start_at,
-        end_at=end_at,
-        log_files=log_files_json,
-        cucu_config=getattr(scenario_obj, "cucu_config_json", dict()),
-        browser_info=getattr(scenario_obj, "browser_info", dict()),
-        custom_data=getattr(scenario_obj, "custom_data", dict()),
-        before_hooks=getattr(scenario_obj, "before_hook_results", []),
-        after_hooks=getattr(scenario_obj, "after_hook_results", []),
-    ).where(scenario.scenario_run_id == scenario_obj.scenario_run_id).execute()
+    execute(
+        scenario.update(
+            status=status,
+            duration=duration,
+            start_at=start_at,
+            end_at=end_at,
+            log_files=log_files_json,
+            cucu_config=getattr(scenario_obj, "cucu_config_json", dict()),
+            browser_info=getattr(scenario_obj, "browser_info", dict()),
+            custom_data=getattr(scenario_obj, "custom_data", dict()),
+            before_hooks=getattr(scenario_obj, "before_hook_results", []),
+            after_hooks=getattr(scenario_obj, "after_hook_results", []),
+        ).where(scenario.scenario_run_id == scenario_obj.scenario_run_id),
+        batched=True,
+    )
+
+    # the scenario is complete in the run.db once it's done running
+    flush_writes()
 
 
 def finish_feature_record(feature_obj):
-    db.connect(reuse_if_open=True)
-    feature.update(
-        status=feature_obj.status.name,
-        end_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
-        custom_data=feature_obj.custom_data,
-    ).where(feature.feature_run_id == feature_obj.feature_run_id).execute()
+    execute(
+        feature.update(
+            status=feature_obj.status.name,
+            end_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
+            custom_data=feature_obj.custom_data,
+        ).where(feature.feature_run_id == feature_obj.feature_run_id),
+        batched=True,
+    )
 
 
 def finish_worker_record(custom_data=None, worker_run_id=None):
-    db.connect(reuse_if_open=True)
     target_worker_run_id = worker_run_id or CONFIG["WORKER_RUN_ID"]
-    worker.update(
-        end_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
-        custom_data=custom_data,
-    ).where(worker.worker_run_id == target_worker_run_id).execute()
+    execute(
+        worker.update(
+            end_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
+            custom_data=custom_data,
+        ).where(worker.worker_run_id == target_worker_run_id)
+    )
 
 
 def finish_cucu_run_record():
-    db.connect(reuse_if_open=True)
-    cucu_run.update(
-        end_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
-    ).where(cucu_run.cucu_run_id == CONFIG["CUCU_RUN_ID"]).execute()
+    execute(
+        cucu_run.update(
+            end_at=parse_iso_timestamp(get_iso_timestamp_with_ms()),
+        ).where(cucu_run.cucu_run_id == CONFIG["CUCU_RUN_ID"])
+    )
+
+
+def stop_writer():
+    """
+    commit the records submitted to the background writer and stop it
+    """
+    global WRITER
+
+    if WRITER is not None:
+        writer, WRITER = WRITER, None
+        if writer.pid == os.getpid():
+            writer.stop()
 
 
 def close_db():
+    stop_writer()
+
     if not db.is_closed():
         db.close()
 
 
-def create_database_file(db_filepath):
-    db.init(db_filepath)
-    db.connect(reuse_if_open=True)
-    db.create_tables([cucu_run, worker, feature, scenario, step])
-    db.execute_sql("""
-            CREATE VIEW IF NOT EXISTS flat_all AS
-            WITH scenario_with_steps AS (
-                SELECT
-                    *,
-                    COUNT(st.step_run_id) AS steps
-                FROM scenario s
-                LEFT JOIN step st ON s.scenario_run_id = st.scenario_run_id
-                GROUP BY s.scenario_run_id
-            )
+def database_options():
+    """
+    the options the run.db is opened with, a run.db shared by the workers is
+    in WAL mode so they don't block each other nor the queries made while the
+    run is going on
+    """
+    if not CONFIG.true("CUCU_RUN_DB_SHARED"):
+        return {}
+
+    return {
+        "timeout": SHARED_BUSY_TIMEOUT_S,
+        "pragmas": {
+            "journal_mode": "wal",
+            "synchronous": "normal",
+            "busy_timeout": SHARED_BUSY_TIMEOUT_S * 1000,
+        },
+    }
+
+
+# the views of the run.db, recreated in the run.db files of older versions of
+# cucu whose views lack the newer columns
+VIEWS = {
+    "flat_all": """
+        CREATE VIEW IF NOT EXISTS flat_all AS
+        WITH scenario_with_steps AS (
+            SELECT
+                *,
+                COUNT(st.step_run_id) AS steps
+            FROM scenario s
+            LEFT JOIN step st ON s.scenario_run_id = st.scenario_run_id
+            -- leave out the attempts retried by --retry-failed
+            WHERE s.retried IS NOT 1
+            GROUP BY s.scenario_run_id
+        )
+        SELECT
+            COUNT(DISTINCT s.feature_run_id) AS features,
+            COUNT(s.scenario_run_id) AS scenarios,
+            SUM(CASE WHEN s.status = 'passed' THEN 1 ELSE 0 END) AS passed,
+            SUM(CASE WHEN s.status = 'failed' THEN 1 ELSE 0 END) AS failed,
+            SUM(CASE WHEN s.status = 'skipped' THEN 1 ELSE 0 END) AS skipped,
+            SUM(CASE WHEN s.status = 'error' THEN 1 ELSE 0 END) AS error,
+            SUM(CASE WHEN s.status = 'terminated' THEN 1 ELSE 0 END) AS terminated,
+            SUM(CASE WHEN s.flaky = 1 THEN 1 ELSE 0 END) AS flaky,
+            SUM(s.duration) AS duration,
+            SUM(s.steps) AS steps
+        FROM scenario_with_steps s
+    """,
+    "flat_feature": """
+        CREATE VIEW IF NOT EXISTS flat_feature AS
+        WITH feature_first_level AS (
             SELECT
-                COUNT(DISTINCT s.feature_run_id) AS features,
+                w.cucu_run_id,
+                f.start_at,
+                f.name AS feature_name,
                 COUNT(s.scenario_run_id) AS scenarios,
                 SUM(CASE WHEN s.status = 'passed' THEN 1 ELSE 0 END) AS passed,
                 SUM(CASE WHEN s.status = 'failed' THEN 1 ELSE 0 END) AS failed,
                 SUM(CASE WHEN s.status = 'skipped' THEN 1 ELSE 0 END) AS skipped,
                 SUM(CASE WHEN s.status = 'error' THEN 1 ELSE 0 END) AS error,
                 SUM(CASE WHEN s.status = 'terminated' THEN 1 ELSE 0 END) AS terminated,
-                SUM(s.duration) AS duration,
-                SUM(s.steps) AS steps
-            FROM scenario_with_steps s
-        """)
-    db.execute_sql("""
-            CREATE VIEW IF NOT EXISTS flat_feature AS
-            WITH feature_first_level AS (
-                SELECT
-                    w.cucu_run_id,
-                    f.start_at,
-                    f.name AS feature_name,
-                    COUNT(s.scenario_run_id) AS scenarios,
-                    SUM(CASE WHEN s.status = 'passed' THEN 1 ELSE 0 END) AS passed,
-                    SUM(CASE WHEN s.status = 'failed' THEN 1 ELSE 0 END) AS failed,
-                    SUM(CASE WHEN s.status = 'skipped' THEN 1 ELSE 0 END) AS skipped,
-                    SUM(CASE WHEN s.status = 'error' THEN 1 ELSE 0 END) AS error,
-                    SUM(CASE WHEN s.status = 'terminated' THEN 1 ELSE 0 END) AS terminated,
-                    SUM(s.duration) AS duration
-                FROM cucu_run r
-                JOIN worker w ON r.cucu_run_id = w.cucu_run_id
-                JOIN feature f ON w.worker_run_id = f.worker_run_id
-                JOIN scenario s ON f.feature_run_id = s.feature_run_id
-                GROUP BY f.feature_run_id
-            )
-            SELECT
-                *,
-                CASE
-                    WHEN failed > 0 THEN 'failed'
-                    WHEN error > 0 THEN 'error'
-                    WHEN terminated > 0 THEN 'terminated'
-                    WHEN passed > 0 THEN 'passed'
-                    WHEN skipped > 0 THEN 'skipped'
-                    ELSE 'untested'
-                END AS status
-            FROM feature_first_level
-            ORDER BY start_at ASC
-        """)
-    db.execute_sql("""
-            CREATE VIEW IF NOT EXISTS flat AS
-            SELECT
-                w.cucu_run_id,
-                s.start_at,
-                s.duration,
-                f.name AS feature_name,
-                s.name AS scenario_name,
-                CASE
-                    WHEN f.tags = '[]' AND s.tags = '[]' THEN JSON('[]')
-                    WHEN f.tags = '[]' THEN s.tags
-                    WHEN s.tags = '[]' THEN f.tags
-                    ELSE JSON(REPLACE(f.tags, ']', '') || ',' || REPLACE(s.tags, '[', ''))
-                END as tags,
-                s.log_files
-            FROM scenario s
-            JOIN feature f ON s.feature_run_id = f.feature_run_id
-            JOIN worker w ON f.worker_run_id = w.worker_run_id
-        """)
-    db.execute_sql("""
-            CREATE VIEW IF NOT EXISTS flat_scenario AS
-            SELECT
-                s.scenario_run_id,
-                f.name AS feature_name,
-                s.name AS scenario_name,
-                CASE
-                    WHEN f.tags = '[]' AND s.tags = '[]' THEN JSON('[]')
-                    WHEN f.tags = '[]' THEN s.tags
-                    WHEN s.tags = '[]' THEN f.tags
-                    ELSE JSON(REPLACE(f.tags, ']', '') || ',' || REPLACE(s.tags, '[', ''))
-                END as tags,
-                f.filename || ':' || s.line_number AS feature_file_line,
-                s.status,
-                (
-                    SELECT json_group_array(json_object(
-                        'status', st.status,
-                        'duration', st.duration,
-                        'name', st.name
-                    ))
-                    FROM step st
-                    WHERE st.scenario_run_id = s.scenario_run_id
-                    ORDER BY st.seq
-                ) AS steps,
-                (
-                    SELECT st.debug_output
-                    FROM step st
-                    WHERE st.scenario_run_id = s.scenario_run_id
-                    ORDER BY st.seq DESC
-                    LIMIT 1
-                ) AS last_step_debug_log
-            FROM scenario s
-            JOIN feature f ON s.feature_run_id = f.feature_run_id
-        """)
+                SUM(CASE WHEN s.flaky = 1 THEN 1 ELSE 0 END) AS flaky,
+                SUM(s.duration) AS duration
+            FROM cucu_run r
+            JOIN worker w ON r.cucu_run_id = w.cucu_run_id
+            JOIN feature f ON w.worker_run_id = f.worker_run_id
+            JOIN scenario s ON f.feature_run_id = s.feature_run_id
+            WHERE s.retried IS NOT 1
+            GROUP BY f.feature_run_id
+        )
+        SELECT
+            *,
+            CASE
+                WHEN failed > 0 THEN 'failed'
+                WHEN error > 0 THEN 'error'
+                WHEN terminated > 0 THEN 'terminated'
+                WHEN passed > 0 THEN 'passed'
+                WHEN skipped > 0 THEN 'skipped'
+                ELSE 'untested'
+            END AS status
+        FROM feature_first_level
+        ORDER BY start_at ASC
+    """,
+    "flat": """
+        CREATE VIEW IF NOT EXISTS flat AS
+        SELECT
+            w.cucu_run_id,
+            s.start_at,
+            s.duration,
+            f.name AS feature_name,
+            s.name AS scenario_name,
+            CASE
+                WHEN f.tags = '[]' AND s.tags = '[]' THEN JSON('[]')
+                WHEN f.tags = '[]' THEN s.tags
+                WHEN s.tags = '[]' THEN f.tags
+                ELSE JSON(REPLACE(f.tags, ']', '') || ',' || REPLACE(s.tags, '[', ''))
+            END as tags,
+            s.log_files
+        FROM scenario s
+        JOIN feature f ON s.feature_run_id = f.feature_run_id
+        JOIN worker w ON f.worker_run_id = w.worker_run_id
+    """,
+    "flat_scenario": """
+        CREATE VIEW IF NOT EXISTS flat_scenario AS
+        SELECT
+            s.scenario_run_id,
+            f.name AS feature_name,
+            s.name AS scenario_name,
+            CASE
+                WHEN f.tags = '[]' AND s.tags = '[]' THEN JSON('[]')
+                WHEN f.tags = '[]' THEN s.tags
+                WHEN s.tags = '[]' THEN f.tags
+                ELSE JSON(REPLACE(f.tags, ']', '') || ',' || REPLACE(s.tags, '[', ''))
+            END as tags,
+            f.filename || ':' || s.line_number AS feature_file_line,
+            s.status,
+            (
+                SELECT json_group_array(json_object(
+                    'status', st.status,
+                    'duration', st.duration,
+                    'name', st.name
+                ))
+                FROM step st
+                WHERE st.scenario_run_id = s.scenario_run_id
+                ORDER BY st.seq
+            ) AS steps,
+            (
+                SELECT st.debug_output
+                FROM step st
+                WHERE st.scenario_run_id = s.scenario_run_id
+                ORDER BY st.seq DESC
+                LIMIT 1
+            ) AS last_step_debug_log
+        FROM scenario s
+        JOIN feature f ON s.feature_run_id = f.feature_run_id
+    """,
+}
+
+
+def create_database_file(db_filepath):
+    # the writer's connection is to the database file used so far
+    stop_writer()
+    db.init(db_filepath, **database_options())
+    db.connect(reuse_if_open=True)
+    db.create_tables(
+        [
+            cucu_run,
+            worker,
+            feature,
+            scenario,
+            step,
+            concurrency_sample,
+            selenium_endpoint,
+            blob,
+        ]
+    )
+    for view_sql in VIEWS.values():
+        db.execute_sql(view_sql)
 
 
 def get_first_cucu_run_filepath():
@@ -465,6 +858,126 @@ def get_first_cucu_run_filepath():
     return run_record.filepath
 
 
+# tables copied from the worker database files into the run.db, in order
+TABLES_TO_COPY = [
+    "cucu_run",
+    "worker",
+    "feature",
+    "scenario",
+    "step",
+    "concurrency_sample",
+    "selenium_endpoint",
+    "blob",
+]
+
+# number of database files attached and copied in a single transaction,
+# sqlite attaches at most 10 databases to a connection by default
+CONSOLIDATE_BATCH_SIZE = 8
+
+
+# the columns added to the scenario table since the first run.db files
+MIGRATED_SCENARIO_COLUMNS = {
+    "attempt": "INTEGER NOT NULL DEFAULT 1",
+    "retried": "INTEGER",
+    "flaky": "INTEGER",
+}
+
+
+def migrate_database(conn):
+    """
+    add the scenario columns a run.db written by an older version of cucu
+    lacks and recreate the views reading them, like `copy_database_files`
+    does for the worker database files
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(scenario)")]
+    missing_columns = [
+        column
+        for column in MIGRATED_SCENARIO_COLUMNS
+        if columns and column not in columns
+    ]
+    if not missing_columns:
+        return
+
+    cucu_logger.debug(
+        f"adding the columns {', '.join(missing_columns)} to the scenarios"
+    )
+    for column in missing_columns:
+        conn.execute(
+            f"ALTER TABLE scenario ADD COLUMN {column} "
+            f"{MIGRATED_SCENARIO_COLUMNS[column]}"
+        )
+
+    for view_name, view_sql in VIEWS.items():
+        conn.execute(f"DROP VIEW IF EXISTS {view_name}")
+        conn.execute(view_sql)
+
+    conn.commit()
+
+
+def copy_database_files(target_conn, db_files):
+    """
+    copy the records of the database files provided into the target database
+    in a single transaction, the records are copied by sqlite from the
+    attached database files so they're never loaded in memory
+    """
+    target_columns = {
+        table_name: [
+            row[1]
+            for row in target_conn.execute(f"PRAGMA table_info({table_name})")
+        ]
+        for table_name in TABLES_TO_COPY
+    }
+
+    # a database can't be attached within a transaction
+    target_conn.commit()
+    schemas = []
+    for index, db_file in enumerate(db_files):
+        schema = f"source_{index}"
+        target_conn.execute(f"ATTACH DATABASE ? AS {schema}", [str(db_file)])
+        schemas.append(schema)
+
+    try:
+        for schema, db_file in zip(schemas, db_files):
+            for table_name in TABLES_TO_COPY:
+                source_columns = [
+                    row[1]
+                    for row in target_conn.execute(
+                        f"PRAGMA {schema}.table_info({table_name})"
+                    )
+                ]
+                # run.db files created by older versions of cucu lack the
+                # newer tables and columns, which are left to their defaults
+                columns = [
+                    column
+                    for column in source_columns
+                    if column in target_columns[table_name]
+                ]
+                if not columns:
+                    continue
+
+                values, params = columns, []
+                if table_name == "cucu_run" and "db_path" in columns:
+                    # prep cucu_run for combining multiple runs
+                    values = [
+                        "?" if column == "db_path" else column
+                        for column in columns
+                    ]
+                    params = [str(db_file)]
+
+                target_conn.execute(
+                    f"INSERT OR REPLACE INTO main.{table_name} "
+                    f"({','.join(columns)}) "
+                    f"SELECT {','.join(values)} FROM {schema}.{table_name}",
+                    params,
+                )
+
+        target_conn.commit()
+    finally:
+        target_conn.rollback()
+        for schema in schemas:
+            target_conn.execute(f"DETACH DATABASE {schema}")
+
+
 def consolidate_database_files(results_dir, combine=False):
     # This function would need a more advanced approach with peewee, so for now, keep using sqlite3 for consolidation
     results_path = Path(results_dir)
@@ -484,50 +997,209 @@ def consolidate_database_files(results_dir, combine=False):
     else:
         # include all run.db files in all subdirectories
         db_files = [
-            db for db in results_path.rglob("run*.db") if db != Path("run.db")
+            db for db in results_path.rglob("run*.db") if db != target_db_path
         ]
 
+    db_files.sort()
+
     if not db_files:
+        # the workers of a run with CUCU_RUN_DB_SHARED wrote to the run.db
         cucu_logger.debug("No database files found to consolidate.")
-        return
     else:
         cucu_logger.debug(
             f"Found {len(db_files)} database files to consolidate."
         )
 
-    tables_to_copy = ["cucu_run", "worker", "feature", "scenario", "step"]
     with sqlite3.connect(target_db_path) as target_conn:
-        target_cursor = target_conn.cursor()
-        for db_file in db_files:
-            with sqlite3.connect(db_file) as source_conn:
-                source_cursor = source_conn.cursor()
-                for table_name in tables_to_copy:
-                    source_cursor.execute(f"SELECT * FROM {table_name}")
-                    rows = source_cursor.fetchall()
-                    source_cursor.execute(f"PRAGMA table_info({table_name})")
-                    columns = [col[1] for col in source_cursor.fetchall()]
+        # the run.db may have been written by an older version of cucu
+        migrate_database(target_conn)
 
-                    # prep cucu_run for combining multiple runs
-                    if table_name == "cucu_run":
-                        db_path_index = columns.index("db_path")
-                        rows = [
-                            tuple(
-                                item if idx != db_path_index else str(db_file)
-                                for idx, item in enumerate(row)
-                            )
-                            for row in rows
-                        ]
-
-                    placeholders = ",".join(["?" for _ in columns])
-                    target_cursor.executemany(
-                        f"INSERT OR REPLACE INTO {table_name} VALUES ({placeholders})",
-                        rows,
-                    )
-                    target_conn.commit()
+        for index in range(0, len(db_files), CONSOLIDATE_BATCH_SIZE):
+            batch = db_files[index : index + CONSOLIDATE_BATCH_SIZE]
+            copy_database_files(target_conn, batch)
 
-            if not combine and db_file.name != "run.db":
+            if not combine:
                 # remove the worker db files
-                db_file.unlink()
+                for db_file in batch:
+                    if db_file.name != "run.db":
+                        db_file.unlink()
+
+        mark_retried_scenarios(target_conn)
+        merge_split_feature_records(target_conn)
+        materialize_stats(target_conn)
+
+
+def materialize_stats(conn):
+    """
+    store the stats of the scenarios, features and whole run in the
+    scenario_stats, feature_stats and run_stats tables, which have the
+    columns of the flat_feature and flat_all views, so the report reads them
+    once computed at the end of the run instead of grouping every step again
+    """
+    # the scenarios of a run.db of an older version lack the flaky and
+    # retried columns the stats read
+    migrate_database(conn)
+
+    conn.executescript("""
+        BEGIN;
+
+        DROP TABLE IF EXISTS scenario_stats;
+        CREATE TABLE scenario_stats AS
+        SELECT
+            s.scenario_run_id,
+            s.feature_run_id,
+            s.status,
+            s.flaky,
+            s.duration,
+            COUNT(st.step_run_id) AS steps
+        FROM scenario s
+        LEFT JOIN step st ON s.scenario_run_id = st.scenario_run_id
+        WHERE s.retried IS NOT 1
+        GROUP BY s.scenario_run_id;
+
+        DROP TABLE IF EXISTS feature_stats;
+        CREATE TABLE feature_stats AS SELECT * FROM flat_feature;
+
+        DROP TABLE IF EXISTS run_stats;
+        CREATE TABLE run_stats AS
+        SELECT
+            COUNT(DISTINCT feature_run_id) AS features,
+            COUNT(scenario_run_id) AS scenarios,
+            SUM(CASE WHEN status = 'passed' THEN 1 ELSE 0 END) AS passed,
+            SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) AS failed,
+            SUM(CASE WHEN status = 'skipped' THEN 1 ELSE 0 END) AS skipped,
+            SUM(CASE WHEN status = 'error' THEN 1 ELSE 0 END) AS error,
+            SUM(CASE WHEN status = 'terminated' THEN 1 ELSE 0 END) AS terminated,
+            SUM(CASE WHEN flaky = 1 THEN 1 ELSE 0 END) AS flaky,
+            SUM(duration) AS duration,
+            SUM(steps) AS steps
+        FROM scenario_stats;
+
+        COMMIT;
+    """)
+
+
+def mark_retried_scenarios(conn):
+    """
+    flag the scenario records of the attempts that were retried by
+    `cucu run --retry-failed`, which the stats leave out, and flag the last
+    attempt of a scenario as flaky when it passed after failing
+    """
+    rows = conn.execute("""
+        SELECT w.cucu_run_id, f.filename, s.line_number, s.scenario_run_id,
+            s.status
+        FROM scenario s
+        JOIN feature f ON s.feature_run_id = f.feature_run_id
+        JOIN worker w ON f.worker_run_id = w.worker_run_id
+        ORDER BY s.attempt
+    """).fetchall()
+
+    attempts = {}
+    for cucu_run_id, filename, line_number, *record in rows:
+        attempts.setdefault((cucu_run_id, filename, line_number), []).append(
+            record
+        )
+
+    for records in attempts.values():
+        if len(records) == 1:
+            continue
+
+        *retried, (scenario_run_id, status) = records
+        conn.executemany(
+            "UPDATE scenario SET retried = 1 WHERE scenario_run_id = ?",
+            [(retried_run_id,) for retried_run_id, _ in retried],
+        )
+        conn.execute(
+            "UPDATE scenario SET flaky = ? WHERE scenario_run_id = ?",
+            [status == "passed", scenario_run_id],
+        )
+
+    conn.commit()
+
+
+def merge_split_feature_records(conn):
+    """
+    merge the feature records of a feature file that was split into one
+    worker task per scenario (see `cucu run --split-scenarios`), or whose
+    failed scenarios were retried in their own worker task (see
+    `cucu run --retry-failed`), into a single feature record per run so the
+    reports group its scenarios back together
+    """
+    rows = conn.execute("""
+        SELECT w.cucu_run_id, f.filename, f.feature_run_id, f.start_at,
+            f.end_at, f.status
+        FROM feature f
+        JOIN worker w ON f.worker_run_id = w.worker_run_id
+        WHERE f.behave_filepath LIKE '%:%'
+            OR f.feature_run_id IN (
+                SELECT feature_run_id FROM scenario WHERE retried = 1
+            )
+        ORDER BY f.start_at
+    """).fetchall()
+
+    split_features = {}
+    for cucu_run_id, filename, *record in rows:
+        split_features.setdefault((cucu_run_id, filename), []).append(record)
+
+    # worst status first
+    status_order = [
+        "failed",
+        "error",
+        "terminated",
+        "hook_error",
+        "undefined",
+        "passed",
+        "skipped",
+        "untested",
+    ]
+
+    def status_rank(status):
+        if status in status_order:
+            return status_order.index(status)
+
+        return len(status_order)
+
+    for records in split_features.values():
+        if len(records) == 1:
+            continue
+
+        feature_run_id = records[0][0]
+        duplicate_ids = [record[0] for record in records[1:]]
+        end_ats = [record[2] for record in records if record[2] is not None]
+        status = min((record[3] for record in records), key=status_rank)
+
+        # the status of a feature whose failed scenarios were retried is the
+        # one of the last attempt of every scenario
+        feature_run_ids = [record[0] for record in records]
+        placeholders = ",".join(["?" for _ in feature_run_ids])
+        scenario_rows = conn.execute(
+            f"SELECT status, retried FROM scenario "
+            f"WHERE feature_run_id IN ({placeholders})",
+            feature_run_ids,
+        ).fetchall()
+        if any(retried for _, retried in scenario_rows):
+            status = min(
+                (status for status, retried in scenario_rows if not retried),
+                key=status_rank,
+            )
+
+        placeholders = ",".join(["?" for _ in duplicate_ids])
+        conn.execute(
+            f"UPDATE scenario SET feature_run_id = ? "
+            f"WHERE feature_run_id IN ({placeholders})",
+            [feature_run_id, *duplicate_ids],
+        )
+        conn.execute(
+            f"DELETE FROM feature WHERE feature_run_id IN ({placeholders})",
+            duplicate_ids,
+        )
+        conn.execute(
+            "UPDATE feature SET end_at = ?, status = ? "
+            "WHERE feature_run_id = ?",
+            [max(end_ats, default=None), status, feature_run_id],
+        )
+
+    conn.commit()
 
 
 def init_html_report_db(db_path):
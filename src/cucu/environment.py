@@ -17,7 +17,9 @@ from cucu.utils import (
     TeeStream,
     build_debug_output,
     ellipsize_filename,
+    get_attempt,
     get_iso_timestamp_with_ms,
+    get_scenario_folder_name,
     parse_iso_timestamp,
     take_screenshot,
 )
@@ -112,7 +114,9 @@ def before_scenario(ctx, scenario):
     scenario.start_at = get_iso_timestamp_with_ms()
 
     if config.CONFIG["CUCU_RESULTS_DIR"] is not None:
-        ctx.scenario_dir = ctx.feature_dir / ellipsize_filename(scenario.name)
+        ctx.scenario_dir = ctx.feature_dir / get_scenario_folder_name(
+            scenario.name, get_attempt()
+        )
         CONFIG["SCENARIO_RESULTS_DIR"] = ctx.scenario_dir
         ctx.scenario_dir.mkdir(parents=True, exist_ok=True)
 
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
-import os
+import shutil
 import traceback
+import xml.etree.ElementTree as ET
 from datetime import datetime
+from pathlib import Path
 from xml.sax.saxutils import escape
 
 import bs4
@@ -10,9 +12,20 @@ from behave.model_core import Status
 from bs4.formatter import XMLFormatter
 from tenacity import RetryError
 
+from cucu import logger as cucu_logger
 from cucu.ansi_parser import remove_ansi
 from cucu.config import CONFIG
-from cucu.utils import ellipsize_filename
+from cucu.utils import (
+    ellipsize_filename,
+    get_attempt,
+    get_filepath_line_number,
+    get_scenario_folder_name,
+)
+
+# directory within the JUnit directory where the workers running a single
+# scenario of a feature write their results until they're merged back into a
+# single JUnit XML file per feature
+FRAGMENTS_DIRNAME = ".fragments"
 
 
 class CucuJUnitFormatter(Formatter):
@@ -158,7 +171,7 @@ class CucuJUnitFormatter(Formatter):
             "skipped": None,
         }
         self.current_scenario_results["foldername"] = escape(
-            ellipsize_filename(scenario.name)
+            get_scenario_folder_name(scenario.name, get_attempt())
         )
         if scenario.tags:
             self.current_scenario_results["tags"] = ", ".join(scenario.tags)
@@ -205,141 +218,261 @@ class CucuJUnitFormatter(Formatter):
         pass
 
     def write_results(self, results):
-        """
-        given a feature results dictionary that looks like so:
-            {
-                "name": "name of the feature",
-                "foldername": "",
-                "tests": 0,
-                "errors": 0,
-                "failures": 0,
-                "skipped": 0,
-                "timestamp": "",
-                "scenarios": {
-                    "scenario name": {
-                        "foldername": "",
-                        "tags": "DOM-3435, testrail(3366,45891)",
-                        "status": "passed/failed/skipped",
-                        "time": "0.0000":
-                        "stdout": "",
-                        "stderr": "",
-                    },
-                    ...
-                }
-            }
-        """
-
-        # custom attribute ordering so attributes are printed in a consistent
-        # and desired order
-        class SortAttributes(XMLFormatter):
-            def attributes(self, tag):
-                ordered = [
-                    "classname",
-                    "name",
-                    "foldername",
-                    "tests",
-                    "errors",
-                    "failures",
-                    "skipped",
-                    "status",
-                    "timestamp",
-                    "time",
-                    "tags",
-                ]
+        junit_dir = CONFIG["CUCU_JUNIT_DIR"]
+        output_filepath = Path(junit_dir) / f"{results['name']}.xml"
+
+        behave_filepath = CONFIG["BEHAVE_FILEPATH"]
+        if CONFIG["__CUCU_PARENT_STDOUT"] and behave_filepath:
+            if line_number := get_filepath_line_number(behave_filepath):
+                # other workers are running the other scenarios of this
+                # feature, see merge_junit_fragments
+                output_filepath = (
+                    Path(junit_dir)
+                    / FRAGMENTS_DIRNAME
+                    / f"{results['name']}-{line_number}.xml"
+                )
 
-                return [
-                    (attr, tag[attr]) for attr in ordered if attr in tag.attrs
-                ]
+        write_junit_results(results, output_filepath)
 
-        soup = bs4.BeautifulSoup()
-        testsuite = bs4.Tag(name="testsuite")
-        testsuite["name"] = results["name"]
-        testsuite["foldername"] = results["foldername"]
-        testsuite["timestamp"] = results["timestamp"]
 
-        junit_dir = CONFIG["CUCU_JUNIT_DIR"]
-        os.makedirs(junit_dir, exist_ok=True)
+def write_junit_results(results, output_filepath):
+    """
+    write the JUnit XML file for the feature results dictionary provided,
+    which looks like so:
+        {
+            "name": "name of the feature",
+            "foldername": "",
+            "tests": 0,
+            "errors": 0,
+            "failures": 0,
+            "skipped": 0,
+            "timestamp": "",
+            "scenarios": {
+                "scenario name": {
+                    "foldername": "",
+                    "tags": "DOM-3435, testrail(3366,45891)",
+                    "status": "passed/failed/skipped",
+                    "time": "0.0000":
+                    "stdout": "",
+                    "stderr": "",
+                },
+                ...
+            }
+        }
+    """
+
+    # custom attribute ordering so attributes are printed in a consistent
+    # and desired order
+    class SortAttributes(XMLFormatter):
+        def attributes(self, tag):
+            ordered = [
+                "classname",
+                "name",
+                "foldername",
+                "tests",
+                "errors",
+                "failures",
+                "skipped",
+                "status",
+                "timestamp",
+                "time",
+                "tags",
+                "flaky",
+            ]
 
-        feature_name = results["name"]
-        output_filepath = os.path.join(junit_dir, f"{feature_name}.xml")
+            return [(attr, tag[attr]) for attr in ordered if attr in tag.attrs]
+
+    soup = bs4.BeautifulSoup()
+    testsuite = bs4.Tag(name="testsuite")
+    testsuite["name"] = results["name"]
+    testsuite["foldername"] = results["foldername"]
+    testsuite["timestamp"] = results["timestamp"]
+
+    output_filepath = Path(output_filepath)
+    output_filepath.parent.mkdir(parents=True, exist_ok=True)
+
+    scenarios = results["scenarios"]
+
+    if CONFIG["CUCU_SHOW_SKIPS"] != "true":
+        filtered_scenarios = {}
+
+        for name, scenario in scenarios.items():
+            if scenario["status"] != "skipped":
+                filtered_scenarios[name] = scenario
+
+        scenarios = filtered_scenarios
+
+        if len(scenarios) == 0:
+            # we had a suite of just skipped results
+            return
+
+    # calculate with the latest data
+    # workaround for beatufulsoup4 removing the attribute if it is set to 0
+    testsuite["tests"] = str(len(scenarios))
+    testsuite["failures"] = str(
+        len([x for x in scenarios.values() if x["status"] == Status.failed])
+    )
+    testsuite["skipped"] = str(
+        len([x for x in scenarios.values() if x["status"] == Status.skipped])
+    )
+    testsuite["errors"] = str(
+        len(
+            [
+                x
+                for x in scenarios.values()
+                if x["status"]
+                not in (Status.failed, Status.skipped, Status.passed)
+            ]
+        )
+    )
+
+    if "tags" in results:
+        testsuite["tags"] = results["tags"]
+    soup.append(testsuite)
+
+    for scenario_name in scenarios:
+        scenario = scenarios[scenario_name]
+        testcase = bs4.Tag(name="testcase")
+        testcase["classname"] = results["name"]
+        testcase["name"] = scenario_name
+        testcase["foldername"] = scenario["foldername"]
+        if "tags" in scenario:
+            testcase["tags"] = scenario["tags"]
+        testcase["status"] = scenario["status"]
+        testcase["time"] = scenario["time"]
+
+        if scenario["failure"] is not None:
+            failure_message = "\n".join(scenario["failure"])
+            failure = bs4.Tag(name="failure")
+            cleaned_failure_message = remove_ansi(failure_message)
+            failure.append(bs4.CData(cleaned_failure_message))
+            testcase.append(failure)
+
+        if scenario.get("error") is not None:
+            error_message = "\n".join(scenario["error"])
+            error = bs4.Tag(name="error")
+            error.append(bs4.CData(remove_ansi(error_message)))
+            testcase.append(error)
+
+        if scenario["skipped"] is not None:
+            testcase.append(bs4.Tag(name="skipped"))
+
+        if scenario.get("flaky") is not None:
+            # passed when retried by --retry-failed, recorded the same way as
+            # the flaky tests of the maven surefire plugin
+            testcase["flaky"] = "true"
+            flaky_failure = bs4.Tag(name="flakyFailure")
+            flaky_failure.append(
+                bs4.CData(remove_ansi("\n".join(scenario["flaky"])))
+            )
+            testcase.append(flaky_failure)
+
+        testsuite.append(testcase)
+
+    with open(output_filepath, "w", encoding="utf-8") as output:
+        output.write(soup.prettify(formatter=SortAttributes()))
+
+
+def read_junit_results(input_filepath):
+    """
+    read a JUnit XML file written by `write_junit_results` back into a feature
+    results dictionary
+    """
+    testsuite = ET.parse(input_filepath).getroot()
+    results = {
+        "name": testsuite.get("name"),
+        "foldername": testsuite.get("foldername"),
+        "timestamp": testsuite.get("timestamp"),
+        "scenarios": {},
+    }
+    if testsuite.get("tags") is not None:
+        results["tags"] = testsuite.get("tags")
+
+    for testcase in testsuite.iter("testcase"):
+        scenario = {
+            "foldername": testcase.get("foldername"),
+            "status": testcase.get("status"),
+            "time": testcase.get("time"),
+            "failure": None,
+            "error": None,
+            "skipped": None,
+        }
+        if testcase.get("tags") is not None:
+            scenario["tags"] = testcase.get("tags")
+
+        for detail in ["failure", "error"]:
+            element = testcase.find(detail)
+            if element is not None:
+                scenario[detail] = (element.text or "").strip().splitlines()
+
+        if testcase.find("skipped") is not None:
+            scenario["skipped"] = True
+
+        flaky_failure = testcase.find("flakyFailure")
+        if flaky_failure is not None:
+            scenario["flaky"] = (flaky_failure.text or "").strip().splitlines()
+
+        results["scenarios"][testcase.get("name")] = scenario
+
+    return results
+
+
+def merge_junit_fragments(junit_dir, retry=False):
+    """
+    merge the JUnit XML files written by the workers that each ran a single
+    scenario of a feature back into a single JUnit XML file per feature, the
+    fragments of the scenarios retried by --retry-failed replace the results
+    of their previous attempt
+    """
+    fragments_dir = Path(junit_dir) / FRAGMENTS_DIRNAME
+    if not fragments_dir.exists():
+        return
+
+    def line_number(fragment_filepath):
+        return int(fragment_filepath.stem.rsplit("-", 1)[1])
+
+    merged = {}
+    for fragment_filepath in sorted(
+        fragments_dir.glob("*.xml"), key=line_number
+    ):
+        try:
+            results = read_junit_results(fragment_filepath)
+        except ET.ParseError:
+            cucu_logger.error(
+                f"failed to parse junit file {fragment_filepath}, skipping"
+            )
+            continue
 
-        scenarios = results["scenarios"]
+        feature_filepath = Path(junit_dir) / f"{results['name']}.xml"
+        if results["name"] not in merged:
+            if not retry or not feature_filepath.exists():
+                merged[results["name"]] = results
+                continue
 
-        if CONFIG["CUCU_SHOW_SKIPS"] != "true":
-            filtered_scenarios = {}
+            merged[results["name"]] = read_junit_results(feature_filepath)
 
-            for name, scenario in scenarios.items():
-                if scenario["status"] != "skipped":
-                    filtered_scenarios[name] = scenario
+        feature_results = merged[results["name"]]
+        feature_results["timestamp"] = min(
+            feature_results["timestamp"], results["timestamp"]
+        )
 
-            scenarios = filtered_scenarios
+        for scenario_name, scenario in results["scenarios"].items():
+            previous = feature_results["scenarios"].get(scenario_name)
+            if (
+                retry
+                and previous is not None
+                and previous["status"] not in ("passed", "skipped")
+                and scenario["status"] == "passed"
+            ):
+                scenario["flaky"] = (
+                    previous["failure"]
+                    or previous["error"]
+                    or [f"scenario {previous['status']}"]
+                )
 
-            if len(scenarios) == 0:
-                # we had a suite of just skipped results
-                return
+            feature_results["scenarios"][scenario_name] = scenario
 
-        # calculate with the latest data
-        # workaround for beatufulsoup4 removing the attribute if it is set to 0
-        testsuite["tests"] = str(len(scenarios))
-        testsuite["failures"] = str(
-            len(
-                [x for x in scenarios.values() if x["status"] == Status.failed]
-            )
-        )
-        testsuite["skipped"] = str(
-            len(
-                [
-                    x
-                    for x in scenarios.values()
-                    if x["status"] == Status.skipped
-                ]
-            )
-        )
-        testsuite["errors"] = str(
-            len(
-                [
-                    x
-                    for x in scenarios.values()
-                    if x["status"]
-                    not in (Status.failed, Status.skipped, Status.passed)
-                ]
-            )
-        )
+    for feature_name, results in merged.items():
+        write_junit_results(results, Path(junit_dir) / f"{feature_name}.xml")
 
-        if "tags" in results:
-            testsuite["tags"] = results["tags"]
-        soup.append(testsuite)
-
-        for scenario_name in scenarios:
-            scenario = scenarios[scenario_name]
-            testcase = bs4.Tag(name="testcase")
-            testcase["classname"] = results["name"]
-            testcase["name"] = scenario_name
-            testcase["foldername"] = scenario["foldername"]
-            if "tags" in scenario:
-                testcase["tags"] = scenario["tags"]
-            testcase["status"] = scenario["status"]
-            testcase["time"] = scenario["time"]
-
-            if scenario["failure"] is not None:
-                failure_message = "\n".join(scenario["failure"])
-                failure = bs4.Tag(name="failure")
-                cleaned_failure_message = remove_ansi(failure_message)
-                failure.append(bs4.CData(cleaned_failure_message))
-                testcase.append(failure)
-
-            if scenario.get("error") is not None:
-                error_message = "\n".join(scenario["error"])
-                error = bs4.Tag(name="error")
-                error.append(bs4.CData(remove_ansi(error_message)))
-                testcase.append(error)
-
-            if scenario["skipped"] is not None:
-                testcase.append(bs4.Tag(name="skipped"))
-
-            testsuite.append(testcase)
-
-        feature_name = results["name"]
-        output_filepath = os.path.join(junit_dir, f"{feature_name}.xml")
-        with open(output_filepath, "w", encoding="utf-8") as output:
-            output.write(soup.prettify(formatter=SortAttributes()))
+    shutil.rmtree(fragments_dir)
@@ -9,6 +9,7 @@ from behave.formatter.base import Formatter
 from behave.model import ScenarioOutline, Status
 
 from cucu import logger
+from cucu.browser import remote
 from cucu.config import CONFIG
 from cucu.db import (
     close_db,
@@ -21,6 +22,7 @@ from cucu.db import (
     record_cucu_run,
     record_feature,
     record_scenario,
+    record_selenium_endpoints,
     start_step_record,
 )
 from cucu.utils import (
@@ -83,16 +85,24 @@ class RundbFormatter(Formatter):
             results_path = Path(CONFIG["CUCU_RESULTS_DIR"])
             worker_run_id = CONFIG["WORKER_RUN_ID"]
             cucu_run_id = CONFIG["CUCU_RUN_ID"]
-            CONFIG["RUN_DB_PATH"] = run_db_path = (
-                results_path / f"run_{cucu_run_id}_{worker_run_id}.db"
-            )
 
-            if not run_db_path.exists():
-                logger.debug(
-                    f"Creating new run database file: {run_db_path} for {worker_id_seed}"
-                )
+            if CONFIG.true("CUCU_RUN_DB_SHARED"):
+                # every worker writes to the run.db of the parent process,
+                # recording the worker once however many features it runs
+                CONFIG["RUN_DB_PATH"] = run_db_path = results_path / "run.db"
                 create_database_file(run_db_path)
                 record_cucu_run()
+            else:
+                CONFIG["RUN_DB_PATH"] = run_db_path = (
+                    results_path / f"run_{cucu_run_id}_{worker_run_id}.db"
+                )
+
+                if not run_db_path.exists():
+                    logger.debug(
+                        f"Creating new run database file: {run_db_path} for {worker_id_seed}"
+                    )
+                    create_database_file(run_db_path)
+                    record_cucu_run()
 
     def uri(self, uri):
         # nothing to do, but we need to implement the method for behave
@@ -203,6 +213,9 @@ class RundbFormatter(Formatter):
         """Called before the formatter is no longer used
         (stream/io compatibility).
         """
+        if remote.ENDPOINTS:
+            record_selenium_endpoints(remote.ENDPOINTS)
+
         finish_worker_record(None)
         finish_cucu_run_record()
         close_db()
@@ -0,0 +1,99 @@
+"""
+placement of the artifacts of a run, screenshots, downloads, logs and the
+report assets, into the report directory: instead of copying them they can be
+reflinked on copy-on-write filesystems, hard-linked or symlinked, falling back
+to copying whenever the filesystem doesn't support it.
+"""
+
+import errno
+import os
+import shutil
+import sys
+from pathlib import Path
+
+# ioctl cloning a file on the copy-on-write filesystems of Linux (btrfs, XFS)
+FICLONE = 0x40049409
+
+LINK_MODES = ["copy", "auto", "reflink", "hardlink", "symlink"]
+
+
+def reflink(src, dst):
+    if sys.platform != "linux":
+        raise OSError(errno.EOPNOTSUPP, "reflinks are only supported on Linux")
+
+    import fcntl
+
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            dst_file.close()
+            os.unlink(dst)
+            raise
+
+
+def hardlink(src, dst):
+    os.link(src, dst)
+
+
+def symlink(src, dst):
+    os.symlink(Path(src).absolute(), dst)
+
+
+def auto(src, dst):
+    try:
+        reflink(src, dst)
+        return
+    except OSError:
+        pass
+
+    try:
+        hardlink(src, dst)
+    except OSError as error:
+        # hard links can't cross filesystems
+        if error.errno != errno.EXDEV:
+            raise
+
+        symlink(src, dst)
+
+
+PLACEMENTS = {
+    "auto": auto,
+    "reflink": reflink,
+    "hardlink": hardlink,
+    "symlink": symlink,
+}
+
+
+def place_file(src, dst, link_mode="copy"):
+    """
+    place the file src at dst, replacing any existing file, with the link
+    mode provided or by copying it when the link can't be created
+    """
+    dst = Path(dst)
+    # a link would write through to the file it replaces
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+
+    if link_mode != "copy":
+        try:
+            PLACEMENTS[link_mode](src, dst)
+            return dst
+        except OSError:
+            pass
+
+    shutil.copy2(src, dst)
+    return dst
+
+
+def place_tree(src, dst, link_mode="copy"):
+    """
+    place every file of the directory src under dst, as `shutil.copytree`
+    with `dirs_exist_ok` would copy them
+    """
+    return shutil.copytree(
+        src,
+        dst,
+        dirs_exist_ok=True,
+        copy_function=lambda src, dst: place_file(src, dst, link_mode),
+    )
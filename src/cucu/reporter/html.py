@@ -1,3 +1,5 @@
+import functools
+import json
 import shutil
 import sys
 import traceback
@@ -6,13 +8,30 @@ from pathlib import Path
 from xml.sax.saxutils import escape as escape_
 
 import jinja2
+from mpire import WorkerPool
 from playhouse import shortcuts
 
 import cucu.db as db
 from cucu import format_gherkin_table, logger
 from cucu.ansi_parser import parse_log_to_html
 from cucu.config import CONFIG
-from cucu.utils import behave_filepath_to_cucu_logpath, ellipsize_filename
+from cucu.reporter.artifacts import place_file, place_tree
+from cucu.reporter.manifest import (
+    hash_feature_inputs,
+    load_manifest,
+    write_manifest,
+)
+from cucu.utils import (
+    ellipsize_filename,
+    get_scenario_folder_name,
+    scenario_console_log_path,
+)
+
+# directory of the report with the rows of the index and flat pages, written
+# in the default order of their table in chunks the pages load as they're
+# paged through, so they open quickly regardless of size
+DATA_DIRNAME = "report_data"
+DATA_CHUNK_SIZE = 1000
 
 
 def escape(data):
@@ -102,8 +121,11 @@ def step_table_to_html(table_data):
     )
 
 
-def generate(results: Path, basepath: Path):
-    ## Jinja2 templates setup
+@functools.cache
+def load_templates():
+    """
+    the Jinja2 templates of the report, loaded once per process
+    """
     package_loader = jinja2.PackageLoader("cucu.reporter", "templates")
     templates = jinja2.Environment(loader=package_loader)  # nosec
     templates.globals.update(
@@ -114,25 +136,415 @@ def generate(results: Path, basepath: Path):
         step_text_list_to_html=step_text_list_to_html,
         step_table_to_html=step_table_to_html,
     )
+    return templates
+
+
+def index_rows(feature_stats):
+    """
+    the rows of the table of the index page, one per feature, in the default
+    order of the table by the number of errored scenarios
+    """
+    rows = [
+        [
+            feature_stat["start_at"],
+            escape(feature_stat["feature_name"]),
+            f"{urlencode(escape(feature_stat['feature_name']))}.html",
+            feature_stat["scenarios"],
+            feature_stat["passed"],
+            feature_stat["flaky"],
+            feature_stat["failed"],
+            feature_stat["skipped"],
+            feature_stat["error"],
+            feature_stat["terminated"],
+            feature_stat["status"],
+            "{:.1f}".format(float(feature_stat["duration"] or 0)),
+        ]
+        for feature_stat in feature_stats
+    ]
+    return sorted(rows, key=lambda row: row[8] or 0)
+
+
+def flat_rows(features):
+    """
+    the rows of the table of the flat page, one per scenario, in the default
+    order of the table by scenario name
+    """
+    rows = []
+    for feature in features:
+        feature_href = f"{urlencode(escape(feature['name']))}.html"
+        feature_folder = urlencode(escape(feature["folder_name"]))
+
+        for scenario in feature["scenarios"]:
+            # ignore Backgrounds for the time being
+            if scenario.get("keyword") == "Background":
+                continue
+
+            scenario_folder = urlencode(escape(scenario["folder_name"]))
+            rows.append(
+                [
+                    scenario["start_at"],
+                    escape(feature["name"]),
+                    feature_href,
+                    feature["tags"],
+                    escape(scenario["name"]),
+                    f"{feature_folder}/{scenario_folder}/index.html",
+                    scenario["attempt"],
+                    scenario["tags"],
+                    scenario["total_steps"],
+                    scenario["status"],
+                    scenario["flaky"],
+                    "{:.1f}".format(float(scenario["duration"] or 0)),
+                ]
+            )
+
+    return sorted(rows, key=lambda row: row[4].lower())
+
+
+def write_data_chunks(basepath: Path, name, rows):
+    """
+    write the rows of the table of a page of the report as the scripts
+    `report_data/{name}.{index}.js`, each loading DATA_CHUNK_SIZE rows of
+    the table, replacing the chunks of a previous report
+    """
+    data_path = basepath / DATA_DIRNAME
+    data_path.mkdir(parents=True, exist_ok=True)
+    for chunk_path in data_path.glob(f"{name}.*.js"):
+        chunk_path.unlink()
+
+    chunks = range(0, max(len(rows), 1), DATA_CHUNK_SIZE)
+    for index, offset in enumerate(chunks):
+        data = json.dumps(
+            rows[offset : offset + DATA_CHUNK_SIZE],
+            default=str,
+            separators=(",", ":"),
+        )
+        chunk_path = data_path / f"{name}.{index}.js"
+        chunk_path.write_text(
+            f'loadReportData("{name}", {index}, {data});\n', encoding="utf8"
+        )
+
+    return len(chunks)
+
+
+def generate_feature(
+    results: Path, basepath: Path, feature_run_id: str, link_mode="copy"
+):
+    """
+    copy the results directory of the feature provided into the report and
+    render its feature, scenario and replay pages, along with the HTML
+    version of its console logs
+    """
+    templates = load_templates()
     feature_template = templates.get_template("feature.html")
     scenario_template = templates.get_template("scenario.html")
     scenario_replay_template = templates.get_template("scenario_replay.html")
 
+    db_feature = db.feature.get_by_id(feature_run_id)
+    feature_dict = shortcuts.model_to_dict(db_feature, backrefs=True)
+
+    feature_results_dir = results
+    if db_path := db_feature.worker.cucu_run.db_path:
+        logger.debug(
+            f"Combining cucu_runs, using db_path from worker: {db_path}"
+        )
+        feature_results_dir = Path(db_path).parent
+
+    feature_dict["results_dir"] = feature_results_dir
+    feature_dict["folder_name"] = ellipsize_filename(db_feature.name)
+    feature_dict["duration"] = (
+        feature_dict["start_at"] - feature_dict["start_at"]
+    ).total_seconds()
+
+    process_tags(feature_dict)
+
+    feature_path = basepath / feature_dict["folder_name"]
+
+    if feature_dict["status"] not in ["skipped", "untested"]:
+        # copy each feature directories contents over to the report directory
+        src_feature_filepath = (
+            Path(feature_dict["results_dir"]) / feature_dict["folder_name"]
+        )
+
+        if src_feature_filepath.resolve() == feature_path.resolve():
+            logger.debug(f"Generating the report in place: {feature_path}")
+        elif src_feature_filepath.exists():
+            place_tree(src_feature_filepath, feature_path, link_mode)
+        else:
+            logger.warning(
+                f"Feature directory not found, skipping copy: {src_feature_filepath}"
+            )
+
+    db_scenarios = db_feature.scenarios.select().order_by(db.scenario.seq)
+
+    if len(db_scenarios) == 0:
+        logger.debug(f"Feature {db_feature.name} has no scenarios")
+        return feature_dict
+
+    for scenario_dict in sorted(
+        feature_dict["scenarios"], key=lambda x: x["seq"]
+    ):
+        CONFIG.restore()
+
+        scenario_dict["folder_name"] = get_scenario_folder_name(
+            scenario_dict["name"], scenario_dict["attempt"]
+        )
+        scenario_filepath = feature_path / scenario_dict["folder_name"]
+        scenario_configpath = scenario_filepath / "logs/cucu.config.yaml.txt"
+        scenario_dict["total_steps"] = len(scenario_dict["steps"])
+        if scenario_dict["start_at"]:
+            offset_seconds = (
+                scenario_dict["start_at"] - feature_dict["start_at"]
+            ).total_seconds()
+            scenario_dict["time_offset"] = datetime.fromtimestamp(
+                offset_seconds, timezone.utc
+            )
+
+        if not scenario_configpath.exists():
+            logger.info(f"No config to reload: {scenario_configpath}")
+        else:
+            try:
+                CONFIG.load(scenario_configpath)
+            except Exception as e:
+                logger.warning(
+                    f"Could not reload config: {scenario_configpath}: {e}"
+                )
+
+        process_tags(scenario_dict)
+
+        sub_headers = []
+        for handler in CONFIG["__CUCU_HTML_REPORT_SCENARIO_SUBHEADER_HANDLER"]:
+            try:
+                sub_header = handler(scenario_dict, feature_dict)
+                if sub_header:
+                    sub_headers.append(sub_header)
+            except Exception:
+                logger.warning(
+                    f'Exception while trying to run sub_headers hook for scenario: "{scenario_dict["name"]}"\n{traceback.format_exc()}'
+                )
+        scenario_dict["sub_headers"] = "<br/>".join(sub_headers)
+        scenario_dict["steps"] = sorted(
+            scenario_dict["steps"], key=lambda x: x["seq"]
+        )
+
+        for step_dict in scenario_dict["steps"]:
+            # the large payloads are stored compressed in the blob
+            # table
+            for field in db.STEP_PAYLOAD_FIELDS:
+                step_dict[field] = db.load_payload(step_dict[field])
+
+            # Handle section headings with different levels (# to ####)
+            if step_dict["name"].startswith("#"):
+                # Map the count to the appropriate HTML heading (h2-h5)
+                # We use h2-h5 instead of h1-h4 so h1 can be reserved for scenario/feature titles
+                step_dict["heading_level"] = (
+                    f"h{step_dict['name'][:4].count('#') + 1}"
+                )
+
+            # process timestamps and time offsets
+            if not step_dict["end_at"]:
+                continue
+
+            if not step_dict["start_at"] or not scenario_dict["start_at"]:
+                step_dict["timestamp"] = ""
+                step_dict["time_offset"] = ""
+                continue
+
+            timestamp = step_dict["start_at"]
+            step_dict["timestamp"] = timestamp
+
+            # Clamp to >= 0: the first step can start a hair before scenario.start_at
+            # due to timing, but a negative epoch in datetime.fromtimestamp wraps to
+            # 23:59:59.999 which would push the step bar off the timeline.
+            offset_seconds = max(
+                0.0,
+                (timestamp - scenario_dict["start_at"]).total_seconds(),
+            )
+            time_offset = datetime.fromtimestamp(offset_seconds, timezone.utc)
+            step_dict["time_offset"] = time_offset
+
+        logs_path = scenario_filepath / "logs"
+
+        # copy run level console log
+        cucu_log_path = scenario_console_log_path(
+            Path(db_feature.behave_filepath),
+            scenario_dict["line_number"],
+            scenario_dict["attempt"],
+            results,
+        )
+        if cucu_log_path.exists():
+            dest_log_path = logs_path / cucu_log_path.name.lower()
+            dest_log_path.parent.mkdir(parents=True, exist_ok=True)
+            place_file(cucu_log_path, dest_log_path, link_mode)
+
+        log_files = []
+        for log_file in logs_path.glob("*.*"):
+            # the HTML versions of the console logs of a report previously
+            # generated in place
+            if ".console." in log_file.name and log_file.suffix == ".html":
+                continue
+
+            log_filepath = log_file.relative_to(scenario_filepath)
+
+            if scenario_dict["start_at"] and ".console." in log_filepath.name:
+                log_filepath = Path(f"logs/{log_filepath.name}.html")
+
+            log_files.append(
+                {
+                    "filepath": log_filepath,
+                    "name": log_file.name,
+                }
+            )
+
+        # generate html version of console log
+        for log_file in [x for x in log_files if ".console." in x["name"]]:
+            input_file = scenario_filepath / "logs" / log_file["name"]
+            output_file = scenario_filepath / log_file["filepath"]
+            output_file.write_text(
+                parse_log_to_html(input_file.read_text(encoding="utf-8")),
+                encoding="utf-8",
+            )
+
+        scenario_dict["logs"] = log_files
+
+        # render scenario html
+        scenario_basepath = feature_path / scenario_dict["folder_name"]
+        scenario_basepath.mkdir(parents=True, exist_ok=True)
+        rendered_scenario_html = scenario_template.render(
+            basepath=results,
+            feature=feature_dict,
+            path_exists=lambda path: Path(path).exists(),
+            scenario=scenario_dict,
+            steps=scenario_dict["steps"],
+            title=scenario_dict["name"],
+            dir_depth="../../",
+        )
+        scenario_output_filepath = scenario_basepath / "index.html"
+        scenario_output_filepath.write_text(rendered_scenario_html)
+
+        # render replay-style scenario view
+        rendered_replay_html = scenario_replay_template.render(
+            basepath=results,
+            feature=feature_dict,
+            path_exists=lambda path: Path(path).exists(),
+            scenario=scenario_dict,
+            steps=scenario_dict["steps"],
+            title=scenario_dict["name"],
+            dir_depth="../../",
+        )
+        scenario_replay_filepath = scenario_basepath / "replay.html"
+        scenario_replay_filepath.write_text(rendered_replay_html)
+
+    # render feature html
+    rendered_feature_html = feature_template.render(
+        feature=feature_dict,
+        scenarios=feature_dict["scenarios"],
+        dir_depth="",
+        title=feature_dict["name"],
+    )
+    feature_output_filepath = basepath / f"{feature_dict['name']}.html"
+    feature_output_filepath.write_text(rendered_feature_html)
+
+    feature_dict["total_steps"] = sum(
+        [x["total_steps"] for x in feature_dict["scenarios"]]
+    )
+    feature_dict["duration"] = left_pad_zeroes(
+        sum(
+            [
+                float(x["duration"])
+                for x in feature_dict["scenarios"]
+                if x["duration"]
+            ]
+        )
+    )
+
+    # only the index and flat pages are left to render
+    feature_dict.pop("worker", None)
+    for scenario_dict in feature_dict["scenarios"]:
+        for key in ["steps", "cucu_config", "browser_info"]:
+            scenario_dict.pop(key, None)
+
+    return feature_dict
+
+
+def generate_features(
+    results: Path, basepath: Path, feature_run_ids, jobs, link_mode="copy"
+):
+    """
+    generate the pages of the features provided, spread over `jobs` worker
+    processes when there's more than one
+    """
+    db_path = results / "run.db"
+    jobs = min(jobs, len(feature_run_ids))
+
+    # the workers rely on inheriting the config, and the report hooks
+    # registered by the custom steps, from this process
+    if jobs > 1 and sys.platform == "darwin":
+        logger.info("generating the report in a single process on MAC OS")
+        jobs = 1
+
+    if jobs <= 1:
+        db.init_html_report_db(db_path)
+        try:
+            return [
+                generate_feature(results, basepath, feature_run_id, link_mode)
+                for feature_run_id in feature_run_ids
+            ]
+        finally:
+            db.close_html_report_db()
+
+    logger.info(f"generating the report with {jobs} processes")
+    # the forked workers open their own connection to the run.db
+    db.close_html_report_db()
+    with WorkerPool(n_jobs=jobs, start_method="fork") as pool:
+        return pool.map(
+            generate_feature,
+            [
+                (results, basepath, feature_run_id, link_mode)
+                for feature_run_id in feature_run_ids
+            ],
+            chunk_size=1,
+            worker_init=functools.partial(db.init_html_report_db, db_path),
+            worker_exit=db.close_html_report_db,
+        )
+
+
+def generate(
+    results: Path,
+    basepath: Path,
+    jobs: int = 1,
+    incremental: bool = False,
+    link_mode: str = "copy",
+):
+    """
+    generate the HTML report of the run.db in the results directory provided
+    """
+    templates = load_templates()
+
+    manifest = {}
+    if incremental:
+        manifest = load_manifest(basepath)
+
+        # without a manifest the pages already in the report can't be told
+        # apart from stale ones, so the report is generated from scratch
+        if not manifest and basepath.resolve() != results.resolve():
+            shutil.rmtree(basepath, ignore_errors=True)
+            basepath.mkdir(parents=True, exist_ok=True)
+
     ## prepare report directory
     cucu_dir = Path(sys.modules["cucu"].__file__).parent
     external_dir = cucu_dir / "reporter/external"
-    shutil.copytree(external_dir, basepath / "external")
-    shutil.copyfile(
+    place_tree(external_dir, basepath / "external", link_mode)
+    place_file(
         cucu_dir / "reporter/favicon.png",
         basepath / "favicon.png",
+        link_mode,
     )
 
     CONFIG.snapshot()
 
     db_path = results / "run.db"
+    db.init_html_report_db(db_path)
     try:
-        db.init_html_report_db(db_path)
-
         feature_count = db.feature.select().count()
         scenario_count = db.scenario.select().count()
         step_count = db.step.select().count()
@@ -140,258 +552,109 @@ def generate(results: Path, basepath: Path):
             f"Starting to process {feature_count} features, {scenario_count} scenarios, and {step_count} steps for report"
         )
 
-        db_features = db.feature.select().order_by(db.feature.start_at)
-
-        features = []
-        for db_feature in db_features:
+        feature_run_ids = []
+        folder_names = {}
+        for db_feature in db.feature.select().order_by(db.feature.start_at):
             if db_feature.status == "untested":
                 logger.debug(f"Skipping untested feature: {db_feature.name}")
                 continue
 
-            feature_dict = shortcuts.model_to_dict(db_feature, backrefs=True)
-            features.append(feature_dict)
-
-            feature_results_dir = results
-            if db_path := db_feature.worker.cucu_run.db_path:
-                logger.debug(
-                    f"Combining cucu_runs, using db_path from worker: {db_path}"
-                )
-                feature_results_dir = Path(db_path).parent
-
-            feature_dict["results_dir"] = feature_results_dir
-            feature_dict["folder_name"] = ellipsize_filename(db_feature.name)
-            feature_dict["duration"] = (
-                feature_dict["start_at"] - feature_dict["start_at"]
-            ).total_seconds()
-
-            process_tags(feature_dict)
-
-            feature_path = basepath / feature_dict["folder_name"]
-
-            if feature_dict["status"] not in ["skipped", "untested"]:
-                # copy each feature directories contents over to the report directory
-                src_feature_filepath = (
-                    Path(feature_dict["results_dir"])
-                    / feature_dict["folder_name"]
-                )
-
-                if src_feature_filepath.exists():
-                    shutil.copytree(
-                        src_feature_filepath,
-                        feature_path,
-                        dirs_exist_ok=True,
-                    )
-                else:
-                    logger.warning(
-                        f"Feature directory not found, skipping copy: {src_feature_filepath}"
-                    )
-
-            db_scenarios = db_feature.scenarios.select().order_by(
-                db.scenario.seq
+            feature_run_ids.append(db_feature.feature_run_id)
+            folder_names[db_feature.feature_run_id] = ellipsize_filename(
+                db_feature.name
             )
 
-            if len(db_scenarios) == 0:
-                logger.debug(f"Feature {db_feature.name} has no scenarios")
-                continue
+        hashes = {}
+        if incremental:
+            hashes = {
+                feature_run_id: hash_feature_inputs(results, feature_run_id)
+                for feature_run_id in feature_run_ids
+            }
+    finally:
+        db.close_html_report_db()
 
-            for scenario_dict in sorted(
-                feature_dict["scenarios"], key=lambda x: x["seq"]
-            ):
-                CONFIG.restore()
+    # the features sharing a folder, such as the same feature in the runs
+    # combined with --combine, are generated again together
+    changed_folder_names = {
+        folder_names[feature_run_id]
+        for feature_run_id in feature_run_ids
+        if feature_run_id not in manifest
+        or manifest[feature_run_id]["hash"] != hashes[feature_run_id]
+    }
+    removed_features = [
+        entry["feature"]
+        for feature_run_id, entry in manifest.items()
+        if feature_run_id not in hashes
+    ]
+    changed_folder_names.update(x["folder_name"] for x in removed_features)
+    changed_feature_run_ids = [
+        feature_run_id
+        for feature_run_id in feature_run_ids
+        if folder_names[feature_run_id] in changed_folder_names
+    ]
+
+    if incremental:
+        logger.info(
+            f"{len(feature_run_ids) - len(changed_feature_run_ids)} features "
+            "unchanged since the last report"
+        )
 
-                scenario_dict["folder_name"] = ellipsize_filename(
-                    scenario_dict["name"]
-                )
-                scenario_filepath = feature_path / scenario_dict["folder_name"]
-                scenario_configpath = (
-                    scenario_filepath / "logs/cucu.config.yaml.txt"
-                )
-                scenario_dict["total_steps"] = len(scenario_dict["steps"])
-                if scenario_dict["start_at"]:
-                    offset_seconds = (
-                        scenario_dict["start_at"] - feature_dict["start_at"]
-                    ).total_seconds()
-                    scenario_dict["time_offset"] = datetime.fromtimestamp(
-                        offset_seconds, timezone.utc
-                    )
-
-                if not scenario_configpath.exists():
-                    logger.info(f"No config to reload: {scenario_configpath}")
-                else:
-                    try:
-                        CONFIG.load(scenario_configpath)
-                    except Exception as e:
-                        logger.warning(
-                            f"Could not reload config: {scenario_configpath}: {e}"
-                        )
-
-                process_tags(scenario_dict)
-
-                sub_headers = []
-                for handler in CONFIG[
-                    "__CUCU_HTML_REPORT_SCENARIO_SUBHEADER_HANDLER"
-                ]:
-                    try:
-                        sub_header = handler(scenario_dict, feature_dict)
-                        if sub_header:
-                            sub_headers.append(sub_header)
-                    except Exception:
-                        logger.warning(
-                            f'Exception while trying to run sub_headers hook for scenario: "{scenario_dict["name"]}"\n{traceback.format_exc()}'
-                        )
-                scenario_dict["sub_headers"] = "<br/>".join(sub_headers)
-                scenario_dict["steps"] = sorted(
-                    scenario_dict["steps"], key=lambda x: x["seq"]
-                )
+        # the pages of the features generated again are generated from
+        # scratch, and the pages of the features removed are removed
+        for folder_name in changed_folder_names:
+            shutil.rmtree(basepath / folder_name, ignore_errors=True)
 
-                for step_dict in scenario_dict["steps"]:
-                    # Handle section headings with different levels (# to ####)
-                    if step_dict["name"].startswith("#"):
-                        # Map the count to the appropriate HTML heading (h2-h5)
-                        # We use h2-h5 instead of h1-h4 so h1 can be reserved for scenario/feature titles
-                        step_dict["heading_level"] = (
-                            f"h{step_dict['name'][:4].count('#') + 1}"
-                        )
-
-                    # process timestamps and time offsets
-                    if not step_dict["end_at"]:
-                        continue
-
-                    if (
-                        not step_dict["start_at"]
-                        or not scenario_dict["start_at"]
-                    ):
-                        step_dict["timestamp"] = ""
-                        step_dict["time_offset"] = ""
-                        continue
-
-                    timestamp = step_dict["start_at"]
-                    step_dict["timestamp"] = timestamp
-
-                    # Clamp to >= 0: the first step can start a hair before scenario.start_at
-                    # due to timing, but a negative epoch in datetime.fromtimestamp wraps to
-                    # 23:59:59.999 which would push the step bar off the timeline.
-                    offset_seconds = max(
-                        0.0,
-                        (
-                            timestamp - scenario_dict["start_at"]
-                        ).total_seconds(),
-                    )
-                    time_offset = datetime.fromtimestamp(
-                        offset_seconds, timezone.utc
-                    )
-                    step_dict["time_offset"] = time_offset
-
-                logs_path = scenario_filepath / "logs"
-
-                # copy run level console log
-                cucu_log_path = behave_filepath_to_cucu_logpath(
-                    Path(db_feature.behave_filepath), results
-                )
-                if cucu_log_path.exists():
-                    dest_log_path = logs_path / cucu_log_path.name.lower()
-                    dest_log_path.parent.mkdir(parents=True, exist_ok=True)
-                    shutil.copyfile(cucu_log_path, dest_log_path)
-
-                log_files = []
-                for log_file in logs_path.glob("*.*"):
-                    log_filepath = log_file.relative_to(scenario_filepath)
-
-                    if (
-                        scenario_dict["start_at"]
-                        and ".console." in log_filepath.name
-                    ):
-                        log_filepath = Path(f"logs/{log_filepath.name}.html")
-
-                    log_files.append(
-                        {
-                            "filepath": log_filepath,
-                            "name": log_file.name,
-                        }
-                    )
-
-                # generate html version of console log
-                for log_file in [
-                    x for x in log_files if ".console." in x["name"]
-                ]:
-                    input_file = scenario_filepath / "logs" / log_file["name"]
-                    output_file = scenario_filepath / log_file["filepath"]
-                    output_file.write_text(
-                        parse_log_to_html(
-                            input_file.read_text(encoding="utf-8")
-                        ),
-                        encoding="utf-8",
-                    )
-
-                scenario_dict["logs"] = log_files
-
-                # render scenario html
-                scenario_basepath = feature_path / scenario_dict["folder_name"]
-                scenario_basepath.mkdir(parents=True, exist_ok=True)
-                rendered_scenario_html = scenario_template.render(
-                    basepath=results,
-                    feature=feature_dict,
-                    path_exists=lambda path: Path(path).exists(),
-                    scenario=scenario_dict,
-                    steps=scenario_dict["steps"],
-                    title=scenario_dict["name"],
-                    dir_depth="../../",
-                )
-                scenario_output_filepath = scenario_basepath / "index.html"
-                scenario_output_filepath.write_text(rendered_scenario_html)
-
-                # render replay-style scenario view
-                rendered_replay_html = scenario_replay_template.render(
-                    basepath=results,
-                    feature=feature_dict,
-                    path_exists=lambda path: Path(path).exists(),
-                    scenario=scenario_dict,
-                    steps=scenario_dict["steps"],
-                    title=scenario_dict["name"],
-                    dir_depth="../../",
-                )
-                scenario_replay_filepath = scenario_basepath / "replay.html"
-                scenario_replay_filepath.write_text(rendered_replay_html)
-
-            # render feature html
-            rendered_feature_html = feature_template.render(
-                feature=feature_dict,
-                scenarios=feature_dict["scenarios"],
-                dir_depth="",
-                title=feature_dict["name"],
-            )
-            feature_output_filepath = basepath / f"{feature_dict['name']}.html"
-            feature_output_filepath.write_text(rendered_feature_html)
+        for feature_dict in removed_features:
+            (basepath / f"{feature_dict['name']}.html").unlink(missing_ok=True)
 
-            feature_dict["total_steps"] = sum(
-                [x["total_steps"] for x in feature_dict["scenarios"]]
-            )
-            feature_dict["duration"] = left_pad_zeroes(
-                sum(
-                    [
-                        float(x["duration"])
-                        for x in feature_dict["scenarios"]
-                        if x["duration"]
-                    ]
-                )
-            )
+    generated = dict(
+        zip(
+            changed_feature_run_ids,
+            generate_features(
+                results, basepath, changed_feature_run_ids, jobs, link_mode
+            ),
+        )
+    )
+    features = [
+        generated.get(feature_run_id) or manifest[feature_run_id]["feature"]
+        for feature_run_id in feature_run_ids
+    ]
+
+    if incremental:
+        write_manifest(
+            basepath,
+            {
+                feature_run_id: {"hash": hashes[feature_run_id], "feature": x}
+                for feature_run_id, x in zip(feature_run_ids, features)
+            },
+        )
 
-        # query the database for stats
-        feature_stats_db = db.db.execute_sql("SELECT * FROM flat_feature")
+    db.init_html_report_db(db_path)
+    try:
+        # query the database for the stats materialized by the consolidation
+        feature_stats_db = db.db.execute_sql(
+            "SELECT * FROM feature_stats ORDER BY start_at ASC"
+        )
         keys = tuple([x[0] for x in feature_stats_db.description])
         feature_stats = [
             dict(zip(keys, x)) for x in feature_stats_db.fetchall()
         ]
 
-        grand_totals_db = db.db.execute_sql("SELECT * FROM flat_all")
+        grand_totals_db = db.db.execute_sql("SELECT * FROM run_stats")
         keys = tuple([x[0] for x in grand_totals_db.description])
         grand_totals = dict(zip(keys, grand_totals_db.fetchone()))
 
         ## Generate index.html and flat.html
 
+        index_data = index_rows(feature_stats)
+        write_data_chunks(basepath, "index", index_data)
+        flat_data = flat_rows(features)
+        write_data_chunks(basepath, "flat", flat_data)
+
         index_template = templates.get_template("index.html")
         rendered_index_html = index_template.render(
-            feature_stats=feature_stats,
+            data_rows=len(index_data),
+            data_chunk_size=DATA_CHUNK_SIZE,
             grand_totals=grand_totals,
             title="Cucu HTML Test Report",
             basepath=basepath,
@@ -402,7 +665,8 @@ def generate(results: Path, basepath: Path):
 
         flat_template = templates.get_template("flat.html")
         rendered_flat_html = flat_template.render(
-            features=features,
+            data_rows=len(flat_data),
+            data_chunk_size=DATA_CHUNK_SIZE,
             grand_totals=grand_totals,
             title="Flat HTML Test Report",
             basepath=basepath,
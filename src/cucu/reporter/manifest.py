@@ -0,0 +1,141 @@
+"""
+manifest of the pages of an HTML report for `cucu report --incremental`: it
+records a hash of the inputs of the pages of every feature, its rows in the
+run.db, the files of its results directory and the console logs of its
+scenarios, along with the version of the report templates, so only the
+features whose inputs changed are rendered again.
+"""
+
+import functools
+import hashlib
+import json
+import sys
+from importlib.metadata import version
+from pathlib import Path
+
+import cucu.db as db
+from cucu import logger
+from cucu.utils import ellipsize_filename, scenario_console_log_path
+
+MANIFEST_FILENAME = ".manifest.json"
+MANIFEST_VERSION = 1
+
+
+@functools.cache
+def report_version():
+    """
+    hash of the cucu version and of the report templates and code, a report
+    generated by another version is generated again from scratch
+    """
+    reporter_dir = Path(sys.modules["cucu"].__file__).parent / "reporter"
+    digest = hashlib.sha256(version("cucu").encode("utf8"))
+
+    filepaths = [reporter_dir / "html.py", reporter_dir / "manifest.py"]
+    filepaths += sorted((reporter_dir / "templates").rglob("*"))
+    for filepath in filepaths:
+        if filepath.is_file():
+            digest.update(filepath.name.encode("utf8"))
+            digest.update(filepath.read_bytes())
+
+    return digest.hexdigest()
+
+
+def hash_feature_inputs(results: Path, feature_run_id):
+    """
+    hash the inputs of the pages of the feature provided, the peewee database
+    must be bound to the run.db
+    """
+    digest = hashlib.sha256()
+
+    def update(*values):
+        for value in values:
+            digest.update(json.dumps(value, default=str).encode("utf8"))
+
+    def update_rows(sql):
+        cursor = db.db.execute_sql(sql, [feature_run_id])
+        for row in cursor:
+            update(row)
+
+    update_rows("SELECT * FROM feature WHERE feature_run_id = ?")
+    update_rows(
+        "SELECT * FROM scenario WHERE feature_run_id = ? "
+        "ORDER BY scenario_run_id"
+    )
+    update_rows(
+        "SELECT st.* FROM step st "
+        "JOIN scenario s ON st.scenario_run_id = s.scenario_run_id "
+        "WHERE s.feature_run_id = ? ORDER BY st.step_run_id"
+    )
+
+    db_feature = db.feature.get_by_id(feature_run_id)
+    feature_results_dir = results
+    if db_path := db_feature.worker.cucu_run.db_path:
+        feature_results_dir = Path(db_path).parent
+
+    update(str(feature_results_dir))
+
+    def update_file(filepath, relative_to):
+        stat = filepath.stat()
+        update(str(filepath.relative_to(relative_to)), stat.st_size)
+        update(stat.st_mtime_ns)
+
+    # the screenshots and logs copied into the report
+    feature_dirpath = feature_results_dir / ellipsize_filename(db_feature.name)
+    if feature_dirpath.is_dir():
+        for filepath in sorted(feature_dirpath.rglob("*")):
+            if filepath.is_file():
+                update_file(filepath, feature_results_dir)
+
+    # the console logs converted to HTML
+    behave_filepath = Path(db_feature.behave_filepath)
+    for db_scenario in db_feature.scenarios.order_by(
+        db.scenario.scenario_run_id
+    ):
+        log_path = scenario_console_log_path(
+            behave_filepath,
+            db_scenario.line_number,
+            db_scenario.attempt,
+            results,
+        )
+        if log_path.exists():
+            update_file(log_path, results)
+
+    return digest.hexdigest()
+
+
+def load_manifest(basepath: Path):
+    """
+    load the manifest of the report at the path provided
+    """
+    manifest_path = basepath / MANIFEST_FILENAME
+    if not manifest_path.exists():
+        logger.info("no report manifest found, generating every feature")
+        return {}
+
+    manifest = json.loads(manifest_path.read_text(encoding="utf8"))
+    if (
+        manifest.get("version") != MANIFEST_VERSION
+        or manifest.get("report_version") != report_version()
+    ):
+        logger.info("report manifest is outdated, generating every feature")
+        return {}
+
+    return manifest["features"]
+
+
+def write_manifest(basepath: Path, features):
+    """
+    write the manifest of the report at the path provided
+    """
+    manifest_path = basepath / MANIFEST_FILENAME
+    manifest_path.write_text(
+        json.dumps(
+            {
+                "version": MANIFEST_VERSION,
+                "report_version": report_version(),
+                "features": features,
+            },
+            default=str,
+        ),
+        encoding="utf8",
+    )
@@ -5,6 +5,7 @@ import re
 from selenium.webdriver.common.keys import Keys
 
 from cucu import config, logger, retry, run_steps, step
+from cucu.browser import pool as browser_pool
 from cucu.browser.selenium import Selenium
 
 
@@ -13,6 +14,15 @@ def open_browser(ctx):
     headless = config.CONFIG["CUCU_BROWSER_HEADLESS"]
     selenium_remote_url = config.CONFIG["CUCU_SELENIUM_REMOTE_URL"]
 
+    if config.CONFIG.true("CUCU_BROWSER_POOL") or config.CONFIG.true(
+        "CUCU_BROWSER_PREFETCH"
+    ):
+        return browser_pool.acquire(
+            browser_name,
+            headless=headless,
+            selenium_remote_url=selenium_remote_url,
+        )
+
     browser = Selenium()
     logger.debug(f"opening browser {browser_name}")
     browser.open(
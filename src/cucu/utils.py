@@ -202,6 +202,25 @@ def ellipsize_filename(raw_filename):
     return ellipsized_filename
 
 
+def get_attempt():
+    """
+    the attempt number of the scenarios run by the current process, greater
+    than 1 when retrying failed scenarios with `cucu run --retry-failed`
+    """
+    return int(CONFIG["CUCU_ATTEMPT"] or 1)
+
+
+def get_scenario_folder_name(scenario_name, attempt):
+    """
+    the name of the results folder of a scenario, every retry attempt gets
+    its own folder so the results of the previous attempts are kept
+    """
+    if attempt is not None and attempt > 1:
+        scenario_name = f"{scenario_name} (attempt {attempt})"
+
+    return ellipsize_filename(scenario_name)
+
+
 def normalize_filename(raw_filename):
     normalized_filename = (
         raw_filename.replace('"', "")
@@ -407,18 +426,70 @@ def get_feature_name(filename):
             return feature_name
 
 
+def get_filepath_line_number(filename) -> int | None:
+    """
+    return the line number of a `path/to/file.feature:LINE` filepath or None
+    when the filepath doesn't point at a specific line
+    """
+    filepath = Path(filename)
+    if ":" not in filepath.name:
+        return None
+
+    return int(filepath.name.split(":")[1])
+
+
+def get_feature_task_name(filename):
+    """
+    name used for the files produced by a worker running the feature file
+    provided, which includes the line number when the worker only runs the
+    scenario at that line so scenarios of the same feature don't clobber each
+    other's files
+    """
+    feature_name = get_feature_name(filename)
+    if line_number := get_filepath_line_number(filename):
+        return f"{feature_name}-{line_number}"
+
+    return feature_name
+
+
 def behave_filepath_to_cucu_logpath(filepath: Path, results: Path) -> Path:
+    feature_filepath = filepath
     if ":" in filepath.name:
-        filepath = filepath.parent / filepath.name.split(":")[0]
+        feature_filepath = filepath.parent / filepath.name.split(":")[0]
 
-    if filepath.is_dir():
+    if feature_filepath.is_dir():
         log_filepath = results / "run.console.log"
     else:
-        log_filepath = results / f"{get_feature_name(filepath)}.console.log"
+        log_filepath = (
+            results / f"{get_feature_task_name(filepath)}.console.log"
+        )
 
     return log_filepath
 
 
+def scenario_console_log_path(
+    behave_filepath: Path, line_number, attempt, results: Path
+):
+    """
+    the console log of the run of the scenario provided in the results
+    directory
+    """
+    cucu_log_path = behave_filepath_to_cucu_logpath(behave_filepath, results)
+    if get_filepath_line_number(behave_filepath) or (attempt or 1) > 1:
+        # features split into one task per scenario, and the scenarios
+        # retried by --retry-failed, have a console log per scenario
+        scenario_log_path = behave_filepath_to_cucu_logpath(
+            behave_filepath.with_name(
+                f"{behave_filepath.name.split(':')[0]}:{line_number}"
+            ),
+            results,
+        )
+        if scenario_log_path.exists():
+            cucu_log_path = scenario_log_path
+
+    return cucu_log_path
+
+
 def build_debug_output(raw: str) -> list[str]:
     ANSI_CURSOR_RE = re.compile(r"\x1b\[[0-9;]*[ABCD]")
     MULTI_NL_RE = re.compile(r"\n{3,}")
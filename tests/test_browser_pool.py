@@ -0,0 +1,257 @@
+"""
+Tests for the browser session pool enabled with CUCU_BROWSER_POOL=true.
+"""
+
+import threading
+from unittest import mock
+
+import pytest
+import pytest_check as check
+from selenium.common.exceptions import WebDriverException
+
+from cucu.browser import pool
+from cucu.config import CONFIG
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, window_handle):
+        self.driver.current = window_handle
+
+    def new_window(self, type_hint):
+        self.driver.tabs.append("blank")
+        self.driver.current = "blank"
+
+
+class FakeDriver:
+    def __init__(self, name="chrome", healthy=True):
+        self.name = name
+        self.healthy = healthy
+        self.tabs = ["tab1", "tab2"]
+        self.current = "tab1"
+        self.switch_to = FakeSwitchTo(self)
+        self.commands = []
+        # the urls of the navigation history and the frames of each tab
+        self.history = {
+            "tab1": ["about:blank", "http://localhost:8080/login"],
+            "tab2": ["https://auth.example.com/sso?next=1"],
+        }
+        self.frames = {"tab1": ["http://localhost:8080/", "data:,"]}
+
+    @property
+    def window_handles(self):
+        return list(self.tabs)
+
+    @property
+    def current_window_handle(self):
+        return self.current
+
+    def close(self):
+        self.tabs.remove(self.current)
+
+    def execute_script(self, script):
+        if not self.healthy:
+            raise WebDriverException("session is gone")
+
+    def execute(self, command, params):
+        self.commands.append((params["cmd"], params["params"]))
+        if params["cmd"] == "Page.getNavigationHistory":
+            entries = self.history.get(self.current, [])
+            return {"value": {"entries": [{"url": x} for x in entries]}}
+
+        if params["cmd"] == "Page.getFrameTree":
+            urls = self.frames.get(self.current, ["about:blank"])
+            frame_tree = {
+                "frame": {"url": urls[0]},
+                "childFrames": [{"frame": {"url": x}} for x in urls[1:]],
+            }
+            return {"value": {"frameTree": frame_tree}}
+
+        return {"value": {}}
+
+    def set_window_size(self, width, height):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, driver, pool_key=("chrome", True, None, None)):
+        self.driver = driver
+        self.pool_key = pool_key
+        self.quit = mock.MagicMock()
+
+    def get_session_id(self):
+        return "session"
+
+
+@pytest.fixture
+def browser_pool(monkeypatch):
+    monkeypatch.setattr(pool, "IDLE_BROWSERS", [])
+    monkeypatch.setattr(pool, "PREFETCHED", None)
+    monkeypatch.setitem(CONFIG, "CUCU_BROWSER_POOL_SIZE", 1)
+    return pool
+
+
+def test_reset_replaces_tabs_and_clears_every_visited_origin(browser_pool):
+    driver = FakeDriver()
+
+    browser_pool.reset(FakeBrowser(driver))
+
+    check.equal(driver.window_handles, ["blank"])
+    check.equal(driver.current, "blank")
+    check.equal(
+        [
+            (cmd, params)
+            for cmd, params in driver.commands
+            if not cmd.startswith("Page.")
+        ],
+        [
+            ("Network.clearBrowserCookies", {}),
+            ("Network.clearBrowserCache", {}),
+            (
+                "Storage.clearDataForOrigin",
+                {"origin": "http://localhost:8080", "storageTypes": "all"},
+            ),
+            (
+                "Storage.clearDataForOrigin",
+                {"origin": "https://auth.example.com", "storageTypes": "all"},
+            ),
+        ],
+    )
+
+
+def test_release_quits_non_chromium_browsers(browser_pool):
+    browser = FakeBrowser(FakeDriver(name="firefox"))
+
+    browser_pool.release(browser)
+
+    check.equal(browser_pool.IDLE_BROWSERS, [])
+    browser.quit.assert_called_once()
+
+
+def test_release_keeps_browser_until_the_pool_is_full(browser_pool):
+    first = FakeBrowser(FakeDriver())
+    second = FakeBrowser(FakeDriver())
+
+    browser_pool.release(first)
+    browser_pool.release(second)
+
+    check.equal(browser_pool.IDLE_BROWSERS, [(first.pool_key, first)])
+    first.quit.assert_not_called()
+    second.quit.assert_called_once()
+
+
+def test_release_quits_browser_that_fails_to_reset(browser_pool):
+    browser = FakeBrowser(FakeDriver(healthy=False))
+
+    browser_pool.release(browser)
+
+    check.equal(browser_pool.IDLE_BROWSERS, [])
+    browser.quit.assert_called_once()
+
+
+def test_release_browsers_hands_the_scenario_browsers_to_the_pool(
+    browser_pool, monkeypatch
+):
+    monkeypatch.setitem(CONFIG, "CUCU_BROWSER_POOL", "true")
+    browser = FakeBrowser(FakeDriver())
+    ctx = mock.Mock(browsers=[browser])
+
+    browser_pool.release_browsers(ctx)
+
+    check.equal(browser_pool.IDLE_BROWSERS, [(browser.pool_key, browser)])
+    check.equal(ctx.browsers, [])
+    browser.quit.assert_not_called()
+
+
+def test_acquire_reuses_healthy_browser_opened_with_same_options(
+    browser_pool,
+):
+    browser = FakeBrowser(
+        FakeDriver(), pool_key=pool.session_key("chrome", True, None)
+    )
+    browser_pool.IDLE_BROWSERS.append((browser.pool_key, browser))
+
+    with mock.patch.object(pool, "Selenium") as selenium:
+        check.is_(browser_pool.acquire("chrome", headless=True), browser)
+        selenium.assert_not_called()
+
+        browser_pool.IDLE_BROWSERS.append((browser.pool_key, browser))
+        browser_pool.acquire("firefox", headless=True)
+        selenium.return_value.open.assert_called_once_with(
+            "firefox", headless=True, selenium_remote_url=None
+        )
+        check.equal(len(browser_pool.IDLE_BROWSERS), 1)
+
+
+def test_acquire_replaces_unhealthy_browser(browser_pool):
+    browser = FakeBrowser(
+        FakeDriver(healthy=False), pool_key=pool.session_key("chrome", 0, None)
+    )
+    browser_pool.IDLE_BROWSERS.append((browser.pool_key, browser))
+
+    with mock.patch.object(pool, "launch") as launch:
+        check.is_(browser_pool.acquire("chrome"), launch.return_value)
+
+    browser.quit.assert_called_once()
+    check.equal(browser_pool.IDLE_BROWSERS, [])
+
+
+def test_acquire_hands_over_prefetched_browser(browser_pool):
+    browser = FakeBrowser(FakeDriver())
+
+    with mock.patch.object(pool, "launch", return_value=browser) as launch:
+        browser_pool.prefetch("chrome", headless=True)
+        check.is_(browser_pool.acquire("chrome", headless=True), browser)
+        launch.assert_called_once_with("chrome", True, None)
+
+    check.is_none(browser_pool.PREFETCHED)
+
+
+def test_prefetched_browser_with_other_options_is_quit(
+    browser_pool,
+):
+    prefetched = FakeBrowser(FakeDriver())
+    launched = FakeBrowser(FakeDriver())
+
+    with mock.patch.object(pool, "launch", side_effect=[prefetched, launched]):
+        browser_pool.prefetch("chrome", headless=True)
+        check.is_(browser_pool.acquire("firefox", headless=True), launched)
+
+    prefetched.quit.assert_called_once()
+
+
+def test_hung_prefetch_falls_back_to_a_new_browser(browser_pool, monkeypatch):
+    monkeypatch.setitem(CONFIG, "CUCU_BROWSER_PREFETCH_TIMEOUT_S", 0.01)
+    prefetched = FakeBrowser(FakeDriver())
+    launched = FakeBrowser(FakeDriver())
+    launching = threading.Event()
+
+    def launch(browser_name, headless, selenium_remote_url):
+        if threading.current_thread().name == "browser-prefetch":
+            launching.wait(5)
+            return prefetched
+
+        return launched
+
+    with mock.patch.object(pool, "launch", side_effect=launch):
+        browser_pool.prefetch("chrome", headless=True)
+        thread = browser_pool.PREFETCHED[1]
+        check.is_(browser_pool.acquire("chrome", headless=True), launched)
+
+    # the prefetched browser is quit once it finally launches
+    launching.set()
+    thread.join(5)
+    prefetched.quit.assert_called_once()
+
+
+def test_quit_all_quits_unused_prefetched_browser(browser_pool):
+    browser = FakeBrowser(FakeDriver())
+
+    with mock.patch.object(pool, "launch", return_value=browser):
+        browser_pool.prefetch("chrome")
+        browser_pool.quit_all(None)
+
+    browser.quit.assert_called_once()
+    check.is_none(browser_pool.PREFETCHED)
@@ -0,0 +1,181 @@
+"""
+Tests for the selection of the selenium remote url of new browser sessions.
+"""
+
+from unittest import mock
+
+import pytest
+import pytest_check as check
+import urllib3
+
+from cucu.browser import remote
+from cucu.browser.selenium import Selenium
+
+URLS = ["http://hub1:4444", "http://hub2:4444", "http://hub3:4444"]
+
+
+@pytest.fixture
+def endpoints(monkeypatch):
+    monkeypatch.setattr(remote, "ENDPOINTS", {})
+    monkeypatch.setattr(remote, "PROBES", {})
+    return remote.ENDPOINTS
+
+
+def probes(results):
+    return lambda url, timeout: results[url]
+
+
+def test_parse_remote_urls():
+    check.equal(remote.parse_remote_urls(None), [])
+    check.equal(remote.parse_remote_urls(URLS[0]), [URLS[0]])
+    check.equal(remote.parse_remote_urls(f"{URLS[0]}, {URLS[1]},"), URLS[:2])
+    check.equal(remote.parse_remote_urls(URLS), URLS)
+
+
+def test_least_outstanding_prefers_fewest_sessions_then_latency(endpoints):
+    results = {
+        URLS[0]: (0.01, 3),
+        URLS[1]: (0.20, 1),
+        URLS[2]: (0.05, 1),
+    }
+
+    with mock.patch.object(remote, "probe", probes(results)):
+        check.equal(
+            remote.rank_remote_urls(URLS, "least-outstanding"),
+            [URLS[2], URLS[1], URLS[0]],
+        )
+
+
+def test_least_outstanding_counts_own_sessions_when_not_reported(endpoints):
+    results = {URLS[0]: (0.01, None), URLS[1]: (0.01, None)}
+    remote.record_session(URLS[0])
+
+    with mock.patch.object(remote, "probe", probes(results)):
+        check.equal(
+            remote.rank_remote_urls(URLS[:2], "least-outstanding"),
+            [URLS[1], URLS[0]],
+        )
+
+    remote.release_session(URLS[0])
+    check.equal(endpoints[URLS[0]]["sessions"], 1)
+    check.equal(endpoints[URLS[0]]["outstanding"], 0)
+
+
+def test_latency_weighs_outstanding_sessions_by_latency(endpoints):
+    results = {
+        URLS[0]: (0.10, 0),
+        URLS[1]: (0.01, 4),
+        URLS[2]: (0.50, 0),
+    }
+
+    with mock.patch.object(remote, "probe", probes(results)):
+        check.equal(
+            remote.rank_remote_urls(URLS, "latency"),
+            [URLS[1], URLS[0], URLS[2]],
+        )
+
+
+def test_unreachable_urls_are_tried_last(endpoints):
+    results = {URLS[0]: None, URLS[1]: (0.5, 2), URLS[2]: None}
+
+    with mock.patch.object(remote, "probe", probes(results)):
+        check.equal(remote.rank_remote_urls(URLS), [URLS[1], URLS[0], URLS[2]])
+
+
+def test_probes_are_reused_until_they_expire(endpoints, monkeypatch):
+    results = {URLS[0]: (0.01, 0), URLS[1]: None}
+    probe = mock.MagicMock(side_effect=probes(results))
+
+    with mock.patch.object(remote, "probe", probe):
+        check.equal(remote.rank_remote_urls(URLS[:2]), URLS[:2])
+
+        # the sessions opened since the probe count as running on the remote
+        results[URLS[1]] = (0.01, 0)
+        remote.record_session(URLS[0])
+        check.equal(remote.rank_remote_urls(URLS[:2]), URLS[:2])
+        check.equal(probe.call_count, 2)
+
+        # which the remote reports itself once probed again
+        results[URLS[0]] = (0.01, 1)
+        monkeypatch.setattr(remote, "PROBE_TTL_S", -1)
+        check.equal(remote.rank_remote_urls(URLS[:2]), [URLS[1], URLS[0]])
+        check.equal(probe.call_count, 4)
+
+    check.equal(
+        {call.args[1] for call in probe.mock_calls}, {remote.PROBE_TIMEOUT_S}
+    )
+
+
+def test_single_url_is_not_probed(endpoints):
+    with mock.patch.object(remote, "probe") as probe:
+        check.equal(remote.rank_remote_urls(URLS[:1]), URLS[:1])
+
+    probe.assert_not_called()
+
+
+def test_open_remote_fails_over_on_read_timeout(endpoints):
+    driver = mock.MagicMock()
+    timeout = urllib3.exceptions.ReadTimeoutError(None, URLS[0], "timed out")
+    browser = Selenium()
+
+    with (
+        mock.patch.object(remote, "rank_remote_urls", lambda urls: urls),
+        mock.patch(
+            "cucu.browser.selenium.webdriver.Remote",
+            side_effect=[timeout, driver],
+        ) as webdriver_remote,
+    ):
+        check.is_(browser.open_remote(",".join(URLS[:2]), None), driver)
+
+    check.equal(
+        [
+            call.kwargs["command_executor"]
+            for call in webdriver_remote.mock_calls
+        ],
+        URLS[:2],
+    )
+    check.equal(browser.selenium_remote_url, URLS[1])
+    check.equal(endpoints[URLS[0]]["failovers"], 1)
+    check.equal(endpoints[URLS[1]]["outstanding"], 1)
+
+    browser.driver = driver
+    browser.quit()
+    check.equal(endpoints[URLS[1]]["outstanding"], 0)
+
+
+def test_open_remote_fails_over_on_connection_error(endpoints):
+    driver = mock.MagicMock()
+    refused = urllib3.exceptions.MaxRetryError(
+        None,
+        URLS[0],
+        urllib3.exceptions.NewConnectionError(None, "connection refused"),
+    )
+
+    with (
+        mock.patch.object(remote, "rank_remote_urls", lambda urls: urls),
+        mock.patch(
+            "cucu.browser.selenium.webdriver.Remote",
+            side_effect=[refused, driver],
+        ),
+    ):
+        browser = Selenium()
+        check.is_(browser.open_remote(",".join(URLS[:2]), None), driver)
+
+    check.equal(browser.selenium_remote_url, URLS[1])
+    check.equal(endpoints[URLS[0]]["failovers"], 1)
+
+
+def test_open_remote_raises_when_every_url_times_out(endpoints):
+    timeout = urllib3.exceptions.ReadTimeoutError(None, URLS[0], "timed out")
+
+    with (
+        mock.patch.object(remote, "rank_remote_urls", lambda urls: urls),
+        mock.patch(
+            "cucu.browser.selenium.webdriver.Remote", side_effect=timeout
+        ),
+    ):
+        with pytest.raises(urllib3.exceptions.ReadTimeoutError):
+            Selenium().open_remote(",".join(URLS[:2]), None)
+
+    check.equal(endpoints[URLS[0]]["failovers"], 1)
+    check.equal(endpoints[URLS[1]]["failovers"], 1)
@@ -0,0 +1,77 @@
+"""
+Tests for the adaptive concurrency used by `cucu run --workers auto`.
+"""
+
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+import pytest_check as check
+
+from cucu.cli import concurrency
+from cucu.cli.concurrency import AdaptiveConcurrency, parse_workers
+
+
+@pytest.fixture
+def machine(monkeypatch):
+    state = SimpleNamespace(cpu_percent=10.0, available_memory_mb=8192.0)
+    monkeypatch.setattr(
+        concurrency.psutil,
+        "cpu_percent",
+        lambda interval=None: state.cpu_percent,
+    )
+    monkeypatch.setattr(
+        concurrency.psutil,
+        "virtual_memory",
+        lambda: SimpleNamespace(available=state.available_memory_mb * 1024**2),
+    )
+    monkeypatch.setattr(AdaptiveConcurrency, "sample_interval_s", 0)
+    return state
+
+
+def test_parse_workers():
+    check.equal(parse_workers(None), None)
+    check.equal(parse_workers("auto"), "auto")
+    check.equal(parse_workers("3"), 3)
+
+    for workers in ["0", "-1", "many"]:
+        with pytest.raises(ValueError):
+            parse_workers(workers)
+
+
+def test_grows_while_busy_with_headroom_up_to_max(machine):
+    controller = AdaptiveConcurrency(1, 3)
+
+    check.equal(
+        [controller.update(running=n) for n in [1, 2, 3, 3]], [2, 3, 3, 3]
+    )
+    check.equal(len(controller.timeline), 4)
+    check.equal(controller.timeline[0]["running"], 1)
+
+
+def test_does_not_grow_when_slots_are_idle(machine):
+    controller = AdaptiveConcurrency(1, 3)
+
+    check.equal(controller.update(running=0), 1)
+
+
+def test_shrinks_on_cpu_or_memory_pressure_down_to_min(machine):
+    controller = AdaptiveConcurrency(2, 4)
+    controller.concurrency = 4
+
+    machine.cpu_percent = 95.0
+    check.equal(controller.update(running=4), 3)
+
+    machine.cpu_percent = 10.0
+    machine.available_memory_mb = 512.0
+    check.equal(controller.update(running=4), 2)
+    check.equal(controller.update(running=4), 2)
+
+
+def test_samples_at_most_once_per_interval(machine):
+    controller = AdaptiveConcurrency(1, 3)
+
+    with mock.patch.object(AdaptiveConcurrency, "sample_interval_s", 60):
+        check.equal(controller.update(running=1), 1)
+
+    check.equal(controller.timeline, [])
@@ -2,6 +2,7 @@
 Tests for the cucu database module using Peewee ORM.
 """
 
+import sqlite3
 import tempfile
 from pathlib import Path
 
@@ -39,6 +40,7 @@ def temp_db():
 
         yield test_db
 
+        db.stop_writer()
         test_db.close()
         # Restore original database
         db.db = original_db
@@ -333,3 +335,508 @@ def test_data_consistency_and_null_handling(sample_records_combined):
     )
     check.is_none(retrieved_worker.end_at)
     check.is_none(retrieved_worker.custom_data)
+
+
+def test_retried_scenarios_are_merged_and_marked_flaky(temp_db):
+    db.cucu_run.create(
+        cucu_run_id="retry_run",
+        full_arguments=[],
+        filepath="features",
+        start_at="2024-01-01T10:00:00",
+    )
+    db.worker.create(
+        worker_run_id="retry_worker",
+        cucu_run_id="retry_run",
+        start_at="2024-01-01T10:00:00",
+    )
+    for feature_run_id, behave_filepath, start_at, status in [
+        ("first", "retry.feature", "2024-01-01T10:00:00", "failed"),
+        ("second", "retry.feature:3", "2024-01-01T10:01:00", "passed"),
+        ("third", "retry.feature:6", "2024-01-01T10:02:00", "failed"),
+    ]:
+        db.feature.create(
+            feature_run_id=feature_run_id,
+            worker_run_id="retry_worker",
+            name="Retry Feature",
+            filename="retry.feature",
+            description="",
+            tags=[],
+            status=status,
+            start_at=start_at,
+            behave_filepath=behave_filepath,
+        )
+
+    for scenario_run_id, feature_run_id, line, attempt, status in [
+        ("flaky_1", "first", 3, 1, "failed"),
+        ("broken_1", "first", 6, 1, "failed"),
+        ("fine_1", "first", 9, 1, "passed"),
+        ("flaky_2", "second", 3, 2, "passed"),
+        ("broken_2", "third", 6, 2, "failed"),
+    ]:
+        db.scenario.create(
+            scenario_run_id=scenario_run_id,
+            feature_run_id=feature_run_id,
+            name=scenario_run_id.split("_")[0],
+            line_number=line,
+            attempt=attempt,
+            status=status,
+            tags=[],
+        )
+
+    with sqlite3.connect(temp_db.database) as conn:
+        db.mark_retried_scenarios(conn)
+        db.merge_split_feature_records(conn)
+
+    scenarios = {
+        record.scenario_run_id: record for record in db.scenario.select()
+    }
+    check.equal(
+        sorted(key for key, record in scenarios.items() if record.retried),
+        ["broken_1", "flaky_1"],
+    )
+    check.equal(
+        sorted(key for key, record in scenarios.items() if record.flaky),
+        ["flaky_2"],
+    )
+    check.equal(
+        [record.feature_run_id for record in db.feature.select()], ["first"]
+    )
+    check.equal(db.feature.get_by_id("first").status, "failed")
+
+
+def test_split_feature_with_a_terminated_scenario_is_terminated(temp_db):
+    db.cucu_run.create(
+        cucu_run_id="split_run",
+        full_arguments=[],
+        filepath="features",
+        start_at="2024-01-01T10:00:00",
+    )
+    db.worker.create(
+        worker_run_id="split_worker",
+        cucu_run_id="split_run",
+        start_at="2024-01-01T10:00:00",
+    )
+    for feature_run_id, behave_filepath, status in [
+        ("first", "split.feature:3", "passed"),
+        ("second", "split.feature:6", "terminated"),
+    ]:
+        db.feature.create(
+            feature_run_id=feature_run_id,
+            worker_run_id="split_worker",
+            name="Split Feature",
+            filename="split.feature",
+            description="",
+            tags=[],
+            status=status,
+            start_at="2024-01-01T10:00:00",
+            behave_filepath=behave_filepath,
+        )
+
+    with sqlite3.connect(temp_db.database) as conn:
+        db.merge_split_feature_records(conn)
+
+    check.equal(
+        [record.feature_run_id for record in db.feature.select()], ["first"]
+    )
+    check.equal(db.feature.get_by_id("first").status, "terminated")
+
+
+def count_features(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM feature").fetchone()[0]
+
+
+def test_batched_writes_are_committed_on_flush_and_close(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "true")
+    monkeypatch.setattr(db.BatchedWriter, "flush_interval_s", 60.0)
+    db_path = tmp_path / "run.db"
+    db.create_database_file(db_path)
+
+    def insert_feature(feature_run_id):
+        db.execute(
+            db.feature.insert(
+                feature_run_id=feature_run_id,
+                worker_run_id="worker",
+                name="Feature",
+                filename="batched.feature",
+                description="",
+                tags=["@batched"],
+                start_at="2024-01-01T10:00:00",
+                behave_filepath="batched.feature",
+            ),
+            batched=True,
+        )
+
+    insert_feature("first")
+    check.is_not_none(db.WRITER)
+    check.equal(count_features(db_path), 0)
+
+    db.flush_writes()
+    check.equal(count_features(db_path), 1)
+
+    insert_feature("second")
+    db.execute(
+        db.feature.update(status="passed").where(
+            db.feature.feature_run_id == "second"
+        )
+    )
+    db.close_db()
+
+    check.is_none(db.WRITER)
+    with sqlite3.connect(db_path) as conn:
+        check.equal(
+            conn.execute(
+                "SELECT feature_run_id, status, tags FROM feature"
+            ).fetchall(),
+            [
+                ("first", None, '["@batched"]'),
+                ("second", "passed", '["@batched"]'),
+            ],
+        )
+
+
+def test_batched_writes_disabled_write_right_away(tmp_path, monkeypatch):
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+    db_path = tmp_path / "run.db"
+    db.create_database_file(db_path)
+
+    db.execute(
+        db.feature.insert(
+            feature_run_id="feature",
+            worker_run_id="worker",
+            name="Feature",
+            filename="unbatched.feature",
+            description="",
+            tags=[],
+            start_at="2024-01-01T10:00:00",
+            behave_filepath="unbatched.feature",
+        ),
+        batched=True,
+    )
+
+    check.is_none(db.WRITER)
+    check.equal(count_features(db_path), 1)
+    db.close_db()
+
+
+def test_shared_run_db_is_in_wal_mode_and_records_every_worker(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("CUCU_RUN_DB_SHARED", "true")
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+    monkeypatch.setitem(db.CONFIG, "CUCU_RUN_ID", "shared_run")
+    monkeypatch.setitem(db.CONFIG, "CUCU_FILEPATH", "features")
+    monkeypatch.setitem(db.CONFIG, "WORKER_PARENT_ID", "parent")
+    db_path = tmp_path / "run.db"
+
+    # the parent and then each worker, which may record itself again for
+    # every feature it runs
+    for worker_run_id in ["parent", "worker_1", "worker_2", "worker_1"]:
+        monkeypatch.setitem(db.CONFIG, "WORKER_RUN_ID", worker_run_id)
+        db.create_database_file(db_path)
+        db.record_cucu_run()
+        db.close_db()
+
+    with sqlite3.connect(db_path) as conn:
+        check.equal(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        check.equal(
+            conn.execute("SELECT cucu_run_id FROM cucu_run").fetchall(),
+            [("shared_run",)],
+        )
+        check.equal(
+            conn.execute(
+                "SELECT worker_run_id, parent_run_id FROM worker ORDER BY 1"
+            ).fetchall(),
+            [("parent", None), ("worker_1", "parent"), ("worker_2", "parent")],
+        )
+
+    # there's no worker database file left to merge into the run.db
+    db.consolidate_database_files(tmp_path)
+    with sqlite3.connect(db_path) as conn:
+        check.equal(
+            conn.execute("SELECT COUNT(*) FROM worker").fetchone()[0], 3
+        )
+
+
+def test_combine_leaves_the_combined_run_db_out(tmp_path):
+    db.create_database_file(tmp_path / "run.db")
+    db.close_db()
+    with sqlite3.connect(tmp_path / "run.db") as conn:
+        conn.execute("""
+            INSERT INTO cucu_run
+                (cucu_run_id, full_arguments, filepath, start_at, db_path)
+            VALUES
+                ('combined', '[]', 'features', '2024-01-01T10:00:00', 'a.db')
+        """)
+
+    db.consolidate_database_files(tmp_path, combine=True)
+
+    with sqlite3.connect(tmp_path / "run.db") as conn:
+        check.equal(
+            conn.execute("SELECT db_path FROM cucu_run").fetchall(),
+            [("a.db",)],
+        )
+
+
+def create_older_run_db(db_path):
+    """
+    create a run.db of a single passed scenario as written by a version of
+    cucu without the attempt, retried and flaky scenario columns
+    """
+    db.create_database_file(db_path)
+    db.cucu_run.create(
+        cucu_run_id="old_run",
+        full_arguments=[],
+        filepath="features",
+        start_at="2024-01-01T10:00:00",
+    )
+    db.worker.create(
+        worker_run_id="old_worker",
+        cucu_run_id="old_run",
+        start_at="2024-01-01T10:00:00",
+    )
+    db.feature.create(
+        feature_run_id="old_feature",
+        worker_run_id="old_worker",
+        name="Old Feature",
+        filename="old.feature",
+        description="",
+        tags=[],
+        start_at="2024-01-01T10:00:00",
+        behave_filepath="old.feature",
+    )
+    db.scenario.create(
+        scenario_run_id="old_scenario",
+        feature_run_id="old_feature",
+        name="Old Scenario",
+        line_number=3,
+        status="passed",
+        duration=1.5,
+        tags=[],
+    )
+    db.close_db()
+
+    with sqlite3.connect(db_path) as conn:
+        for view_name in db.VIEWS:
+            conn.execute(f"DROP VIEW {view_name}")
+
+        for column in ["attempt", "retried", "flaky"]:
+            conn.execute(f"ALTER TABLE scenario DROP COLUMN {column}")
+
+        conn.execute("""
+            CREATE VIEW flat_feature AS
+            SELECT f.start_at, f.name AS feature_name FROM feature f
+        """)
+
+
+def test_consolidate_migrates_run_db_of_older_versions(tmp_path, monkeypatch):
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+    create_older_run_db(tmp_path / "run.db")
+
+    db.consolidate_database_files(tmp_path)
+
+    with sqlite3.connect(tmp_path / "run.db") as conn:
+        check.equal(
+            conn.execute(
+                "SELECT attempt, retried, flaky FROM scenario"
+            ).fetchall(),
+            [(1, None, None)],
+        )
+        check.equal(
+            conn.execute(
+                "SELECT feature_name, scenarios, passed, flaky, status "
+                "FROM flat_feature"
+            ).fetchall(),
+            [("Old Feature", 1, 1, 0, "passed")],
+        )
+
+
+def test_stats_are_materialized_from_run_db_of_older_versions(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+    create_older_run_db(tmp_path / "run.db")
+
+    with sqlite3.connect(tmp_path / "run.db") as conn:
+        db.materialize_stats(conn)
+
+        check.equal(
+            conn.execute(
+                "SELECT scenario_run_id, flaky, steps FROM scenario_stats"
+            ).fetchall(),
+            [("old_scenario", None, 0)],
+        )
+        check.equal(
+            conn.execute(
+                "SELECT scenarios, passed, flaky, duration FROM run_stats"
+            ).fetchall(),
+            [(1, 1, 0, 1.5)],
+        )
+
+
+def test_consolidate_copies_worker_database_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+    monkeypatch.setattr(db, "CONSOLIDATE_BATCH_SIZE", 2)
+    monkeypatch.setitem(db.CONFIG, "CUCU_RUN_ID", "run")
+    monkeypatch.setitem(db.CONFIG, "CUCU_FILEPATH", "features")
+    monkeypatch.setitem(db.CONFIG, "WORKER_PARENT_ID", "parent")
+
+    for worker_run_id in ["worker_1", "worker_2", "worker_3"]:
+        monkeypatch.setitem(db.CONFIG, "WORKER_RUN_ID", worker_run_id)
+        db.create_database_file(tmp_path / f"run_run_{worker_run_id}.db")
+        db.record_cucu_run()
+        db.feature.create(
+            feature_run_id=f"feature_{worker_run_id}",
+            worker_run_id=worker_run_id,
+            name="Feature",
+            filename="a.feature",
+            description="",
+            tags=[],
+            start_at="2024-01-01T10:00:00",
+            behave_filepath="a.feature",
+        )
+        db.close_db()
+
+    # a worker database file of an older version of cucu, without the newer
+    # tables and columns
+    with sqlite3.connect(tmp_path / "run_run_worker_3.db") as conn:
+        conn.execute("DROP TABLE selenium_endpoint")
+        conn.execute("ALTER TABLE feature DROP COLUMN custom_data")
+
+    db.consolidate_database_files(tmp_path)
+
+    check.equal(
+        sorted(path.name for path in tmp_path.glob("*.db")), ["run.db"]
+    )
+    with sqlite3.connect(tmp_path / "run.db") as conn:
+        check.equal(
+            conn.execute(
+                "SELECT cucu_run_id, db_path FROM cucu_run"
+            ).fetchall(),
+            [("run", str(tmp_path / "run_run_worker_3.db"))],
+        )
+        check.equal(
+            conn.execute(
+                "SELECT feature_run_id, worker_run_id FROM feature ORDER BY 1"
+            ).fetchall(),
+            [
+                ("feature_worker_1", "worker_1"),
+                ("feature_worker_2", "worker_2"),
+                ("feature_worker_3", "worker_3"),
+            ],
+        )
+        check.equal(conn.execute("PRAGMA database_list").fetchall()[1:], [])
+
+
+def test_consolidate_materializes_the_stats_of_the_views(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+    db.create_database_file(tmp_path / "run.db")
+    db.cucu_run.create(
+        cucu_run_id="run",
+        full_arguments=[],
+        filepath="features",
+        start_at="2024-01-01T10:00:00",
+    )
+    db.worker.create(
+        worker_run_id="worker", cucu_run_id="run", start_at="2024-01-01"
+    )
+    for index, status in enumerate(["passed", "failed"]):
+        db.feature.create(
+            feature_run_id=f"feature_{index}",
+            worker_run_id="worker",
+            name=f"Feature {index}",
+            filename=f"{index}.feature",
+            description="",
+            tags=[],
+            start_at=f"2024-01-01T10:0{index}:00",
+            behave_filepath=f"{index}.feature",
+        )
+        for seq in range(3):
+            scenario_run_id = f"scenario_{index}_{seq}"
+            db.scenario.create(
+                scenario_run_id=scenario_run_id,
+                feature_run_id=f"feature_{index}",
+                name=f"Scenario {seq}",
+                line_number=seq,
+                seq=seq,
+                status=status if seq == 0 else "passed",
+                duration=1.5,
+                tags=[],
+            )
+            for step_seq in range(seq + 1):
+                db.step.create(
+                    step_run_id=f"{scenario_run_id}_{step_seq}",
+                    scenario_run_id=scenario_run_id,
+                    seq=step_seq,
+                    keyword="Given",
+                    name="a step",
+                    has_substeps=False,
+                    location="",
+                    stdout=[],
+                    stderr=[],
+                    debug_output=[],
+                    browser_info={},
+                    browser_logs=[],
+                    screenshots=[],
+                )
+    db.close_db()
+
+    db.consolidate_database_files(tmp_path)
+
+    with sqlite3.connect(tmp_path / "run.db") as conn:
+        check.equal(
+            conn.execute("SELECT * FROM run_stats").fetchall(),
+            conn.execute("SELECT * FROM flat_all").fetchall(),
+        )
+        check.equal(
+            conn.execute("SELECT * FROM run_stats").fetchone(),
+            (2, 6, 5, 1, 0, 0, 0, 0, 9.0, 12),
+        )
+        check.equal(
+            conn.execute(
+                "SELECT * FROM feature_stats ORDER BY start_at"
+            ).fetchall(),
+            conn.execute("SELECT * FROM flat_feature").fetchall(),
+        )
+        check.equal(
+            conn.execute(
+                "SELECT steps FROM scenario_stats ORDER BY scenario_run_id"
+            ).fetchall(),
+            [(1,), (2,), (3,), (1,), (2,), (3,)],
+        )
+        indexes = [
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            )
+        ]
+        check.is_in("scenario_feature_run_id_seq", indexes)
+        check.is_in("step_scenario_run_id_seq", indexes)
+
+
+def test_large_step_payloads_are_stored_once_compressed(tmp_path, monkeypatch):
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+    db.create_database_file(tmp_path / "run.db")
+
+    small = ["a short line"]
+    large = [f"line {index} of a long debug output" for index in range(100)]
+
+    check.equal(db.store_payload(small), small)
+    reference = db.store_payload(large)
+    check.equal(list(reference), ["$blob"])
+    check.equal(db.store_payload(list(large)), reference)
+
+    record = db.blob.get_by_id(reference["$blob"])
+    check.less(len(record.data), record.size)
+    check.equal(db.blob.select().count(), 1)
+
+    check.equal(db.load_payload(reference), large)
+    check.equal(db.load_payload(small), small)
+    check.equal(
+        db.load_payload({"$blob": "x", "other": 1}), {"$blob": "x", "other": 1}
+    )
+    db.close_db()
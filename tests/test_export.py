@@ -0,0 +1,136 @@
+"""
+Tests for the columnar export of `cucu export`.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_check as check
+
+from cucu import db
+
+pyarrow = pytest.importorskip("pyarrow")
+dataset = pytest.importorskip("pyarrow.dataset")
+
+from cucu.cli import export  # noqa: E402
+
+START_AT = datetime(2024, 1, 15, 12, 0, 0)
+
+
+def create_run_db(path, cucu_run_id, steps):
+    """
+    create a run.db with a single run of a scenario with the number of steps
+    provided, the first of which prints a large output stored as a blob
+    """
+    db.create_database_file(path)
+    db.cucu_run.create(
+        cucu_run_id=cucu_run_id,
+        full_arguments=[],
+        filepath="features",
+        start_at=START_AT,
+    )
+    db.worker.create(
+        worker_run_id=f"{cucu_run_id}_worker",
+        cucu_run_id=cucu_run_id,
+        start_at=START_AT,
+    )
+    db.feature.create(
+        feature_run_id=f"{cucu_run_id}_feature",
+        worker_run_id=f"{cucu_run_id}_worker",
+        name="Feature",
+        filename="a.feature",
+        description="",
+        tags=[],
+        start_at=START_AT,
+        behave_filepath="a.feature",
+    )
+    db.scenario.create(
+        scenario_run_id=f"{cucu_run_id}_scenario",
+        feature_run_id=f"{cucu_run_id}_feature",
+        name="Scenario",
+        line_number=1,
+        status="passed",
+        duration=1.5,
+        start_at=START_AT,
+        tags=[],
+    )
+    for seq in range(steps):
+        stdout = ["x" * db.BLOB_MIN_SIZE] if seq == 0 else ["small"]
+        db.step.create(
+            step_run_id=f"{cucu_run_id}_step_{seq}",
+            scenario_run_id=f"{cucu_run_id}_scenario",
+            seq=seq,
+            keyword="Given",
+            name=f"I run step {seq}",
+            status="passed",
+            duration=0.25,
+            start_at=START_AT + timedelta(seconds=seq),
+            has_substeps=False,
+            location="",
+            stdout=db.store_payload(stdout),
+            stderr=[],
+            debug_output=[],
+            browser_info={},
+            browser_logs=[],
+            screenshots=[],
+        )
+    db.close_db()
+
+
+@pytest.fixture(autouse=True)
+def unbatched_writes(monkeypatch):
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+
+
+def test_export_partitions_the_runs_with_typed_columns(tmp_path):
+    create_run_db(tmp_path / "first.db", "first", 5)
+    create_run_db(tmp_path / "second.db", "second", 2)
+
+    output = tmp_path / "export"
+    for name in ["first", "second"]:
+        export.export_run_database(
+            tmp_path / f"{name}.db", output, batch_size=2
+        )
+
+    steps = dataset.dataset(output / "step", partitioning="hive").to_table()
+    check.equal(steps.num_rows, 7)
+    check.equal(steps.schema.field("duration").type, pyarrow.duration("us"))
+    check.equal(steps.schema.field("start_at").type, pyarrow.timestamp("us"))
+    check.is_not_in("stdout", steps.column_names)
+    check.equal(
+        sorted(steps.column("cucu_run_id").to_pylist()),
+        ["first"] * 5 + ["second"] * 2,
+    )
+
+    scenarios = dataset.dataset(
+        output / "scenario", partitioning="hive"
+    ).to_table()
+    check.equal(
+        scenarios.column("duration").to_pylist(),
+        [timedelta(seconds=1.5)] * 2,
+    )
+
+
+def test_export_includes_the_payloads_read_from_blobs(tmp_path):
+    create_run_db(tmp_path / "run.db", "run", 2)
+
+    filepaths = export.export_run_database(
+        tmp_path / "run.db",
+        tmp_path / "export",
+        format="arrow",
+        include_payloads=True,
+    )
+    check.equal(len(filepaths), len(export.TABLES))
+
+    steps = (
+        dataset.dataset(
+            tmp_path / "export" / "step", format="arrow", partitioning="hive"
+        )
+        .to_table()
+        .sort_by("seq")
+    )
+    check.equal(
+        [json.loads(stdout) for stdout in steps.column("stdout").to_pylist()],
+        [["x" * db.BLOB_MIN_SIZE], ["small"]],
+    )
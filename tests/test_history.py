@@ -0,0 +1,175 @@
+"""
+Tests for the cross-run history reported by `cucu history`.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_check as check
+
+from cucu import db
+from cucu.cli import history
+
+NOW = datetime(2024, 1, 15, 12, 0, 0)
+
+
+def create_run_db(path, cucu_run_id, start_at, scenarios, finished=True):
+    """
+    create a run.db with a single run of the scenarios provided as
+    (name, status, duration, flaky) tuples, each with a single step
+    """
+    db.create_database_file(path)
+    db.cucu_run.create(
+        cucu_run_id=cucu_run_id,
+        full_arguments=[],
+        filepath="features",
+        start_at=start_at,
+        end_at=start_at + timedelta(minutes=1) if finished else None,
+    )
+    db.worker.create(
+        worker_run_id=f"{cucu_run_id}_worker",
+        cucu_run_id=cucu_run_id,
+        start_at=start_at,
+    )
+    db.feature.create(
+        feature_run_id=f"{cucu_run_id}_feature",
+        worker_run_id=f"{cucu_run_id}_worker",
+        name="Feature",
+        filename="a.feature",
+        description="",
+        tags=[],
+        start_at=start_at,
+        behave_filepath="a.feature",
+    )
+    for line, (name, status, duration, flaky) in enumerate(scenarios):
+        scenario_run_id = f"{cucu_run_id}_{name}"
+        db.scenario.create(
+            scenario_run_id=scenario_run_id,
+            feature_run_id=f"{cucu_run_id}_feature",
+            name=name,
+            line_number=line,
+            status=status,
+            duration=duration,
+            flaky=flaky,
+            start_at=start_at,
+            tags=[],
+        )
+        db.step.create(
+            step_run_id=f"{scenario_run_id}_step",
+            scenario_run_id=scenario_run_id,
+            seq=1,
+            keyword="Given",
+            name=f"I run {name}",
+            status=status,
+            duration=duration,
+            start_at=start_at,
+            has_substeps=False,
+            location="",
+            stdout=[],
+            stderr=[],
+            debug_output=[],
+            browser_info={},
+            browser_logs=[],
+            screenshots=[],
+        )
+    db.close_db()
+
+
+@pytest.fixture
+def history_conn(tmp_path, monkeypatch):
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+    conn = history.create_history_database(tmp_path / "history.db")
+    yield conn
+    conn.close()
+
+
+def test_ingest_skips_runs_already_ingested_or_unfinished(
+    tmp_path, history_conn
+):
+    create_run_db(
+        tmp_path / "first.db",
+        "first",
+        NOW - timedelta(days=1),
+        [("a", "passed", 1.0, None)],
+    )
+    create_run_db(
+        tmp_path / "running.db",
+        "running",
+        NOW,
+        [("a", None, None, None)],
+        finished=False,
+    )
+
+    check.equal(
+        history.ingest_run_database(history_conn, tmp_path / "first.db"), 1
+    )
+    check.equal(
+        history.ingest_run_database(history_conn, tmp_path / "first.db"), 0
+    )
+    check.equal(
+        history.ingest_run_database(history_conn, tmp_path / "running.db"), 0
+    )
+
+    check.equal(
+        history_conn.execute("SELECT cucu_run_id FROM run").fetchall(),
+        [("first",)],
+    )
+    check.equal(
+        history_conn.execute("SELECT COUNT(*) FROM scenario").fetchone()[0], 1
+    )
+    check.equal(
+        history_conn.execute("SELECT COUNT(*) FROM step").fetchone()[0], 1
+    )
+
+
+def test_history_reports_durations_regressions_and_rates(
+    tmp_path, history_conn
+):
+    # 3 runs the week before when "a" took 1s and 3 runs this week when it
+    # takes 5s to 7s, "b" is flaky once and fails once
+    for index in range(6):
+        slower = index >= 3
+        statuses = ["passed", "passed", "failed", "passed", "passed", "passed"]
+        create_run_db(
+            tmp_path / f"run_{index}.db",
+            f"run_{index}",
+            NOW - timedelta(days=10 if not slower else 2, hours=index),
+            [
+                ("a", "passed", 2.0 + index if slower else 1.0, None),
+                ("b", statuses[index], 0.5, index == 4),
+            ],
+        )
+        history.ingest_run_database(history_conn, tmp_path / f"run_{index}.db")
+
+    durations = history.scenario_durations(history_conn, 7, until=NOW)
+    check.equal(
+        [(stat["scenario"], stat["runs"], stat["p50"]) for stat in durations],
+        [("a", 3, 6.0), ("b", 3, 0.5)],
+    )
+    check.equal(durations[0]["p95"], 7.0)
+
+    regressions = history.duration_regressions(history_conn, 7, until=NOW)
+    check.equal(
+        [(stat["scenario"], stat["previous p50"]) for stat in regressions],
+        [("a", 1.0)],
+    )
+    check.equal(regressions[0]["change"], 5.0)
+    check.equal(
+        history.duration_regressions(history_conn, 7, min_runs=4, until=NOW),
+        [],
+    )
+
+    rates = history.result_rates(history_conn, 14, until=NOW)
+    check.equal(rates[0]["scenario"], "b")
+    check.almost_equal(rates[0]["fail rate"], 1 / 6)
+    check.almost_equal(rates[0]["flake rate"], 1 / 6)
+
+    feature_rates = history.result_rates(
+        history_conn, 14, by_feature=True, until=NOW
+    )
+    check.equal(feature_rates[0]["runs"], 12)
+    check.almost_equal(feature_rates[0]["pass rate"], 11 / 12)
+
+    steps = history.slowest_steps(history_conn, 7, until=NOW)
+    check.equal([stat["step"] for stat in steps], ["I run a", "I run b"])
+    check.equal(steps[0]["avg"], 6.0)
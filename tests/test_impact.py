@@ -0,0 +1,137 @@
+"""
+Tests for the test impact selection used by `cucu run --changed-since`.
+"""
+
+import json
+from pathlib import Path
+
+import pytest_check as check
+from behave.parser import parse_file
+
+from cucu import db
+from cucu.cli.impact import (
+    INDEX_VERSION,
+    config_filepaths,
+    hash_scenario,
+    load_index,
+    select_changed_scenarios,
+    update_index,
+)
+
+
+def test_select_changed_scenarios():
+    inputs = {
+        "a.feature::same": {"target": "a.feature:3", "hash": "1"},
+        "a.feature::changed": {"target": "a.feature:6", "hash": "2"},
+        "a.feature::failed": {"target": "a.feature:9", "hash": "3"},
+        "b.feature::new": {"target": "b.feature:3", "hash": "4"},
+    }
+    index = {
+        "a.feature::same": {"hash": "1", "status": "passed"},
+        "a.feature::changed": {"hash": "0", "status": "passed"},
+        "a.feature::failed": {"hash": "3", "status": "failed"},
+    }
+
+    check.equal(
+        select_changed_scenarios(inputs, index),
+        [Path("a.feature:6"), Path("a.feature:9"), Path("b.feature:3")],
+    )
+
+
+def test_hash_scenario_changes_with_the_text_and_input_files(tmp_path):
+    feature_filepath = tmp_path / "a.feature"
+    feature_filepath.write_text(
+        'Feature: A\n\n  Scenario: a\n    Given I echo "a"\n'
+    )
+    steps_filepath = tmp_path / "steps.py"
+    steps_filepath.write_text("# steps\n")
+
+    def scenario_hash():
+        scenario = parse_file(str(feature_filepath)).scenarios[0]
+        return hash_scenario(scenario, [steps_filepath], {})
+
+    original = scenario_hash()
+    check.equal(scenario_hash(), original)
+
+    steps_filepath.write_text("# changed steps\n")
+    changed_steps = scenario_hash()
+    check.not_equal(changed_steps, original)
+
+    feature_filepath.write_text(
+        'Feature: A\n\n  Scenario: a\n    Given I echo "b"\n'
+    )
+    check.not_equal(scenario_hash(), changed_steps)
+
+
+def test_config_filepaths_walks_from_cwd_to_the_feature(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    filepaths = config_filepaths(Path("features/sub/a.feature"))
+
+    check.equal(
+        filepaths[1:],
+        [
+            tmp_path / "cucurc.yml",
+            tmp_path / "environment.py",
+            tmp_path / "features" / "cucurc.yml",
+            tmp_path / "features" / "environment.py",
+            tmp_path / "features" / "sub" / "cucurc.yml",
+            tmp_path / "features" / "sub" / "environment.py",
+        ],
+    )
+
+
+def test_update_index_records_the_scenarios_that_ran(tmp_path):
+    run_db_path = tmp_path / "run.db"
+    db.create_database_file(run_db_path)
+    db.cucu_run.create(
+        cucu_run_id="run",
+        full_arguments=[],
+        filepath="features",
+        start_at="2024-01-01T10:00:00",
+    )
+    db.worker.create(
+        worker_run_id="worker",
+        cucu_run_id="run",
+        start_at="2024-01-01T10:00:00",
+    )
+    db.feature.create(
+        feature_run_id="feature",
+        worker_run_id="worker",
+        name="A",
+        filename="a.feature",
+        description="",
+        tags=[],
+        start_at="2024-01-01T10:00:00",
+        behave_filepath="a.feature",
+    )
+    db.scenario.create(
+        scenario_run_id="scenario",
+        feature_run_id="feature",
+        name="ran",
+        line_number=3,
+        status="failed",
+        tags=[],
+    )
+    db.close_db()
+
+    index_path = tmp_path / "index.json"
+    inputs = {
+        "a.feature::ran": {"target": "a.feature:3", "hash": "new"},
+        "a.feature::not ran": {"target": "a.feature:6", "hash": "new"},
+    }
+    index = {
+        "a.feature::ran": {"hash": "old", "status": "passed"},
+        "a.feature::not ran": {"hash": "old", "status": "passed"},
+    }
+
+    update_index(index_path, inputs, index, run_db_path)
+
+    check.equal(json.loads(index_path.read_text())["version"], INDEX_VERSION)
+    check.equal(
+        load_index(index_path),
+        {
+            "a.feature::ran": {"hash": "new", "status": "failed"},
+            "a.feature::not ran": {"hash": "old", "status": "passed"},
+        },
+    )
@@ -12,7 +12,7 @@ from behave.formatter.base import StreamOpener
 from behave.model_core import Status
 
 from cucu.config import CONFIG
-from cucu.formatter.junit import CucuJUnitFormatter
+from cucu.formatter.junit import CucuJUnitFormatter, merge_junit_fragments
 
 
 class StubStatus:
@@ -80,6 +80,8 @@ def junit_env(tmp_path):
         "CUCU_SHOW_SKIPS": "true",
         "CUCU_JUNIT_WITH_STACKTRACE": "false",
         "__CUCU_CUSTOM_FAILURE_HANDLERS": [],
+        "BEHAVE_FILEPATH": None,
+        "__CUCU_PARENT_STDOUT": None,
     }
     originals = {key: CONFIG[key] for key in keys}
     for key, value in keys.items():
@@ -215,3 +217,81 @@ def test_terminated_scenario_has_terminated_status(junit_env):
     check.is_none(
         testcase.find("skipped"), "terminated must not emit <skipped>"
     )
+
+
+def test_split_scenarios_are_merged_into_a_single_testsuite(junit_env):
+    # each worker runs a single scenario of the same feature
+    CONFIG["__CUCU_PARENT_STDOUT"] = object()
+    feature = StubFeature("split feature")
+
+    for line, status in [(7, "failed"), (3, "passed")]:
+        CONFIG["BEHAVE_FILEPATH"] = f"features/split.feature:{line}"
+        formatter = CucuJUnitFormatter(StreamOpener(filename="unused"), None)
+        formatter.feature(feature)
+        formatter.scenario(StubScenario(f"scenario {line}", status=status))
+        formatter.eof()
+
+    check.is_false((junit_env / f"{feature.name}.xml").exists())
+
+    merge_junit_fragments(junit_env)
+
+    output = (junit_env / f"{feature.name}.xml").read_text()
+    testsuite = ET.fromstring(output)
+    check.equal(
+        [testcase.get("name") for testcase in testsuite.iter("testcase")],
+        ["scenario 3", "scenario 7"],
+    )
+    check.equal(testsuite.get("tests"), "2")
+    check.equal(testsuite.get("failures"), "1")
+    check.equal(len(list(junit_env.glob("**/*.xml"))), 1)
+
+
+def test_retried_scenarios_replace_previous_attempt_and_are_flaky(junit_env):
+    feature = StubFeature("retried feature")
+    formatter = CucuJUnitFormatter(StreamOpener(filename="unused"), None)
+    formatter.feature(feature)
+    formatter.scenario(StubScenario("flaky", status="failed"))
+    try:
+        raise AssertionError("timed out waiting for the grid")
+    except AssertionError as error:
+        formatter.result(
+            StubStep(
+                Status.failed,
+                exception=error,
+                exc_traceback=error.__traceback__,
+            )
+        )
+    formatter.scenario(StubScenario("broken", status="failed"))
+    formatter.scenario(StubScenario("fine"))
+    formatter.eof()
+
+    # each failed scenario is retried by its own worker
+    CONFIG["__CUCU_PARENT_STDOUT"] = object()
+    for line, name, status in [
+        (3, "flaky", "passed"),
+        (6, "broken", "failed"),
+    ]:
+        CONFIG["BEHAVE_FILEPATH"] = f"features/retried.feature:{line}"
+        formatter = CucuJUnitFormatter(StreamOpener(filename="unused"), None)
+        formatter.feature(feature)
+        formatter.scenario(StubScenario(name, status=status))
+        formatter.eof()
+
+    merge_junit_fragments(junit_env, retry=True)
+
+    output = (junit_env / f"{feature.name}.xml").read_text()
+    testsuite = ET.fromstring(output)
+    testcases = {
+        testcase.get("name"): testcase
+        for testcase in testsuite.iter("testcase")
+    }
+    check.equal(list(testcases), ["flaky", "broken", "fine"])
+    check.equal(testsuite.get("failures"), "1")
+    check.equal(testcases["flaky"].get("status"), "passed")
+    check.equal(testcases["flaky"].get("flaky"), "true")
+    check.is_in(
+        "timed out waiting for the grid",
+        testcases["flaky"].find("flakyFailure").text,
+    )
+    check.is_none(testcases["broken"].get("flaky"))
+    check.is_none(testcases["fine"].get("flaky"))
@@ -0,0 +1,157 @@
+"""
+Tests for the named queries of `cucu query`.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_check as check
+from click.testing import CliRunner
+
+from cucu import db
+from cucu.cli import core, query
+from tests.test_db import create_older_run_db
+
+START_AT = datetime(2024, 1, 15, 12, 0, 0)
+
+
+@pytest.fixture
+def run_db_path(tmp_path, monkeypatch):
+    """
+    a run.db with a single worker running a tagged feature of three
+    scenarios, one of which failed and was retried
+    """
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+    path = tmp_path / "run.db"
+    db.create_database_file(path)
+    db.cucu_run.create(
+        cucu_run_id="run",
+        full_arguments=[],
+        filepath="features",
+        start_at=START_AT,
+    )
+    db.worker.create(
+        worker_run_id="worker", cucu_run_id="run", start_at=START_AT
+    )
+    db.feature.create(
+        feature_run_id="feature",
+        worker_run_id="worker",
+        name="Feature",
+        filename="a.feature",
+        description="",
+        tags=["ui"],
+        start_at=START_AT,
+        end_at=START_AT + timedelta(seconds=10),
+        behave_filepath="a.feature",
+    )
+
+    scenarios = [
+        ("fast", "passed", 1.0, ["smoke"], None, None),
+        ("slow", "passed", 5.0, [], None, None),
+        ("broken", "failed", 2.0, ["smoke"], True, "AssertionError: no"),
+        ("broken again", "failed", 1.5, [], None, "AssertionError: no"),
+    ]
+    for name, status, duration, tags, retried, error in scenarios:
+        db.scenario.create(
+            scenario_run_id=name,
+            feature_run_id="feature",
+            name=name,
+            line_number=1,
+            status=status,
+            duration=duration,
+            retried=retried,
+            start_at=START_AT,
+            tags=tags,
+        )
+        db.step.create(
+            step_run_id=f"{name}_step",
+            scenario_run_id=name,
+            seq=1,
+            keyword="Given",
+            name=f"I run {name}",
+            status=status,
+            duration=duration,
+            start_at=START_AT,
+            has_substeps=False,
+            location="",
+            error_message=[error, "details"] if error else None,
+            stdout=[],
+            stderr=[],
+            debug_output=[],
+            browser_info={},
+            browser_logs=[],
+            screenshots=[],
+        )
+    db.close_db()
+
+    return path
+
+
+def test_queries_leave_out_retried_attempts(run_db_path):
+    scenarios = query.run_query("slowest-scenarios", run_db_path, 2)
+    check.equal(
+        [row["scenario"] for row in scenarios], ["slow", "broken again"]
+    )
+
+    steps = query.run_query("slowest-steps", run_db_path, 10)
+    check.equal(len(steps), 3)
+
+    failures = query.run_query("failures", run_db_path, 10)
+    check.equal(
+        failures,
+        [
+            {
+                "error": "AssertionError: no",
+                "steps": 1,
+                "scenarios": 1,
+                "example scenario": "broken again",
+            }
+        ],
+    )
+
+
+def test_query_run_db_of_older_versions(tmp_path, monkeypatch):
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+    create_older_run_db(tmp_path / "run.db")
+
+    for name in query.QUERIES:
+        result = CliRunner().invoke(
+            core.main, ["query", name, str(tmp_path), "--format", "json"]
+        )
+        check.equal(result.exit_code, 0, result.output)
+
+    result = CliRunner().invoke(
+        core.main, ["query", "slowest-scenarios", str(tmp_path), "-f", "json"]
+    )
+    check.equal(
+        [row["scenario"] for row in json.loads(result.output)],
+        ["Old Scenario"],
+    )
+
+
+def test_duration_by_tag_includes_the_feature_tags(run_db_path):
+    tags = query.run_query("duration-by-tag", run_db_path, 10)
+    check.equal(
+        [(row["tag"], row["scenarios"], row["failed"]) for row in tags],
+        [("ui", 3, 1), ("smoke", 1, 0)],
+    )
+    check.equal(tags[0]["duration"], 7.5)
+    check.equal(tags[0]["average duration"], 2.5)
+
+
+def test_worker_utilization(run_db_path):
+    workers = query.run_query("worker-utilization", run_db_path, 10)
+    check.equal(len(workers), 1)
+    check.equal(workers[0]["busy"], 9.5)
+    check.equal(workers[0]["lifetime"], 10.0)
+    check.almost_equal(workers[0]["utilization"], 0.95)
+
+
+def test_format_rows():
+    rows = [{"name": "a", "duration": 1.23456}]
+
+    check.equal(json.loads(query.format_rows(rows, "json")), rows)
+    check.equal(query.format_rows(rows, "csv"), "name,duration\na,1.23456")
+    check.is_in("1.235", query.format_rows(rows, "table"))
+    check.equal(query.format_rows([], "table"), "no results")
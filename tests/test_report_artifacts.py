@@ -0,0 +1,58 @@
+"""
+Tests for the placement of the artifacts of a run into the HTML report.
+"""
+
+import errno
+
+import pytest_check as check
+
+from cucu.reporter import artifacts
+
+
+def test_hardlink_shares_the_file_of_the_results(tmp_path):
+    src = tmp_path / "screenshot.png"
+    src.write_bytes(b"png")
+
+    dst = artifacts.place_file(src, tmp_path / "placed.png", "hardlink")
+    check.equal(dst.stat().st_ino, src.stat().st_ino)
+    check.equal(dst.read_bytes(), b"png")
+
+
+def test_symlink_points_at_the_results(tmp_path):
+    src = tmp_path / "screenshot.png"
+    src.write_bytes(b"png")
+
+    dst = artifacts.place_file(src, tmp_path / "placed.png", "symlink")
+    check.is_true(dst.is_symlink())
+    check.equal(dst.resolve(), src.resolve())
+
+
+def test_placement_replaces_the_existing_file(tmp_path):
+    src = tmp_path / "log.txt"
+    src.write_text("new")
+    existing = tmp_path / "existing.txt"
+    existing.write_text("existing")
+    dst = tmp_path / "placed.txt"
+    dst.hardlink_to(existing)
+
+    artifacts.place_file(src, dst, "hardlink")
+    check.equal(dst.read_text(), "new")
+    check.equal(existing.read_text(), "existing")
+
+
+def test_placement_falls_back_to_copying(tmp_path, monkeypatch):
+    def unsupported(src, dst):
+        raise OSError(errno.EOPNOTSUPP, "not supported")
+
+    monkeypatch.setitem(artifacts.PLACEMENTS, "reflink", unsupported)
+    src = tmp_path / "results"
+    (src / "logs").mkdir(parents=True)
+    (src / "logs" / "cucu.debug.console.log").write_text("debug")
+
+    artifacts.place_tree(src, tmp_path / "report", "reflink")
+    placed = tmp_path / "report" / "logs" / "cucu.debug.console.log"
+    check.equal(placed.read_text(), "debug")
+    check.not_equal(
+        placed.stat().st_ino,
+        (src / "logs" / "cucu.debug.console.log").stat().st_ino,
+    )
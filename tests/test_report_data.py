@@ -0,0 +1,125 @@
+"""
+Tests for the data chunks of the index and flat pages of the HTML report.
+"""
+
+import json
+
+import pytest_check as check
+
+from cucu.reporter import html
+
+
+def read_chunk(chunk_path, index):
+    prefix = f'loadReportData("flat", {index}, '
+    text = chunk_path.read_text()
+    check.is_true(text.startswith(prefix))
+    return json.loads(text[len(prefix) : -len(");\n")])
+
+
+def test_flat_rows_skip_backgrounds_and_escape_names():
+    features = [
+        {
+            "name": 'Feature "quoted" & #1',
+            "folder_name": 'Feature "quoted" & #1',
+            "tags": "@smoke",
+            "scenarios": [
+                {"keyword": "Background", "name": "Background"},
+                {
+                    "name": "Scenario <b>",
+                    "folder_name": "Scenario <b>",
+                    "start_at": None,
+                    "attempt": 2,
+                    "tags": "",
+                    "total_steps": 3,
+                    "status": "failed",
+                    "flaky": None,
+                    "duration": 1.25,
+                },
+            ],
+        }
+    ]
+
+    rows = html.flat_rows(features)
+    check.equal(len(rows), 1)
+    check.equal(rows[0][1], "Feature &quot;quoted&quot; &amp; #1")
+    check.equal(rows[0][2], "Feature &quot;quoted&quot; &amp; %231.html")
+    check.equal(rows[0][4], "Scenario &lt;b&gt;")
+    check.equal(
+        rows[0][5],
+        "Feature &quot;quoted&quot; &amp; %231/Scenario &lt;b&gt;/index.html",
+    )
+    check.equal(rows[0][11], "1.2")
+
+
+def test_data_chunks_replace_the_previous_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(html, "DATA_CHUNK_SIZE", 2)
+    rows = [[index] for index in range(5)]
+
+    check.equal(html.write_data_chunks(tmp_path, "flat", rows), 3)
+    data_path = tmp_path / html.DATA_DIRNAME
+    check.equal(
+        [
+            read_chunk(data_path / f"flat.{index}.js", index)
+            for index in range(3)
+        ],
+        [[[0], [1]], [[2], [3]], [[4]]],
+    )
+
+    check.equal(html.write_data_chunks(tmp_path, "flat", []), 1)
+    check.equal(sorted(x.name for x in data_path.iterdir()), ["flat.0.js"])
+    check.equal(read_chunk(data_path / "flat.0.js", 0), [])
+
+
+def test_rows_are_in_the_default_order_of_the_tables():
+    def scenario(name):
+        return {
+            "name": name,
+            "folder_name": name,
+            "start_at": None,
+            "attempt": 1,
+            "tags": "",
+            "total_steps": 1,
+            "status": "passed",
+            "flaky": None,
+            "duration": 1,
+        }
+
+    features = [
+        {
+            "name": "First",
+            "folder_name": "First",
+            "tags": "",
+            "scenarios": [scenario("beta"), scenario("Gamma")],
+        },
+        {
+            "name": "Second",
+            "folder_name": "Second",
+            "tags": "",
+            "scenarios": [scenario("Alpha")],
+        },
+    ]
+    check.equal(
+        [row[4] for row in html.flat_rows(features)],
+        ["Alpha", "beta", "Gamma"],
+    )
+
+    feature_stats = [
+        {
+            "start_at": None,
+            "feature_name": name,
+            "scenarios": 1,
+            "passed": 0,
+            "flaky": 0,
+            "failed": 0,
+            "skipped": 0,
+            "error": error,
+            "terminated": 0,
+            "status": "error" if error else "untested",
+            "duration": 1,
+        }
+        for name, error in [("First", 2), ("Second", 0), ("Third", 1)]
+    ]
+    check.equal(
+        [row[1] for row in html.index_rows(feature_stats)],
+        ["Second", "Third", "First"],
+    )
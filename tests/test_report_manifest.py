@@ -0,0 +1,96 @@
+"""
+Tests for the manifest of `cucu report --incremental`.
+"""
+
+import json
+import os
+from datetime import datetime
+
+import pytest
+import pytest_check as check
+
+from cucu import db
+from cucu.reporter import manifest
+
+START_AT = datetime(2024, 1, 15, 12, 0, 0)
+
+
+@pytest.fixture
+def results(tmp_path, monkeypatch):
+    """
+    a results directory with the run.db and the feature directory of a
+    single feature of a single scenario
+    """
+    monkeypatch.setenv("CUCU_DB_BATCHED_WRITES", "false")
+    results = tmp_path / "results"
+    results.mkdir()
+    (results / "a.feature").write_text("Feature: Feature\n")
+
+    db.create_database_file(results / "run.db")
+    db.cucu_run.create(
+        cucu_run_id="run",
+        full_arguments=[],
+        filepath="features",
+        start_at=START_AT,
+    )
+    db.worker.create(
+        worker_run_id="worker", cucu_run_id="run", start_at=START_AT
+    )
+    db.feature.create(
+        feature_run_id="feature",
+        worker_run_id="worker",
+        name="Feature",
+        filename="a.feature",
+        description="",
+        tags=[],
+        start_at=START_AT,
+        behave_filepath=str(results / "a.feature"),
+    )
+    db.scenario.create(
+        scenario_run_id="scenario",
+        feature_run_id="feature",
+        name="Scenario",
+        line_number=1,
+        status="passed",
+        start_at=START_AT,
+        tags=[],
+    )
+
+    logs_dir = results / "Feature" / "Scenario" / "logs"
+    logs_dir.mkdir(parents=True)
+    (logs_dir / "cucu.debug.console.log").write_text("debug")
+
+    yield results
+
+    db.close_db()
+
+
+def test_feature_hash_changes_with_its_rows_and_files(results):
+    original = manifest.hash_feature_inputs(results, "feature")
+    check.equal(manifest.hash_feature_inputs(results, "feature"), original)
+
+    log_path = (
+        results / "Feature" / "Scenario" / "logs" / "cucu.debug.console.log"
+    )
+    stat = log_path.stat()
+    os.utime(log_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    touched = manifest.hash_feature_inputs(results, "feature")
+    check.not_equal(touched, original)
+
+    db.scenario.update(status="failed").execute()
+    check.not_equal(manifest.hash_feature_inputs(results, "feature"), touched)
+
+
+def test_manifest_of_another_version_is_ignored(tmp_path):
+    features = {"feature": {"hash": "abc", "feature": {"name": "Feature"}}}
+    manifest.write_manifest(tmp_path, features)
+    check.equal(manifest.load_manifest(tmp_path), features)
+
+    manifest_path = tmp_path / manifest.MANIFEST_FILENAME
+    data = json.loads(manifest_path.read_text())
+    data["report_version"] = "older"
+    manifest_path.write_text(json.dumps(data))
+    check.equal(manifest.load_manifest(tmp_path), {})
+
+    manifest_path.unlink()
+    check.equal(manifest.load_manifest(tmp_path), {})
@@ -0,0 +1,199 @@
+"""
+Tests for the duration-aware feature scheduling used by `cucu run --workers`.
+"""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+import pytest_check as check
+
+from cucu import db
+from cucu.cli.scheduler import (
+    expand_scenarios,
+    load_failed_scenarios,
+    load_feature_durations,
+    normalize_feature_filename,
+    parse_shard,
+    schedule_features,
+    shard_features,
+)
+
+
+@pytest.fixture
+def previous_run_db(tmp_path):
+    db_path = tmp_path / "previous" / "run.db"
+    db_path.parent.mkdir()
+    db.create_database_file(db_path)
+
+    db.cucu_run.create(
+        cucu_run_id="run",
+        full_arguments=[],
+        filepath="features",
+        start_at="2024-01-01T10:00:00",
+    )
+    db.worker.create(
+        worker_run_id="worker",
+        cucu_run_id="run",
+        start_at="2024-01-01T10:00:00",
+    )
+
+    features = [
+        ("a1", "features/a.feature", "10:00:00", "10:00:10"),
+        ("a2", "features/a.feature", "11:00:00", "11:00:20"),
+        ("b1", "features/b.feature", "10:00:00", None),
+    ]
+    for feature_run_id, filename, start_at, end_at in features:
+        db.feature.create(
+            feature_run_id=feature_run_id,
+            worker_run_id="worker",
+            name=feature_run_id,
+            filename=filename,
+            description="",
+            tags=[],
+            start_at=f"2024-01-01T{start_at}",
+            end_at=f"2024-01-01T{end_at}" if end_at else None,
+            behave_filepath=filename,
+        )
+        db.scenario.create(
+            scenario_run_id=f"{feature_run_id}_scenario",
+            feature_run_id=feature_run_id,
+            name="scenario",
+            line_number=3,
+            status="passed",
+            duration=5.0,
+            tags=[],
+        )
+
+    db.close_db()
+    return db_path
+
+
+def test_load_feature_durations_averages_runs_and_falls_back_to_scenarios(
+    previous_run_db,
+):
+    durations = load_feature_durations([previous_run_db])
+
+    check.equal(durations["features/a.feature"], pytest.approx(15.0))
+    check.equal(durations["features/b.feature"], pytest.approx(5.0))
+    check.equal(durations["features/a.feature:3"], pytest.approx(5.0))
+
+
+def test_load_failed_scenarios_returns_targets_that_did_not_pass(
+    previous_run_db,
+):
+    with sqlite3.connect(previous_run_db) as conn:
+        conn.execute(
+            "UPDATE scenario SET status = 'failed' "
+            "WHERE feature_run_id IN ('a1', 'a2')"
+        )
+        conn.execute(
+            "UPDATE scenario SET status = 'terminated', line_number = 7 "
+            "WHERE feature_run_id = 'b1'"
+        )
+
+    check.equal(
+        load_failed_scenarios(previous_run_db),
+        [Path("features/a.feature:3"), Path("features/b.feature:7")],
+    )
+
+
+def test_load_feature_durations_ignores_missing_databases(tmp_path):
+    check.equal(load_feature_durations([tmp_path / "missing.db"]), {})
+
+
+def test_normalize_feature_filename_strips_line_numbers():
+    check.equal(
+        normalize_feature_filename("./features/a.feature:10"),
+        "features/a.feature",
+    )
+
+
+def test_schedule_features_dispatches_longest_first(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    features_dir = tmp_path / "features"
+    features_dir.mkdir()
+    for name, size in [("a", 100), ("b", 100), ("c", 1000), ("d", 10)]:
+        (features_dir / f"{name}.feature").write_text("x" * size)
+
+    durations = {"features/a.feature": 15.0, "features/b.feature": 5.0}
+    feature_filepaths = sorted(features_dir.glob("*.feature"))
+
+    scheduled = schedule_features(feature_filepaths, durations)
+
+    check.equal(
+        [feature_filepath.name for feature_filepath, _ in scheduled],
+        ["c.feature", "a.feature", "b.feature", "d.feature"],
+    )
+    # unseen features are estimated at the observed 0.1 seconds per byte
+    check.equal(scheduled[0][1], pytest.approx(100.0))
+    check.equal(scheduled[-1][1], pytest.approx(1.0))
+
+
+def test_expand_scenarios_splits_outlines_and_skips_disabled(
+    tmp_path, monkeypatch
+):
+    monkeypatch.chdir(tmp_path)
+    feature_filepath = tmp_path / "a.feature"
+    feature_filepath.write_text(
+        "\n".join(
+            [
+                "Feature: A",
+                "",
+                "  Scenario: plain",
+                '    Given I echo "plain"',
+                "",
+                "  Scenario Outline: outline",
+                '    Given I echo "<thing>"',
+                "",
+                "    Examples:",
+                "      | thing |",
+                "      | one   |",
+                "      | two   |",
+                "",
+                "  @disabled",
+                "  Scenario: disabled",
+                '    Given I echo "disabled"',
+            ]
+        )
+    )
+
+    targets = expand_scenarios([feature_filepath], [])
+
+    check.equal(
+        [target.name for target in targets],
+        ["a.feature:3", "a.feature:11", "a.feature:12"],
+    )
+
+    durations = {"a.feature:11": 2.0, "a.feature:3": 1.0}
+    scheduled = schedule_features(list(targets), durations, targets)
+    check.equal(scheduled[0][0].name, "a.feature:11")
+
+
+def test_parse_shard():
+    check.equal(parse_shard("2/3"), (2, 3))
+
+    for shard in ["0/3", "4/3", "1", "a/b", "-1/3"]:
+        with pytest.raises(ValueError):
+            parse_shard(shard)
+
+
+def test_shard_features_balances_and_covers_every_feature():
+    scheduled = [
+        ("a", 10.0),
+        ("b", 6.0),
+        ("c", 5.0),
+        ("d", 4.0),
+        ("e", 1.0),
+    ]
+
+    shards = [shard_features(scheduled, index, 2) for index in [1, 2]]
+
+    check.equal([name for name, _ in shards[0]], ["a", "d"])
+    check.equal([name for name, _ in shards[1]], ["b", "c", "e"])
+    check.equal(
+        sorted(name for shard in shards for name, _ in shard),
+        ["a", "b", "c", "d", "e"],
+    )
+    # more shards than features leaves the extra shards empty
+    check.equal(shard_features(scheduled[:1], 2, 2), [])
@@ -0,0 +1,67 @@
+"""
+Tests for the persistent pool worker runtime used by `cucu run --workers`.
+"""
+
+import pytest
+import pytest_check as check
+from behave.configuration import Configuration
+
+from cucu.cli import worker
+from cucu.config import CONFIG
+
+
+@pytest.fixture
+def features_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(worker.CucuWorkerRunner, "loaded_hooks", {})
+    monkeypatch.setattr(worker.CucuWorkerRunner, "loaded_step_paths", set())
+
+    (tmp_path / "environment.py").write_text(
+        "LOADED = globals().get('LOADED', 0) + 1\n"
+    )
+    steps_dir = tmp_path / "steps"
+    steps_dir.mkdir()
+    (steps_dir / "__init__.py").write_text("")
+    return tmp_path
+
+
+def make_runner(base_dir):
+    runner = worker.CucuWorkerRunner(Configuration(command_args=[]))
+    runner.base_dir = str(base_dir)
+    return runner
+
+
+def test_runner_loads_hooks_and_steps_once(features_dir, monkeypatch):
+    loaded_steps = []
+    monkeypatch.setattr(
+        worker.Runner,
+        "load_step_definitions",
+        lambda self, extra_step_paths=None: loaded_steps.append(self.base_dir),
+    )
+
+    first, second = make_runner(features_dir), make_runner(features_dir)
+    for runner in [first, second]:
+        runner.load_hooks()
+        runner.load_step_definitions()
+
+    check.is_(second.hooks, first.hooks)
+    check.equal(second.hooks["LOADED"], 1)
+    check.equal(loaded_steps, [str(features_dir)])
+
+
+def test_reset_discards_the_previous_feature_state(monkeypatch):
+    monkeypatch.setattr(CONFIG, "snapshots", [])
+    monkeypatch.setattr(worker, "BOOTSTRAP_SNAPSHOT_DEPTH", None)
+    monkeypatch.setattr(worker.selenium, "init", lambda: None)
+
+    worker.bootstrap()
+    check.equal(worker.BOOTSTRAP_SNAPSHOT_DEPTH, 1)
+
+    # a feature loads its own cucurc variables and is interrupted before its
+    # after_all hook pops its snapshot
+    CONFIG["FOO_FROM_CUCURC"] = "bar"
+    CONFIG.snapshot("before_all")
+
+    worker.reset()
+
+    check.is_none(CONFIG["FOO_FROM_CUCURC"])
+    check.equal(len(CONFIG.snapshots), 1)